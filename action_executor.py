@@ -0,0 +1,208 @@
+"""
+action_executor.py - Runs approved actions on per-provider worker pools
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from metrics import LatencyRecorder
+
+load_dotenv()
+
+Execute = Callable[[Dict, Dict], Optional[Dict]]
+ExecuteMany = Callable[[List[Dict], Dict], List[Optional[Dict]]]
+RecordStatus = Callable[[int, str], bool]
+
+
+class QueueFull(Exception):
+    """More actions are waiting than ACTION_QUEUE_SIZE allows, or the executor is closed"""
+
+
+class ActionExecutor:
+    """
+    Queue of approved actions drained by one thread pool per provider
+
+    A provider gets ACTION_WORKERS_<PROVIDER> workers (default ACTION_WORKERS),
+    so a slow Gmail can't starve Asana and neither API sees more concurrent
+    calls than configured. At most ACTION_QUEUE_SIZE actions wait or run at
+    once. When an action finishes its status is written with record_status,
+    and the outcome stays available to future()/status() for the most recent
+    ACTION_RESULTS_KEPT actions. submit_many() runs a group of actions as one
+    call to execute_many (e.g. one Asana /batch request) on a single worker.
+    """
+
+    def __init__(self, execute: Execute, record_status: RecordStatus = None,
+                 workers: Dict[str, int] = None, max_queue: int = None, results_kept: int = None,
+                 execute_many: ExecuteMany = None):
+        self.execute = execute
+        self.execute_many = execute_many
+        self.record_status = record_status
+        self.default_workers = int(os.getenv('ACTION_WORKERS', 4))
+        self.workers = dict(workers or {})
+        self.max_queue = max_queue or int(os.getenv('ACTION_QUEUE_SIZE', 1000))
+        self.results_kept = results_kept or int(os.getenv('ACTION_RESULTS_KEPT', 10000))
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._jobs: "OrderedDict[int, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict] = {}
+        self._latency: Dict[str, LatencyRecorder] = {}
+        self._started = time.monotonic()
+
+    def _pool(self, provider: str) -> ThreadPoolExecutor:
+        pool = self._pools.get(provider)
+        if pool is None:
+            size = self.workers.get(provider) or int(
+                os.getenv(f'ACTION_WORKERS_{provider.upper()}', self.default_workers))
+            self.workers[provider] = size
+            pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"action-{provider}")
+            self._pools[provider] = pool
+            self._counters[provider] = {"queued": 0, "running": 0, "executed": 0, "rejected": 0}
+            self._latency[provider] = LatencyRecorder()
+        return pool
+
+    def submit(self, action: Dict, token_data: Dict, record: bool = True) -> Future:
+        """
+        Queue one claimed action; the future resolves to {"success", "status", "result"}
+        record=False leaves the status write to the caller (e.g. one bulk UPDATE)
+        Raises QueueFull when the queue is at capacity
+        """
+        return self.submit_many([action], token_data, record)[0]
+
+    def submit_many(self, actions: List[Dict], token_data: Dict, record: bool = True) -> List[Future]:
+        """
+        Queue actions of one provider and token to run together through execute_many
+        (one at a time through execute without it); one future per action, in order
+        Each action takes a queue slot; QueueFull is raised, and nothing queued, if
+        they don't all fit
+        """
+        acquired = 0
+        while acquired < len(actions) and self._slots.acquire(blocking=False):
+            acquired += 1
+        if acquired < len(actions):
+            for _ in range(acquired):
+                self._slots.release()
+            raise QueueFull(f"{self.max_queue} actions already queued")
+
+        provider = actions[0]['provider']
+        now = time.monotonic()
+        jobs = [{"action_id": action['id'], "user_id": action.get('user_id'), "provider": provider,
+                 "state": "queued", "queued_at": now, "future": Future()} for action in actions]
+        with self._lock:
+            pool = self._pool(provider)
+            for job in jobs:
+                self._jobs[job["action_id"]] = job
+                self._jobs.move_to_end(job["action_id"])
+            self._counters[provider]["queued"] += len(jobs)
+            try:
+                pool.submit(self._run, jobs, actions, token_data, record)
+            except RuntimeError:
+                # close() has run; nothing new is accepted
+                for job in jobs:
+                    del self._jobs[job["action_id"]]
+                    self._slots.release()
+                self._counters[provider]["queued"] -= len(jobs)
+                raise QueueFull("executor is shut down")
+        return [job["future"] for job in jobs]
+
+    def _run(self, jobs: List[Dict], actions: List[Dict], token_data: Dict, record: bool):
+        provider = jobs[0]["provider"]
+        with self._lock:
+            for job in jobs:
+                job["state"] = "running"
+            self._counters[provider]["queued"] -= len(jobs)
+            self._counters[provider]["running"] += len(jobs)
+        try:
+            if self.execute_many and len(actions) > 1:
+                try:
+                    results = self.execute_many(actions, token_data)
+                    if len(results) != len(actions):
+                        raise ValueError(f"{len(results)} results for {len(actions)} actions")
+                except Exception as e:
+                    print(f"Error executing actions {[a['id'] for a in actions]}: {e}")
+                    results = [{"error": str(e)}] * len(actions)
+            else:
+                results = [self._execute_one(action, token_data) for action in actions]
+
+            for job, action, result in zip(jobs, actions, results):
+                self._finish(job, action, result, record)
+        finally:
+            for _ in jobs:
+                self._slots.release()
+
+    def _execute_one(self, action: Dict, token_data: Dict) -> Optional[Dict]:
+        try:
+            return self.execute(action, token_data)
+        except Exception as e:
+            print(f"Error executing action {action['id']}: {e}")
+            return {"error": str(e)}
+
+    def _finish(self, job: Dict, action: Dict, result: Optional[Dict], record: bool):
+        provider = job["provider"]
+        status = 'executed' if result and 'error' not in result else 'rejected'
+        if record and self.record_status:
+            try:
+                self.record_status(action['id'], status)
+            except Exception as e:
+                print(f"Error recording status of action {action['id']}: {e}")
+        outcome = {"success": status == 'executed', "status": status, "result": result}
+
+        with self._lock:
+            self._counters[provider]["running"] -= 1
+            self._counters[provider][status] += 1
+            job.update(state="done", outcome=outcome)
+            self._trim()
+        self._latency[provider].record((time.monotonic() - job["queued_at"]) * 1000)
+        job["future"].set_result(outcome)
+
+    def _trim(self):
+        while len(self._jobs) > self.results_kept:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest["state"] != "done":
+                break
+            del self._jobs[oldest_id]
+
+    def status(self, action_id: int) -> Optional[Dict]:
+        """{"action_id", "state"} plus the outcome once done; None if this process doesn't know it"""
+        with self._lock:
+            job = self._jobs.get(action_id)
+        if job is None:
+            return None
+        return {"action_id": action_id, "state": job["state"], **job.get("outcome", {})}
+
+    def future(self, action_id: int, user_id: int = None) -> Optional[Future]:
+        """
+        The future of a queued, running or recently finished action
+        With user_id, None unless the action belongs to that user
+        """
+        with self._lock:
+            job = self._jobs.get(action_id)
+        if job is None or (user_id is not None and job["user_id"] != user_id):
+            return None
+        return job["future"]
+
+    def close(self, wait: bool = True):
+        """Stop accepting actions; with wait, finish everything already queued"""
+        for pool in list(self._pools.values()):
+            pool.shutdown(wait=wait)
+
+    def stats(self) -> Dict:
+        """Per-provider workers, queue depth, outcomes and queue-to-done latency"""
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            providers = {
+                provider: {
+                    "workers": self.workers[provider],
+                    **counters,
+                    "per_second": round((counters["executed"] + counters["rejected"]) / elapsed, 3),
+                    "latency": self._latency[provider].stats()
+                }
+                for provider, counters in self._counters.items()
+            }
+        return {"max_queue": self.max_queue, "providers": providers}
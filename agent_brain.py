@@ -2,31 +2,133 @@
 agent_brain.py - Fixed with proper response handling
 """
 
+import asyncio
 import json
 import os
-from typing import List, Dict, Optional
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
-from langchain_ollama import OllamaLLM
+from langchain_ollama import OllamaEmbeddings
 from database import db_manager
-from tools.asana_tool import AsanaAPI
+from async_database import async_db
+from plan_cache import PlanCache
+from semantic_cache import SemanticPlanCache, reextract_parameters
+from plan_stream import IncrementalActionParser
+from intent_router import IntentRouter
+from llm_scheduler import PlanningScheduler
+from llm_pool import LLMPool, DeadlineExceeded
+from model_router import ModelRouter
+from generation_budget import GenerationBudgets
+from metrics import LatencyRecorder
+from action_executor import ActionExecutor, QueueFull
+from asana_metadata import AsanaMetadata, AsanaMetadataCache
+from tools.asana_tool import ASANA_BATCH_SIZE, AsanaAPI
 from tools.google_tool import send_gmail
 
 load_dotenv()
 
+# Identical for every request so Ollama can reuse the prefix KV cache;
+# everything request-specific goes after it in _build_planning_prompt
+PLANNING_PREFIX = """You are Gaprio AI Assistant. Analyze the user's request and generate appropriate actions.
+
+INSTRUCTIONS:
+1. Only generate actions for the AVAILABLE TOOLS listed below
+2. Extract parameters from the user's message
+3. For emails, extract recipient, subject, and body
+4. For tasks, extract task name and description
+5. For project_id, use the project's name as listed under ASANA PROJECTS; leave as empty string if not specified or not listed
+6. Output ONLY a JSON array of action objects
+7. DO NOT include any other text or explanations
+
+OUTPUT FORMAT: A JSON array like this:
+[
+  {
+    "tool": "create_asana_task",
+    "provider": "asana",
+    "parameters": {
+      "name": "Task title here",
+      "notes": "Task description here",
+      "project_id": ""
+    }
+  }
+]
+
+If no action is needed, return empty array: []
+
+"""
+
+# Tools offered to the planner for each connected provider, in prompt order
+PROVIDER_TOOLS = {
+    'asana': ["- create_asana_task: Create a task in Asana (requires: name, notes, project_id)"],
+    'google': ["- send_gmail: Send an email via Gmail (requires: to, subject, body)"],
+}
+
 class AgentBrain:
     """Main AI Agent brain with fixed database integration"""
     
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, max_concurrency: int = None):
         self.model = model or os.getenv('LLM_MODEL', 'llama3:instruct')
         print(f"🧠 Initializing Agent Brain with model: {self.model}")
-        self.llm = OllamaLLM(model=self.model, format="json")
+        # One or more Ollama hosts (OLLAMA_BASE_URLS), routed by load and health
+        # LLM_KEEP_ALIVE keeps the model (and its cached prompt prefix) resident between requests
+        self.keep_alive = os.getenv('LLM_KEEP_ALIVE', '30m')
+        self.llm = LLMPool(self.model, format="json", keep_alive=self.keep_alive)
+        
+        # Optional small model for simple plans (LLM_SMALL_MODEL unset disables tiering)
+        self.small_model = os.getenv('LLM_SMALL_MODEL')
+        self.small_llm = None
+        self.model_router = None
+        if self.small_model:
+            print(f"   Small-tier model: {self.small_model}")
+            self.small_llm = LLMPool(self.small_model, format="json", keep_alive=self.keep_alive)
+            self.model_router = ModelRouter()
+        
+        # Per-tier max tokens, stop sequences and wall-clock deadline for each generation
+        self.budgets = GenerationBudgets()
+        
+        # Cap on LLM generations running at once on the async path; match the server's OLLAMA_NUM_PARALLEL
+        self.max_concurrency = max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY',
+                                                                os.getenv('OLLAMA_NUM_PARALLEL', 4)))
+        # Every async generation, whole or streamed, goes out through its slots
+        self.scheduler = PlanningScheduler(self.max_concurrency)
+        
+        # Deterministic fast path for formulaic commands
+        self.intent_router = None
+        if os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true':
+            self.intent_router = IntentRouter()
+        
+        # Planning latency by the path that produced the plan
+        self.path_latency = {
+            'fast_path': LatencyRecorder(),
+            'cache': LatencyRecorder(),
+            'llm': LatencyRecorder()
+        }
+        
+        # Exact-match cache of generated plans
+        self.plan_cache = PlanCache()
+        
+        # Second-tier cache matching paraphrases by embedding similarity
+        self.semantic_cache = None
+        if os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true':
+            self.embeddings = OllamaEmbeddings(model=os.getenv('EMBED_MODEL', 'nomic-embed-text'))
+            self.semantic_cache = SemanticPlanCache()
+        
+        # Users' Asana projects, so the planner can name them without calling Asana
+        self.asana_metadata = AsanaMetadataCache()
+        self.prompt_projects = int(os.getenv('ASANA_PROMPT_PROJECTS', 30))
+        
+        # Approved actions run on per-provider worker pools (ACTION_WORKERS_<PROVIDER>)
+        # and several Asana tasks for one token go out as one /batch request
+        self.executor = ActionExecutor(self._execute_action, db_manager.update_action_status,
+                                       execute_many=self._execute_actions)
         
         # Connect to database
         if not db_manager.connect():
             print("⚠️ Running in limited mode (no database connection)")
     
-    def get_agent_plan(self, user_id: int, user_message: str) -> List[Dict]:
+    def get_agent_plan(self, user_id: int, user_message: str, use_cache: bool = True) -> List[Dict]:
         """
         Generate action plan based on user message
         FIXED: Properly handles LLM response parsing
@@ -34,28 +136,40 @@ class AgentBrain:
         print(f"\n📨 Processing message from user {user_id}: {user_message}")
         
         # Get user's available tools
-        asana_token = db_manager.get_user_token(user_id, 'asana')
-        gmail_token = db_manager.get_user_token(user_id, 'google')
-        
-        has_asana = bool(asana_token)
-        has_gmail = bool(gmail_token)
+        capabilities = db_manager.get_user_capabilities(user_id)
+        asana = self._asana_metadata(user_id, capabilities)
+        has_asana = 'asana' in capabilities
+        has_gmail = 'google' in capabilities
         
         print(f"   Available tools: Asana={has_asana}, Gmail={has_gmail}")
         
+        started = time.perf_counter()
+        tool_flags = (has_asana, has_gmail)
+        cached, path = self._lookup_cached_plan(user_message, tool_flags, use_cache)
+        embedding = None
+        if cached is None and self._wants_embedding(use_cache):
+            embedding = self._embed(user_message)
+            cached = self._semantic_plan(embedding, user_message, tool_flags)
+        if cached is not None:
+            cached = self._serve_cached_plan(cached, path, started, asana)
+            self._save_pending_actions(user_id, cached)
+            return cached
+        
         # Build prompt
-        prompt = self._build_planning_prompt(user_message, has_asana, has_gmail)
+        prompt = self._build_planning_prompt(user_message, capabilities, asana)
         
+        tier = self._select_tier(user_message, has_asana, has_gmail)
         try:
-            print("🤖 Generating action plan with LLM...")
-            response = self.llm.invoke(prompt)
+            print(f"🤖 Generating action plan with LLM ({tier} tier)...")
+            response, actions = self._generate_plan(prompt, tier, user_message)
             print(f"   LLM Raw Response: {response[:200]}...")
-            
-            # Parse response - handle different formats
-            actions = self._parse_llm_response(response)
+            self._record_latency('llm', started)
+            if use_cache:
+                self._store_plan(user_message, tool_flags, embedding, actions)
             
             # Save to pending actions table
-            for action in actions:
-                self._save_pending_action(user_id, action)
+            actions = self._resolve_asana_projects(actions, asana)
+            self._save_pending_actions(user_id, actions)
             
             print(f"✅ Generated {len(actions)} action(s)")
             return actions
@@ -70,8 +184,358 @@ class AgentBrain:
             traceback.print_exc()
             return []
     
+    async def aget_agent_plan(self, user_id: int, user_message: str,
+                              use_cache: bool = True) -> List[Dict]:
+        """
+        Async variant of get_agent_plan
+        LLM generation and database calls are awaited so the event loop stays free
+        """
+        print(f"\n📨 Processing message from user {user_id}: {user_message}")
+        
+        # Get user's available tools
+        capabilities = await async_db.get_user_capabilities(user_id)
+        asana = self._asana_metadata(user_id, capabilities)
+        has_asana = 'asana' in capabilities
+        has_gmail = 'google' in capabilities
+        
+        print(f"   Available tools: Asana={has_asana}, Gmail={has_gmail}")
+        
+        started = time.perf_counter()
+        tool_flags = (has_asana, has_gmail)
+        cached, path = self._lookup_cached_plan(user_message, tool_flags, use_cache)
+        embedding = None
+        if cached is None and self._wants_embedding(use_cache):
+            embedding = await self._aembed(user_message)
+            cached = self._semantic_plan(embedding, user_message, tool_flags)
+        if cached is not None:
+            cached = self._serve_cached_plan(cached, path, started, asana)
+            await self._asave_pending_actions(user_id, cached)
+            return cached
+        
+        # Build prompt
+        prompt = self._build_planning_prompt(user_message, capabilities, asana)
+        
+        tier = self._select_tier(user_message, has_asana, has_gmail)
+        try:
+            print(f"🤖 Generating action plan with LLM ({tier} tier)...")
+            response, actions = await self._agenerate_plan(prompt, tier, user_message)
+            print(f"   LLM Raw Response: {response[:200]}...")
+            self._record_latency('llm', started)
+            if use_cache:
+                self._store_plan(user_message, tool_flags, embedding, actions)
+            
+            # Save to pending actions table
+            actions = self._resolve_asana_projects(actions, asana)
+            await self._asave_pending_actions(user_id, actions)
+            
+            print(f"✅ Generated {len(actions)} action(s)")
+            return actions
+            
+        except Exception as e:
+            print(f"❌ Error in aget_agent_plan: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+    
+    async def astream_agent_plan(self, user_id: int, user_message: str,
+                                 use_cache: bool = True) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of aget_agent_plan
+        Yields {"action_id", "action"} for each action as soon as the model closes it
+        """
+        print(f"\n📨 Streaming plan for user {user_id}: {user_message}")
+        
+        capabilities = await async_db.get_user_capabilities(user_id)
+        asana = self._asana_metadata(user_id, capabilities)
+        has_asana = 'asana' in capabilities
+        has_gmail = 'google' in capabilities
+        
+        started = time.perf_counter()
+        tool_flags = (has_asana, has_gmail)
+        cached, path = self._lookup_cached_plan(user_message, tool_flags, use_cache)
+        embedding = None
+        if cached is None and self._wants_embedding(use_cache):
+            embedding = await self._aembed(user_message)
+            cached = self._semantic_plan(embedding, user_message, tool_flags)
+        if cached is not None:
+            cached = self._serve_cached_plan(cached, path, started, asana)
+            action_ids = await self._asave_pending_actions(user_id, cached)
+            for action_id, action in zip(action_ids, cached):
+                yield {"action_id": action_id, "action": action}
+            return
+        
+        prompt = self._build_planning_prompt(user_message, capabilities, asana)
+        tier = self._select_tier(user_message, has_asana, has_gmail)
+        actions = []
+        
+        try:
+            async for action in self._astream_plan(prompt, tier, user_message):
+                # The cache keeps project names; ids are per user
+                actions.append(action)
+                action = self._resolve_asana_projects([action], asana)[0]
+                action_id = await self._asave_pending_action(user_id, action)
+                yield {"action_id": action_id, "action": action}
+            
+            self._record_latency('llm', started)
+            if use_cache:
+                self._store_plan(user_message, tool_flags, embedding, actions)
+            print(f"✅ Streamed {len(actions)} action(s)")
+            
+        except Exception as e:
+            print(f"❌ Error in astream_agent_plan: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def _select_tier(self, user_message: str, has_asana: bool, has_gmail: bool) -> str:
+        """Pick the model tier for a request ('large' when tiering is off)"""
+        if not self.model_router:
+            return 'large'
+        return self.model_router.select_tier(user_message, int(has_asana) + int(has_gmail))
+    
+    def _llm_for(self, tier: str):
+        """LLM serving a tier"""
+        if tier == 'small' and self.small_llm is not None:
+            return self.small_llm
+        return self.llm
+    
+    def _record_tier(self, tier: str, started: float, parsed: bool):
+        if self.model_router:
+            self.model_router.record(tier, (time.perf_counter() - started) * 1000, parsed)
+    
+    def _escalate(self, tier: str) -> bool:
+        """Whether unusable output from this tier should be retried on the large model"""
+        if tier != 'small' or not self.model_router:
+            return False
+        self.model_router.record_escalation()
+        print("   ↗️ Small-tier output unusable, escalating to the large model")
+        return True
+    
+    def _generate_plan(self, prompt: str, tier: str, user_message: str = "") -> Tuple[str, List[Dict]]:
+        """Generate and parse a plan, escalating unparseable small-tier output"""
+        started = time.perf_counter()
+        budget = self.budgets.for_request(tier, user_message)
+        closed = []
+        try:
+            response = self._llm_for(tier).invoke(prompt, **self._generation_kwargs(budget, closed))
+            response = self._finish_generation(budget, response, closed)
+        except DeadlineExceeded as e:
+            response = self._salvage_partial(budget, e.partial)
+        actions = self._try_parse_llm_response(response)
+        self._record_tier(tier, started, actions is not None)
+        if actions is None and self._escalate(tier):
+            return self._generate_plan(prompt, 'large', user_message)
+        return response, actions or []
+    
+    async def _agenerate_plan(self, prompt: str, tier: str, user_message: str = "") -> Tuple[str, List[Dict]]:
+        """Async variant of _generate_plan"""
+        started = time.perf_counter()
+        budget = self.budgets.for_request(tier, user_message)
+        response = await self._agenerate(prompt, tier, budget)
+        actions = self._try_parse_llm_response(response)
+        self._record_tier(tier, started, actions is not None)
+        if actions is None and self._escalate(tier):
+            return await self._agenerate_plan(prompt, 'large', user_message)
+        return response, actions or []
+    
+    async def _astream_plan(self, prompt: str, tier: str, user_message: str = "") -> AsyncIterator[Dict]:
+        """Stream actions from a tier, escalating when small-tier output is unusable"""
+        started = time.perf_counter()
+        budget = self.budgets.for_request(tier, user_message)
+        deadline_at = time.monotonic() + budget['deadline']
+        parser = IncrementalActionParser()
+        text = []
+        outcome = 'completed'
+        
+        async with self.scheduler.slot('stream'):
+            stream = self._llm_for(tier).astream(prompt, stop=budget['stop'],
+                                                 options={"num_predict": budget['num_predict']})
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(),
+                                                       max(0.0, deadline_at - time.monotonic()))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        # Out of time: the actions already yielded are the plan
+                        outcome = 'deadline'
+                        print(f"   ⏱️ Generation deadline hit after {parser.emitted} action(s)")
+                        break
+                    text.append(chunk)
+                    for action in parser.feed(chunk):
+                        yield action
+                    # Stop generating once the root JSON value has closed
+                    if parser.complete:
+                        outcome = 'closure_stop'
+                        break
+            finally:
+                await stream.aclose()
+        if outcome == 'completed' and not parser.complete and text:
+            # Cut off mid-plan (num_predict); the actions already yielded are kept
+            outcome = 'truncated'
+        self.budgets.record(tier, outcome)
+        
+        for action in parser.finish():
+            yield action
+        
+        parsed = parser.emitted > 0 or self._try_parse_llm_response("".join(text)) is not None
+        self._record_tier(tier, started, parsed)
+        if not parsed and outcome != 'deadline' and self._escalate(tier):
+            async for action in self._astream_plan(prompt, 'large', user_message):
+                yield action
+    
+    async def _call_llm(self, prompt: str, tier: str = 'large', budget: Dict = None) -> str:
+        """Single async generation against the LLM serving a tier, within an optional budget"""
+        if budget is None:
+            return await self._llm_for(tier).ainvoke(prompt)
+        closed = []
+        try:
+            response = await self._llm_for(tier).ainvoke(prompt, **self._generation_kwargs(budget, closed))
+        except DeadlineExceeded as e:
+            return self._salvage_partial(budget, e.partial)
+        return self._finish_generation(budget, response, closed)
+    
+    async def _agenerate(self, prompt: str, tier: str = 'large', budget: Dict = None) -> str:
+        """Run a planning generation in one of the scheduler's slots"""
+        async with self.scheduler.slot():
+            return await self._call_llm(prompt, tier, budget)
+    
+    @staticmethod
+    def _generation_kwargs(budget: Dict, closed: List[bool]) -> Dict:
+        """
+        LLM call kwargs enforcing a budget
+        Ollama strips stop strings from its output, so closure of the action array
+        is detected client-side and ends the stream; `closed` records that it did
+        """
+        def make_stop_check():
+            parser = IncrementalActionParser()
+            
+            def check(chunk: str) -> bool:
+                parser.feed(chunk)
+                if parser.complete:
+                    closed.append(True)
+                return parser.complete
+            return check
+        
+        return {
+            "stop": budget['stop'],
+            "options": {"num_predict": budget['num_predict']},
+            "deadline": budget['deadline'],
+            "make_stop_check": make_stop_check
+        }
+    
+    def _finish_generation(self, budget: Dict, response: str, closed: List[bool]) -> str:
+        """
+        Record how a budgeted generation ended and return the text to parse
+        Output that stopped before the plan closed, usually at num_predict, is
+        cut down to its complete actions; with none, it is returned unchanged
+        so the caller can escalate
+        """
+        if closed:
+            self.budgets.record(budget['tier'], 'closure_stop')
+            return response
+        parser = IncrementalActionParser()
+        actions = parser.feed(response)
+        if parser.complete:
+            self.budgets.record(budget['tier'], 'completed')
+            return response
+        actions += parser.finish()
+        self.budgets.record(budget['tier'], 'truncated')
+        print(f"   ✂️ Generation ended mid-plan, keeping {len(actions)} complete action(s)")
+        return json.dumps(actions) if actions else response
+    
+    def _salvage_partial(self, budget: Dict, partial: str) -> str:
+        """Keep the complete actions from a generation cut off by its deadline"""
+        self.budgets.record(budget['tier'], 'deadline')
+        parser = IncrementalActionParser()
+        actions = parser.feed(partial) + parser.finish()
+        print(f"   ⏱️ Generation deadline hit, keeping {len(actions)} complete action(s)")
+        return json.dumps(actions)
+    
+    def _fast_path_plan(self, user_message: str, has_asana: bool, has_gmail: bool) -> Optional[List[Dict]]:
+        """Deterministic plan for formulaic commands (None falls through to the LLM)"""
+        if not self.intent_router:
+            return None
+        return self.intent_router.route(user_message, has_asana, has_gmail)
+    
+    def _record_latency(self, path: str, started: float):
+        """Record planning time for the path that produced the plan"""
+        self.path_latency[path].record((time.perf_counter() - started) * 1000)
+    
+    def _embed(self, user_message: str) -> Optional[List[float]]:
+        """Embed a message for the semantic cache (None on failure)"""
+        try:
+            return self.embeddings.embed_query(PlanCache.normalize(user_message))
+        except Exception as e:
+            print(f"Warning: Could not embed message: {e}")
+            return None
+    
+    async def _aembed(self, user_message: str) -> Optional[List[float]]:
+        """Async variant of _embed"""
+        try:
+            return await self.embeddings.aembed_query(PlanCache.normalize(user_message))
+        except Exception as e:
+            print(f"Warning: Could not embed message: {e}")
+            return None
+    
+    def _semantic_plan(self, embedding: Optional[List[float]], user_message: str,
+                       tool_flags: tuple) -> Optional[List[Dict]]:
+        """Reuse the plan skeleton of a similar past message, if any"""
+        if embedding is None:
+            return None
+        match = self.semantic_cache.lookup(embedding, tool_flags)
+        if match is None:
+            return None
+        skeleton, score = match
+        actions = reextract_parameters(skeleton, user_message)
+        if actions is not None:
+            print(f"   Semantic cache match (similarity {score:.3f})")
+        return actions
+    
+    def _lookup_cached_plan(self, user_message: str, tool_flags: Tuple[bool, bool],
+                            use_cache: bool) -> Tuple[Optional[List[Dict]], str]:
+        """
+        A plan that needs no generation, and the path it came from
+        Formulaic commands skip the LLM entirely, repeated ones come from the
+        exact cache. The semantic cache needs an embedding, which the caller
+        computes (sync or async) when _wants_embedding() says so.
+        """
+        plan = self._fast_path_plan(user_message, *tool_flags)
+        if plan is not None:
+            return plan, 'fast_path'
+        if use_cache:
+            plan = self.plan_cache.get(self.plan_cache.make_key(user_message, *tool_flags))
+        return plan, 'cache'
+    
+    def _wants_embedding(self, use_cache: bool) -> bool:
+        """Whether a miss in _lookup_cached_plan should go on to the semantic cache"""
+        return use_cache and self.semantic_cache is not None
+    
+    def _serve_cached_plan(self, plan: List[Dict], path: str, started: float,
+                           asana: Optional[AsanaMetadata]) -> List[Dict]:
+        """Record a plan served without generation and resolve it for this user"""
+        print(f"⚡ Planned via {path} ({len(plan)} action(s))")
+        self._record_latency(path, started)
+        # Cached plans keep project names; ids are per user
+        return self._resolve_asana_projects(plan, asana)
+    
+    def _store_plan(self, user_message: str, tool_flags: Tuple[bool, bool],
+                    embedding: Optional[List[float]], actions: List[Dict]):
+        """Store a freshly generated plan in the cache tiers"""
+        if not actions:
+            return
+        cache_key = self.plan_cache.make_key(user_message, *tool_flags)
+        self.plan_cache.put(cache_key, actions)
+        if self.semantic_cache and embedding is not None:
+            self.semantic_cache.add(embedding, cache_key[1], actions)
+    
     def _parse_llm_response(self, response: str) -> List[Dict]:
         """Parse LLM response, handling different formats"""
+        actions = self._try_parse_llm_response(response)
+        return actions if actions is not None else []
+    
+    def _try_parse_llm_response(self, response: str) -> Optional[List[Dict]]:
+        """Like _parse_llm_response, but None when the output is not a usable plan"""
         try:
             # Clean the response
             response = response.strip()
@@ -85,155 +549,399 @@ class AgentBrain:
             data = json.loads(response)
             
             # Handle different response formats
+            actions = None
             if isinstance(data, list):
-                return data
+                actions = data
             elif isinstance(data, dict):
                 if 'actions' in data:
-                    return data['actions']
+                    actions = data['actions']
                 elif 'plan' in data:
-                    return data['plan']
+                    actions = data['plan']
                 elif 'tools' in data:
-                    return data['tools']
+                    actions = data['tools']
                 else:
                     # Try to extract any list from dict values
                     for value in data.values():
                         if isinstance(value, list):
-                            return value
-            return []
+                            actions = value
+                            break
+            
+            if not isinstance(actions, list) or not all(isinstance(a, dict) for a in actions):
+                return None
+            return actions
         except Exception as e:
             print(f"Warning: Could not parse response: {e}")
-            return []
+            return None
     
-    def _build_planning_prompt(self, user_message: str, has_asana: bool, has_gmail: bool) -> str:
-        """Build the LLM prompt for planning"""
-        available_tools = []
-        
-        if has_asana:
-            available_tools.append("- create_asana_task: Create a task in Asana (requires: name, notes, project_id)")
-        
-        if has_gmail:
-            available_tools.append("- send_gmail: Send an email via Gmail (requires: to, subject, body)")
+    @staticmethod
+    def _available_tools(capabilities: Dict[str, Dict]) -> List[str]:
+        """Tool lines for the providers in a get_user_capabilities snapshot"""
+        return [line for provider, lines in PROVIDER_TOOLS.items() if provider in capabilities
+                for line in lines]
+    
+    def _build_planning_prompt(self, user_message: str, capabilities: Dict[str, Dict],
+                               asana: Optional[AsanaMetadata] = None) -> str:
+        """Build the LLM prompt for planning: static prefix + per-request suffix"""
+        available_tools = self._available_tools(capabilities)
         
         tools_str = "\n".join(available_tools) if available_tools else "No tools available"
         
-        return f"""
-        You are Gaprio AI Assistant. Analyze the user's request and generate appropriate actions.
-        
-        USER REQUEST: "{user_message}"
-        
-        AVAILABLE TOOLS:
-        {tools_str}
-        
-        INSTRUCTIONS:
-        1. Only generate actions for available tools
-        2. Extract parameters from the user's message
-        3. For emails, extract recipient, subject, and body
-        4. For tasks, extract task name and description
-        5. For project_id, leave as empty string if not specified
-        6. Output ONLY a JSON array of action objects
-        7. DO NOT include any other text or explanations
-        
-        OUTPUT FORMAT: A JSON array like this:
-        [
-          {{
-            "tool": "create_asana_task",
-            "provider": "asana",
-            "parameters": {{
-              "name": "Task title here",
-              "notes": "Task description here",
-              "project_id": ""
-            }}
-          }}
-        ]
-        
-        If no action is needed, return empty array: []
+        projects_str = ""
+        if asana is not None and asana.projects:
+            names = asana.project_names(user_message, self.prompt_projects)
+            projects_str = "\nASANA PROJECTS:\n" + "\n".join(f"- {name}" for name in names) + "\n"
         
-        Generate actions now:
+        return PLANNING_PREFIX + f"""AVAILABLE TOOLS:
+{tools_str}
+{projects_str}
+USER REQUEST: "{user_message}"
+
+Generate actions now:
+"""
+    
+    def _asana_metadata(self, user_id: int, capabilities: Dict[str, Dict]) -> Optional[AsanaMetadata]:
+        """Cached Asana projects for a user with Asana connected (never a live Asana call)"""
+        if 'asana' not in capabilities:
+            return None
+        return self.asana_metadata.get(user_id, capabilities['asana'].get('metadata'))
+    
+    @staticmethod
+    def _resolve_asana_projects(actions: List[Dict], asana: Optional[AsanaMetadata]) -> List[Dict]:
+        """
+        Copies of the actions with project names in create_asana_task replaced by their ids
+        A name that doesn't resolve (no metadata yet, or a plan cached for another
+        user) is blanked, since Asana rejects a task whose project isn't a gid
         """
+        resolved = []
+        for action in actions:
+            parameters = action.get('parameters') or {}
+            project = parameters.get('project_id')
+            # Asana gids are numeric; anything else is a name from the prompt
+            if action.get('tool') == 'create_asana_task' and isinstance(project, str) \
+                    and project and not project.isdigit():
+                gid = asana.project_id(project) if asana is not None else None
+                action = {**action, "parameters": {**parameters, "project_id": gid or ""}}
+            resolved.append(action)
+        return resolved
+    
+    @staticmethod
+    def _action_type_for(tool: str) -> str:
+        """Map a tool name to its action_type column value"""
+        if tool == 'create_asana_task':
+            return 'create_task'
+        elif tool == 'send_gmail':
+            return 'send_email'
+        return tool
     
     def _save_pending_action(self, user_id: int, action: Dict) -> Optional[int]:
         """Save action to pending actions table"""
         try:
-            # Extract action type
-            tool = action.get('tool', '')
-            provider = action.get('provider', '')
-            
-            # Map tool to action_type
-            if tool == 'create_asana_task':
-                action_type = 'create_task'
-            elif tool == 'send_gmail':
-                action_type = 'send_email'
-            else:
-                action_type = tool
-            
             # Save to database
             return db_manager.create_pending_action(
                 user_id=user_id,
-                provider=provider,
-                action_type=action_type,
+                provider=action.get('provider', ''),
+                action_type=self._action_type_for(action.get('tool', '')),
+                draft_payload=action
+            )
+        except Exception as e:
+            print(f"Error saving pending action: {e}")
+            return None
+    
+    async def _asave_pending_action(self, user_id: int, action: Dict) -> Optional[int]:
+        """Async variant of _save_pending_action"""
+        try:
+            return await async_db.create_pending_action(
+                user_id=user_id,
+                provider=action.get('provider', ''),
+                action_type=self._action_type_for(action.get('tool', '')),
                 draft_payload=action
             )
         except Exception as e:
             print(f"Error saving pending action: {e}")
             return None
     
+    def _pending_rows(self, actions: List[Dict]) -> List[Dict]:
+        """Rows for create_pending_actions"""
+        return [{
+            "provider": action.get('provider', ''),
+            "action_type": self._action_type_for(action.get('tool', '')),
+            "draft_payload": action
+        } for action in actions]
+    
+    def _save_pending_actions(self, user_id: int, actions: List[Dict]) -> List[Optional[int]]:
+        """Save a whole plan with one multi-row insert; ids in plan order"""
+        try:
+            action_ids = db_manager.create_pending_actions(user_id, self._pending_rows(actions))
+        except Exception as e:
+            print(f"Error saving pending actions: {e}")
+            action_ids = []
+        return action_ids or [None] * len(actions)
+    
+    async def _asave_pending_actions(self, user_id: int, actions: List[Dict]) -> List[Optional[int]]:
+        """Async variant of _save_pending_actions"""
+        try:
+            action_ids = await async_db.create_pending_actions(user_id, self._pending_rows(actions))
+        except Exception as e:
+            print(f"Error saving pending actions: {e}")
+            action_ids = []
+        return action_ids or [None] * len(actions)
+    
     def get_pending_actions(self, user_id: int) -> List[Dict]:
         """Get pending actions for a user"""
         return db_manager.get_pending_actions(user_id, 'pending')
     
-    def approve_action(self, action_id: int) -> Dict:
-        """Approve and execute a pending action"""
+    async def aget_pending_actions(self, user_id: int) -> List[Dict]:
+        """Async variant of get_pending_actions"""
+        return await async_db.get_pending_actions(user_id, 'pending')
+    
+    async def aget_pending_actions_page(self, user_id: int, limit: int = None, cursor: str = None,
+                                        fields: List[str] = None) -> Dict:
+        """One page of a user's pending actions: {"actions", "next_cursor"}"""
+        return await async_db.get_pending_actions_page(user_id, 'pending', limit, cursor, fields)
+    
+    def warm_up(self) -> Dict:
+        """
+        Load every planning model and evaluate the static prompt prefix
+        Run at startup so the first real request doesn't pay for a cold load
+        """
+        results = {}
+        for tier, llm in (('large', self.llm), ('small', self.small_llm)):
+            if isinstance(llm, LLMPool):
+                results[tier] = llm.warm_up(PLANNING_PREFIX)
+        return results
+    
+    def stats(self) -> Dict:
+        """Planner metrics for the /metrics endpoint"""
+        return {
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "scheduler": self.scheduler.stats(),
+            "llm_pool": self.llm.stats() if isinstance(self.llm, LLMPool) else None,
+            "model_tiers": self.model_router.stats() if self.model_router else None,
+            "budgets": self.budgets.stats(),
+            "fast_path": self.intent_router.stats() if self.intent_router else None,
+            "path_latency": {path: rec.stats() for path, rec in self.path_latency.items()},
+            "plan_cache": self.plan_cache.stats(),
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None,
+            "asana_metadata": self.asana_metadata.stats(),
+            "action_executor": self.executor.stats()
+        }
+    
+    def submit_action(self, action_id: int, user_id: int) -> Dict:
+        """
+        Claim one of user_id's pending actions and queue it for execution
+        Returns {"success": True, "status": "accepted"} straight away; the outcome
+        comes from wait_for_action() or await_action()
+        """
         try:
             print(f"⚡ Approving action {action_id}...")
             
             # Get action details
-            actions = db_manager.get_pending_actions()
-            action = next((a for a in actions if a['id'] == action_id), None)
+            action = db_manager.get_action_by_id(action_id)
             
-            if not action:
+            # Someone else's action is reported the same as a missing one
+            if not action or action['user_id'] != user_id:
                 return {"success": False, "error": "Action not found"}
+            if action.get('status') != 'pending':
+                return {"success": False, "error": f"Action already {action.get('status')}"}
             
-            user_id = action['user_id']
-            provider = action['provider']
-            draft_payload = action.get('draft_payload', {})
+            # Lock it so a concurrent approval can't execute it too
+            if not db_manager.claim_pending_actions([action_id], user_id):
+                return {"success": False, "error": "Action is no longer pending"}
             
-            print(f"   Action: {action.get('action_type')} for {provider}")
+            print(f"   Action: {action.get('action_type')} for {action['provider']}")
             
             # Get user token
-            token_data = db_manager.get_user_token(user_id, provider)
+            token_data = db_manager.get_user_token(action['user_id'], action['provider'])
             if not token_data:
-                return {"success": False, "error": f"No {provider} token found"}
-            
-            # Execute action
-            result = None
-            if provider == 'asana' and draft_payload.get('tool') == 'create_asana_task':
-                print("   Executing Asana task creation...")
-                asana_api = AsanaAPI(token_data['access_token'])
-                result = asana_api.create_task(draft_payload.get('parameters', {}))
-            
-            elif provider == 'google' and draft_payload.get('tool') == 'send_gmail':
-                print("   Executing Gmail send...")
-                from tools.google_tool import send_gmail
-                result = send_gmail(token_data['access_token'], draft_payload.get('parameters', {}))
-            
-            # Update action status
-            status = 'executed' if result and 'error' not in result else 'rejected'
-            db_manager.update_action_status(action_id, status)
-            
-            return {
-                "success": status == 'executed',
-                "status": status,
-                "result": result
-            }
+                db_manager.update_action_status(action_id, 'pending')
+                return {"success": False, "error": f"No {action['provider']} token found"}
+            
+            try:
+                self.executor.submit(action, token_data)
+            except QueueFull as e:
+                db_manager.update_action_status(action_id, 'pending')
+                return {"success": False, "error": f"Action queue is full: {e}"}
+            
+            return {"success": True, "status": "accepted", "action_id": action_id}
             
         except Exception as e:
             print(f"Error approving action: {e}")
             return {"success": False, "error": str(e)}
+    
+    def wait_for_action(self, action_id: int, user_id: int, timeout: float = None) -> Dict:
+        """
+        Block until one of user_id's submitted actions finishes and return its outcome
+        On timeout the current state ('queued' or 'running') is returned instead;
+        actions this process no longer tracks are answered from the database
+        """
+        future = self.executor.future(action_id, user_id)
+        if future is None:
+            action = db_manager.get_action_by_id(action_id)
+            if not action or action['user_id'] != user_id:
+                return {"success": False, "error": "Action not found"}
+            return {"success": action.get('status') == 'executed', "status": action.get('status')}
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            return {"success": False, **self.executor.status(action_id)}
+    
+    async def await_action(self, action_id: int, user_id: int, timeout: float = None) -> Dict:
+        """Async counterpart of wait_for_action that doesn't hold a thread while waiting"""
+        future = self.executor.future(action_id, user_id)
+        if future is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self.wait_for_action, action_id, user_id)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            return {"success": False, **self.executor.status(action_id)}
+    
+    def approve_action(self, action_id: int, user_id: int) -> Dict:
+        """Approve and execute one of user_id's pending actions"""
+        accepted = self.submit_action(action_id, user_id)
+        if not accepted.get("success"):
+            return accepted
+        return self.wait_for_action(action_id, user_id)
+    
+    def _queue_claimed(self, action_ids: List[int], user_id: int, record: bool) -> Tuple[Dict[int, Dict], Dict[int, Future], Dict[int, str]]:
+        """
+        Claim user_id's pending actions among action_ids in one query and queue them
+        Asana tasks sharing a token are queued in groups of ASANA_BATCH_SIZE, each
+        sent as one /batch request. Returns per-id results so far, the futures of the queued
+        actions and the statuses to write for actions that were claimed but
+        couldn't be queued
+        """
+        claimed = db_manager.claim_pending_actions(action_ids, user_id)
+        results = {
+            action_id: {"success": False, "error": "Action not found or not pending"}
+            for action_id in action_ids
+        }
+        
+        tokens = {}
+        statuses = {}
+        groups = []
+        batches = {}
+        for action in claimed:
+            key = (action['user_id'], action['provider'])
+            if key not in tokens:
+                tokens[key] = db_manager.get_user_token(*key)
+            if not tokens[key]:
+                statuses[action['id']] = 'pending'
+                results[action['id']] = {"success": False, "error": f"No {action['provider']} token found"}
+            elif self._batchable(action):
+                # One /batch request per group, so large approvals still spread over the workers
+                if key not in batches or len(batches[key]) >= ASANA_BATCH_SIZE:
+                    batches[key] = []
+                    groups.append((key, batches[key]))
+                batches[key].append(action)
+            else:
+                groups.append((key, [action]))
+        
+        futures = {}
+        for key, group in groups:
+            try:
+                group_futures = self.executor.submit_many(group, tokens[key], record=record)
+            except QueueFull as e:
+                for action in group:
+                    statuses[action['id']] = 'pending'
+                    results[action['id']] = {"success": False, "error": f"Action queue is full: {e}"}
+                continue
+            for action, future in zip(group, group_futures):
+                futures[action['id']] = future
+                results[action['id']] = {"success": True, "status": "accepted", "action_id": action['id']}
+        return results, futures, statuses
+    
+    def submit_actions(self, action_ids: List[int], user_id: int) -> Dict[int, Dict]:
+        """Claim several of user_id's actions and queue them; each result is 'accepted' or an error"""
+        action_ids = list(dict.fromkeys(action_ids))
+        print(f"⚡ Queueing {len(action_ids)} action(s)...")
+        results, _, statuses = self._queue_claimed(action_ids, user_id, record=True)
+        if statuses:
+            db_manager.update_actions_status(statuses)
+        return results
+    
+    def approve_actions(self, action_ids: List[int], user_id: int, timeout: float = None) -> Dict[int, Dict]:
+        """
+        Approve and execute several of user_id's actions
+        They are loaded and locked in one query, run concurrently on the provider
+        worker pools, and their final statuses are written in one UPDATE; ids that
+        aren't user_id's or aren't pending are reported, not run. Actions still
+        unfinished after `timeout` seconds are reported with their current state
+        ('queued' or 'running') and record their own status when they finish.
+        """
+        action_ids = list(dict.fromkeys(action_ids))
+        print(f"⚡ Approving {len(action_ids)} action(s)...")
+        results, futures, statuses = self._queue_claimed(action_ids, user_id, record=False)
+        
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for action_id, future in futures.items():
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            try:
+                outcome = future.result(remaining)
+            except FutureTimeout:
+                results[action_id] = {"success": False, **self.executor.status(action_id)}
+                future.add_done_callback(lambda done, action_id=action_id: self._record_outcome(action_id, done))
+                continue
+            statuses[action_id] = outcome["status"]
+            results[action_id] = outcome
+        
+        if statuses:
+            db_manager.update_actions_status(statuses)
+        return results
+    
+    @staticmethod
+    def _record_outcome(action_id: int, future: Future):
+        """Write the status of an action that finished after approve_actions stopped waiting"""
+        try:
+            db_manager.update_action_status(action_id, future.result()["status"])
+        except Exception as e:
+            print(f"Error recording status of action {action_id}: {e}")
+    
+    @staticmethod
+    def _batchable(action: Dict) -> bool:
+        """Actions _execute_actions can send together"""
+        payload = action.get('draft_payload') or {}
+        return action['provider'] == 'asana' and payload.get('tool') == 'create_asana_task'
+    
+    def _execute_actions(self, actions: List[Dict], token_data: Dict) -> List[Optional[Dict]]:
+        """Run one token's actions together: Asana tasks through /batch, anything else one by one"""
+        if not all(self._batchable(action) for action in actions):
+            return [self._execute_action(action, token_data) for action in actions]
+        
+        print(f"   Executing {len(actions)} Asana task creation(s) in batch...")
+        asana = self.asana_metadata.get(actions[0]['user_id']) if 'user_id' in actions[0] else None
+        payloads = self._resolve_asana_projects([action['draft_payload'] for action in actions], asana)
+        asana_api = AsanaAPI(token_data['access_token'])
+        return asana_api.create_tasks([payload.get('parameters', {}) for payload in payloads])
+    
+    def _execute_action(self, action: Dict, token_data: Dict) -> Optional[Dict]:
+        """Run an action's tool call with the user's token"""
+        provider = action['provider']
+        draft_payload = action.get('draft_payload', {})
+        
+        result = None
+        if provider == 'asana' and draft_payload.get('tool') == 'create_asana_task':
+            print("   Executing Asana task creation...")
+            # Rows saved with a project name still resolve (or are blanked) here
+            asana = self.asana_metadata.get(action['user_id']) if 'user_id' in action else None
+            draft_payload = self._resolve_asana_projects([draft_payload], asana)[0]
+            asana_api = AsanaAPI(token_data['access_token'])
+            result = asana_api.create_task(draft_payload.get('parameters', {}))
+        
+        elif provider == 'google' and draft_payload.get('tool') == 'send_gmail':
+            print("   Executing Gmail send...")
+            result = send_gmail(token_data['access_token'], draft_payload.get('parameters', {}))
+        
+        return result
 
 # Global instance
 agent_brain = AgentBrain()
 
 # Legacy function
-def get_agent_plan(user_id: int, user_message: str) -> List[Dict]:
+def get_agent_plan(user_id: int, user_message: str, use_cache: bool = True) -> List[Dict]:
     """Legacy function for backward compatibility"""
-    return agent_brain.get_agent_plan(user_id, user_message)
\ No newline at end of file
+    return agent_brain.get_agent_plan(user_id, user_message, use_cache)
+
+async def aget_agent_plan(user_id: int, user_message: str, use_cache: bool = True) -> List[Dict]:
+    """Async counterpart of the legacy get_agent_plan helper"""
+    return await agent_brain.aget_agent_plan(user_id, user_message, use_cache)
\ No newline at end of file
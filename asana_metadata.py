@@ -0,0 +1,218 @@
+"""
+asana_metadata.py - Per-user cache of Asana workspaces and projects for planning
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from database import db_manager
+from tools.asana_tool import AsanaAPI
+
+load_dotenv()
+
+Fetch = Callable[[int], Optional[Dict]]
+Persist = Callable[[int, Dict], bool]
+
+
+class AsanaMetadata:
+    """
+    One user's workspaces and projects, kept as tuples of (gid, name[, workspace gid])
+    Project names resolve case-insensitively to their gid.
+    """
+
+    __slots__ = ("fetched_at", "workspaces", "projects", "_by_name")
+
+    def __init__(self, workspaces: List[Dict], projects: List[Dict], fetched_at: float = None):
+        self.fetched_at = fetched_at or time.time()
+        self.workspaces: Tuple[Tuple[str, str], ...] = tuple((w['id'], w['name']) for w in workspaces)
+        self.projects: Tuple[Tuple[str, str, Optional[str]], ...] = tuple(
+            (p['id'], p['name'], p.get('workspace')) for p in projects)
+        self._by_name = {name.strip().lower(): gid for gid, name, _ in self.projects}
+
+    def project_id(self, name: str) -> Optional[str]:
+        """gid of the project called `name`, or None"""
+        return self._by_name.get(name.strip().lower()) if name else None
+
+    def project_names(self, message: str = "", limit: int = None) -> List[str]:
+        """Project names, those mentioned in `message` first"""
+        message = message.lower()
+        names = sorted((name for _, name, _ in self.projects), key=lambda n: n.lower() not in message)
+        return names[:limit] if limit else names
+
+    def to_document(self) -> Dict:
+        """JSON form stored in user_connections.metadata"""
+        return {
+            "fetched_at": self.fetched_at,
+            "workspaces": [list(w) for w in self.workspaces],
+            "projects": [list(p) for p in self.projects]
+        }
+
+    @classmethod
+    def from_document(cls, document: Dict) -> Optional["AsanaMetadata"]:
+        """Inverse of to_document(); None if `document` isn't one"""
+        try:
+            return cls(
+                [{"id": gid, "name": name} for gid, name in document["workspaces"]],
+                [{"id": gid, "name": name, "workspace": ws} for gid, name, ws in document["projects"]],
+                float(document["fetched_at"])
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+def fetch_from_asana(user_id: int) -> Optional[Dict]:
+    """Default fetch: the user's stored token and one fetch_metadata() call"""
+    token = db_manager.get_user_token(user_id, 'asana')
+    if not token:
+        return None
+    return AsanaAPI(token['access_token']).fetch_metadata()
+
+
+def persist_to_database(user_id: int, document: Dict) -> bool:
+    """Default persist: the asana row's user_connections.metadata"""
+    return db_manager.save_connection_metadata(user_id, 'asana', document)
+
+
+class AsanaMetadataCache:
+    """
+    LRU cache of AsanaMetadata keyed by user_id that never calls Asana on the caller's thread
+
+    An entry is fresh for ASANA_METADATA_TTL seconds. After that it is still
+    served, up to ASANA_METADATA_STALE_TTL, while a background refresh replaces
+    it (stale-while-revalidate). A user with no entry gets None and a refresh is
+    started, so the next request has it. With ASANA_METADATA_PERSIST=true each
+    refresh is also written to user_connections.metadata, and get() accepts that
+    stored copy to seed the cache after a restart.
+    """
+
+    def __init__(self, fetch: Fetch = None, persist: Persist = None, ttl_seconds: float = None,
+                 stale_ttl_seconds: float = None, max_entries: int = None, refresh_workers: int = None):
+        self.fetch = fetch or fetch_from_asana
+        if persist is None and os.getenv('ASANA_METADATA_PERSIST', 'false').lower() == 'true':
+            persist = persist_to_database
+        self.persist = persist
+        self.ttl_seconds = ttl_seconds or float(os.getenv('ASANA_METADATA_TTL', 900))
+        self.stale_ttl_seconds = stale_ttl_seconds or float(os.getenv('ASANA_METADATA_STALE_TTL', 86400))
+        self.max_entries = max_entries or int(os.getenv('ASANA_METADATA_CACHE_SIZE', 10000))
+        self._refresher = ThreadPoolExecutor(
+            max_workers=refresh_workers or int(os.getenv('ASANA_METADATA_REFRESH_WORKERS', 2)),
+            thread_name_prefix="asana-metadata"
+        )
+        self._entries: "OrderedDict[int, AsanaMetadata]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    def get(self, user_id: int, stored: Dict = None) -> Optional[AsanaMetadata]:
+        """
+        The user's metadata without blocking on Asana, or None while it is loading
+        `stored` is the persisted document (e.g. capabilities['asana']['metadata'])
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None and stored:
+                entry = AsanaMetadata.from_document(stored)
+                if entry is not None:
+                    self._store(user_id, entry)
+
+            age = time.time() - entry.fetched_at if entry is not None else None
+            if entry is None or age > self.stale_ttl_seconds:
+                self.misses += 1
+                entry = None
+            elif age > self.ttl_seconds:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(user_id)
+                return entry
+
+        self._schedule_refresh(user_id)
+        return entry
+
+    def _schedule_refresh(self, user_id: int):
+        with self._lock:
+            if user_id in self._refreshing:
+                return
+            self._refreshing.add(user_id)
+        try:
+            self._refresher.submit(self.refresh, user_id)
+        except RuntimeError:
+            # Closed; serve what we have
+            with self._lock:
+                self._refreshing.discard(user_id)
+
+    def refresh(self, user_id: int) -> Optional[AsanaMetadata]:
+        """Fetch from Asana now and store the result; a failed fetch keeps the old entry"""
+        try:
+            metadata = self.fetch(user_id)
+            # A connected account always has a workspace; none means the calls failed
+            if not metadata or not metadata.get('workspaces'):
+                with self._lock:
+                    self.refresh_errors += 1
+                return None
+
+            entry = AsanaMetadata(metadata['workspaces'], metadata.get('projects', []))
+            with self._lock:
+                self._store(user_id, entry)
+                self.refreshes += 1
+            if self.persist:
+                self.persist(user_id, entry.to_document())
+            return entry
+        except Exception as e:
+            print(f"Error refreshing Asana metadata for user {user_id}: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+            return None
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_id)
+
+    def _store(self, user_id: int, entry: AsanaMetadata):
+        current = self._entries.get(user_id)
+        if current is not None and current.fetched_at > entry.fetched_at:
+            return
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        """Forget a user's metadata, e.g. after they reconnect a different account"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def close(self):
+        """Stop background refreshes; one in flight is not waited for"""
+        self._refresher.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        """Hit/miss and refresh counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_ttl_seconds": self.stale_ttl_seconds,
+                "persist": self.persist is not None,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshing": len(self._refreshing),
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+            }
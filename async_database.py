@@ -0,0 +1,321 @@
+"""
+async_database.py - asyncio-native data access for the FastAPI handlers
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from database import (INSERTED_ACTIONS_QUERY, PENDING_ACTION_VALUES, PENDING_ACTIONS_INSERT,
+                      USER_TOKENS_QUERY, DatabaseManager, capabilities_from_tokens, confirmed_insert_ids,
+                      db_manager, finish_page, latest_tokens, pending_action_rows, pending_page_query)
+from token_cache import MISS
+
+try:
+    import aiomysql
+    from aiomysql import Error
+except ImportError:  # Optional: without it calls run on the sync pool's worker threads
+    aiomysql = None
+    Error = Exception
+
+
+class AsyncDatabaseManager:
+    """
+    Mirrors the DatabaseManager API on a non-blocking MySQL driver (aiomysql)
+
+    Queries run on the event loop against an async pool instead of occupying a
+    worker thread each. Until connect() succeeds every call falls back to the
+    sync manager via run_async, so callers never need to care which is active.
+    """
+
+    def __init__(self, fallback: DatabaseManager):
+        self.fallback = fallback
+        self.config = fallback.config
+        self.pool = None
+        self._autoinc_step = None
+        # user_id -> (token cache generation, in-flight load)
+        self._token_loads: Dict[int, Tuple[int, asyncio.Future]] = {}
+
+    async def connect(self) -> bool:
+        """Create the async connection pool"""
+        if aiomysql is None:
+            print("⚠️ aiomysql not installed, async database calls use worker threads")
+            return False
+        try:
+            self.pool = await aiomysql.create_pool(
+                host=self.config['host'],
+                port=self.config['port'],
+                user=self.config['user'],
+                password=self.config['password'],
+                db=self.config['database'],
+                minsize=int(os.getenv('DB_ASYNC_POOL_MIN', 1)),
+                maxsize=int(os.getenv('DB_ASYNC_POOL_SIZE', 20)),
+                pool_recycle=int(float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))),
+                autocommit=True
+            )
+            print(f"✅ Async database pool ready: {self.config['database']} (max {self.pool.maxsize})")
+            return True
+        except Exception as e:
+            print(f"❌ Async database connection error: {e}")
+            self.pool = None
+            return False
+
+    async def close(self):
+        """Close the async pool"""
+        if self.pool:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def _fetch(self, query: str, params: tuple, one: bool = False):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                return await (cursor.fetchone() if one else cursor.fetchall())
+
+    async def _write(self, query: str, params: tuple) -> int:
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                await conn.commit()
+                return cursor.lastrowid
+
+    async def get_user_token(self, user_id: int, provider: str) -> Optional[Dict]:
+        """Get OAuth token for a user and provider (shares the sync manager's token cache)"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.get_user_token, user_id, provider)
+        cache = self.fallback.token_cache
+        token = cache.get(user_id, provider)
+        if token is not MISS:
+            return token
+
+        generation, tokens = await self._load_user_tokens(user_id)
+        if tokens is None:
+            return None
+        cache.put_user(user_id, tokens, generation)
+        return tokens.get(provider)
+
+    async def get_user_capabilities(self, user_id: int) -> Dict[str, Dict]:
+        """Snapshot of a user's connected providers for the planner"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.get_user_capabilities, user_id)
+        cache = self.fallback.token_cache
+        tokens = cache.get_user(user_id)
+        if tokens is None:
+            generation, tokens = await self._load_user_tokens(user_id)
+            if tokens is None:
+                return {}
+            cache.put_user(user_id, tokens, generation)
+        return capabilities_from_tokens(tokens)
+
+    async def _load_user_tokens(self, user_id: int) -> Tuple[int, Optional[Dict[str, Optional[Dict]]]]:
+        """
+        One query per user even when several providers miss at once
+        Returns the token cache generation the load started at with its rows;
+        a load started before an invalidation isn't joined after it
+        """
+        generation = self.fallback.token_cache.generation(user_id)
+        load = self._token_loads.get(user_id)
+        if load is None or load[0] != generation or load[1].get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self.get_user_tokens(user_id))
+            load = (generation, task)
+            self._token_loads[user_id] = load
+            task.add_done_callback(lambda t: self._token_loads.pop(user_id, None)
+                                   if self._token_loads.get(user_id, (None, None))[1] is t else None)
+        return load[0], await asyncio.shield(load[1])
+
+    async def get_user_tokens(self, user_id: int) -> Optional[Dict[str, Optional[Dict]]]:
+        """All of a user's current tokens by provider in one query (None on error)"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.get_user_tokens, user_id)
+        try:
+            return latest_tokens(user_id, list(await self._fetch(USER_TOKENS_QUERY, (user_id,))))
+        except Error as e:
+            print(f"Error fetching token: {e}")
+            return None
+
+    async def save_chat_message(self, user_id: int, role: str, content: str) -> Optional[int]:
+        """Save a chat message to maintain context/memory"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.save_chat_message, user_id, role, content)
+        try:
+            query = """
+                INSERT INTO agent_chat_logs (user_id, role, content)
+                VALUES (%s, %s, %s)
+            """
+            message_id = await self._write(query, (user_id, role, content))
+            print(f"💾 Saved chat message: {role} - {content[:50]}...")
+            return message_id
+        except Error as e:
+            print(f"Error saving chat message: {e}")
+            return None
+
+    async def create_pending_action(self, user_id: int, provider: str,
+                                    action_type: str, draft_payload: Dict) -> Optional[int]:
+        """Create a draft action waiting for user approval"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.create_pending_action, user_id,
+                                                 provider, action_type, draft_payload)
+        try:
+            query = """
+                INSERT INTO ai_pending_actions
+                (user_id, provider, action_type, draft_payload, status)
+                VALUES (%s, %s, %s, %s, 'pending')
+            """
+            action_id = await self._write(query, (user_id, provider, action_type,
+                                                  json.dumps(draft_payload)))
+            print(f"📝 Created pending action {action_id}: {action_type}")
+            return action_id
+        except Error as e:
+            print(f"Error creating pending action: {e}")
+            return None
+
+    async def create_pending_actions(self, user_id: int, actions: List[Dict]) -> List[int]:
+        """
+        Create several draft actions in one multi-row INSERT; ids in input order
+        Ids are verified like the sync manager's, falling back to row-by-row inserts
+        """
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.create_pending_actions, user_id, actions)
+        if not actions:
+            return []
+        try:
+            rows = pending_action_rows(user_id, actions)
+            query = PENDING_ACTIONS_INSERT + ", ".join([PENDING_ACTION_VALUES] * len(rows))
+
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    if self._autoinc_step is None:
+                        await cursor.execute("SELECT @@auto_increment_increment")
+                        self._autoinc_step = int((await cursor.fetchone())[0])
+                    await conn.begin()
+                    await cursor.execute(query, tuple(value for row in rows for value in row))
+                    first_id = cursor.lastrowid
+                    await cursor.execute(INSERTED_ACTIONS_QUERY,
+                                         (first_id, first_id + (len(rows) - 1) * self._autoinc_step))
+                    action_ids = confirmed_insert_ids(first_id, self._autoinc_step, rows, await cursor.fetchall())
+                    if action_ids is None:
+                        print("⚠️ Bulk insert ids weren't consecutive, inserting row by row")
+                        await conn.rollback()
+                        await conn.begin()
+                        action_ids = []
+                        for row in rows:
+                            await cursor.execute(PENDING_ACTIONS_INSERT + PENDING_ACTION_VALUES, row)
+                            action_ids.append(cursor.lastrowid)
+                    await conn.commit()
+            print(f"📝 Created {len(action_ids)} pending action(s): {action_ids}")
+            return action_ids
+        except Error as e:
+            print(f"Error creating pending actions: {e}")
+            return []
+
+    async def get_pending_actions(self, user_id: Optional[int] = None,
+                                  status: str = 'pending') -> List[Dict]:
+        """Get pending actions awaiting approval"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.get_pending_actions, user_id, status)
+        try:
+            if user_id:
+                query = """
+                    SELECT id, user_id, provider, action_type, draft_payload, created_at
+                    FROM ai_pending_actions
+                    WHERE user_id = %s AND status = %s
+                    ORDER BY created_at DESC
+                """
+                params = (user_id, status)
+            else:
+                query = """
+                    SELECT id, user_id, provider, action_type, draft_payload, created_at
+                    FROM ai_pending_actions
+                    WHERE status = %s
+                    ORDER BY created_at DESC
+                """
+                params = (status,)
+
+            actions = await self._fetch(query, params)
+
+            # Parse JSON payload
+            for action in actions:
+                if 'draft_payload' in action and action['draft_payload']:
+                    try:
+                        action['draft_payload'] = json.loads(action['draft_payload'])
+                    except (TypeError, ValueError):
+                        action['draft_payload'] = {}
+
+            return list(actions)
+        except Error as e:
+            print(f"Error fetching pending actions: {e}")
+            return []
+
+    async def get_pending_actions_page(self, user_id: int, status: str = 'pending',
+                                       limit: int = None, cursor: Optional[str] = None,
+                                       fields: Optional[Sequence[str]] = None) -> Dict:
+        """One keyset-paginated page of a user's actions"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.get_pending_actions_page, user_id,
+                                                 status, limit, cursor, fields)
+        query, params, limit, columns = pending_page_query(user_id, status, limit, cursor, fields)
+        try:
+            page = finish_page(list(await self._fetch(query, params)), limit, columns)
+            if 'draft_payload' in columns:
+                DatabaseManager._decode_payloads(page["actions"])
+            return page
+        except Error as e:
+            print(f"Error fetching pending actions page: {e}")
+            return {"actions": [], "next_cursor": None}
+
+    async def update_action_status(self, action_id: int, status: str,
+                                   executed_data: Optional[Dict] = None) -> bool:
+        """Update status of a pending action"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.update_action_status, action_id,
+                                                 status, executed_data)
+        try:
+            if status == 'executed':
+                query = """
+                    UPDATE ai_pending_actions
+                    SET status = %s, executed_at = NOW()
+                    WHERE id = %s
+                """
+            else:
+                query = """
+                    UPDATE ai_pending_actions
+                    SET status = %s
+                    WHERE id = %s
+                """
+
+            await self._write(query, (status, action_id))
+            print(f"🔄 Updated action {action_id} status to: {status}")
+            return True
+        except Error as e:
+            print(f"Error updating action status: {e}")
+            return False
+
+    async def execute_query(self, query: str, params: tuple = None, fetch: bool = True) -> Any:
+        """Execute a generic query"""
+        if self.pool is None:
+            return await self.fallback.run_async(self.fallback.execute_query, query, params, fetch)
+        try:
+            if fetch:
+                return await self._fetch(query, params or ())
+            return await self._write(query, params or ())
+        except Error as e:
+            print(f"Query execution error: {e}")
+            return None
+
+    def stats(self) -> Dict:
+        """Async pool metrics"""
+        if self.pool is None:
+            return {"driver": None, "fallback": "sync pool"}
+        return {
+            "driver": "aiomysql",
+            "size": self.pool.size,
+            "max_size": self.pool.maxsize,
+            "idle": self.pool.freesize,
+            "in_use": self.pool.size - self.pool.freesize
+        }
+
+
+# Global instance
+async_db = AsyncDatabaseManager(db_manager)
@@ -0,0 +1,87 @@
+"""
+bench_action_executor.py - Approved-action throughput: inline execution vs per-provider worker pools
+
+Runs against local stub Asana and Gmail APIs with a fixed response delay, so the
+numbers show how much of the provider latency the worker pools overlap.
+Usage: python benchmarks/bench_action_executor.py [--actions N] [--delay S] [--workers 1 4 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tools.asana_tool as asana_tool  # noqa: E402
+import tools.google_tool as google_tool  # noqa: E402
+from action_executor import ActionExecutor  # noqa: E402
+from tests.stubs import ProviderHandler, StubServer  # noqa: E402
+from tools.http_client import ProviderHTTPClient  # noqa: E402
+
+TOKEN = {"access_token": "bench"}
+
+
+def make_actions(n: int):
+    """Alternating Asana tasks and Gmail sends"""
+    actions = []
+    for i in range(n):
+        if i % 2:
+            actions.append({"id": i, "provider": "google", "draft_payload": {
+                "tool": "send_gmail", "parameters": {"to": "a@example.com", "subject": f"#{i}", "body": ""}}})
+        else:
+            actions.append({"id": i, "provider": "asana", "draft_payload": {
+                "tool": "create_asana_task", "parameters": {"name": f"Task {i}", "notes": ""}}})
+    return actions
+
+
+def execute(action, token_data):
+    parameters = action['draft_payload']['parameters']
+    if action['provider'] == 'asana':
+        return asana_tool.AsanaAPI(token_data['access_token']).create_task(parameters)
+    return google_tool.send_gmail(token_data['access_token'], parameters)
+
+
+def bench_inline(actions) -> float:
+    start = time.perf_counter()
+    for action in actions:
+        execute(action, TOKEN)
+    return time.perf_counter() - start
+
+
+def bench_executor(actions, workers: int) -> float:
+    executor = ActionExecutor(execute, workers={"asana": workers, "google": workers},
+                              max_queue=len(actions))
+    start = time.perf_counter()
+    futures = [executor.submit(action, TOKEN) for action in actions]
+    failed = sum(1 for f in futures if not f.result()["success"])
+    elapsed = time.perf_counter() - start
+    executor.close()
+    if failed:
+        print(f"   ⚠️ {failed} action(s) failed")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05, help="stub API response time (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    with StubServer(ProviderHandler, delay=args.delay) as asana, \
+            StubServer(ProviderHandler, delay=args.delay) as gmail:
+        asana_tool.ASANA_API_URL = asana.url
+        google_tool.GMAIL_API_URL = gmail.url + "/gmail/v1"
+        client = ProviderHTTPClient(pool_size=max(args.workers))
+        asana_tool.http_client = google_tool.http_client = client
+
+        actions = make_actions(args.actions)
+        print(f"📊 {args.actions} actions, {args.delay * 1000:.0f} ms per provider call")
+        inline = bench_inline(actions)
+        print(f"   inline           {args.actions / inline:8.1f} actions/s")
+        for workers in args.workers:
+            elapsed = bench_executor(actions, workers)
+            print(f"   {workers:>2} per provider   {args.actions / elapsed:8.1f} actions/s "
+                  f"| {inline / elapsed:5.1f}x")
+        client.close()
@@ -0,0 +1,85 @@
+"""
+bench_asana_pagination.py - Reading a 50k-project workspace: load-all vs streaming iteration
+
+Runs against a local stub Asana that pages like the real API. Compares
+  - load-all: every page into one list of full project objects, then process
+  - stream:   iter_projects with opt_fields=name, processing items as they arrive
+  - stream + prefetch: the same, fetching the next page while the current one is processed
+Reports wall clock, then peak Python memory (tracemalloc, a separate pass since
+tracing slows everything down). The stub runs in a child process so neither
+its CPU nor its memory is counted.
+Usage: python benchmarks/bench_asana_pagination.py [--projects N] [--delay S] [--work-us N]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.stubs import ProviderHandler, StubServer  # noqa: E402
+from tools.asana_tool import AsanaAPI  # noqa: E402
+
+
+def make_projects(n: int):
+    return [{"gid": str(10 ** 15 + i), "name": f"Project {i}", "resource_type": "project",
+             "archived": False, "color": "light-blue", "notes": "Quarterly planning " * 8,
+             "owner": {"gid": "42", "resource_type": "user"}, "public": True}
+            for i in range(n)]
+
+
+def process(project, work_us: float):
+    # Stands in for whatever the caller does per project (index it, match a name...)
+    end = time.perf_counter() + work_us / 1e6
+    while time.perf_counter() < end:
+        pass
+    return project["name"]
+
+
+def load_all(api: AsanaAPI, work_us: float) -> int:
+    projects = list(api.iter_collection("/projects", {"workspace": "ws"}, prefetch=False))
+    return sum(1 for p in projects if process(p, work_us))
+
+
+def stream(api: AsanaAPI, work_us: float, prefetch: bool) -> int:
+    return sum(1 for p in api.iter_projects("ws", prefetch=prefetch) if process(p, work_us))
+
+
+def serve(projects: int, delay: float, ready):
+    with StubServer(ProviderHandler, delay=delay, collections={"/projects": make_projects(projects)}) as asana:
+        ready.put(asana.url)
+        asana.thread.join()
+
+
+def measure(label: str, fn):
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {label:<18} {count:>6} projects | {elapsed:7.2f} s | peak {peak / 2 ** 20:7.2f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=50000)
+    parser.add_argument("--delay", type=float, default=0.02, help="stub response time per page (s)")
+    parser.add_argument("--work-us", type=float, default=200, help="processing time per project (µs)")
+    args = parser.parse_args()
+
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(args.projects, args.delay, ready), daemon=True)
+    server.start()
+    api = AsanaAPI("bench", base_url=ready.get(timeout=60))
+    print(f"📊 {args.projects} projects, {args.delay * 1000:.0f} ms per page, "
+          f"{args.work_us:.0f} µs of work per project")
+    measure("load-all", lambda: load_all(api, args.work_us))
+    measure("stream", lambda: stream(api, args.work_us, prefetch=False))
+    measure("stream + prefetch", lambda: stream(api, args.work_us, prefetch=True))
+    server.terminate()
@@ -0,0 +1,67 @@
+"""
+bench_bulk_insert.py - Saving a plan: per-action INSERTs vs one multi-row INSERT
+
+Needs a reachable MySQL (DB_* settings). Rows are written for user_id and
+deleted afterwards.
+Usage: python benchmarks/bench_bulk_insert.py [user_id] [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_manager  # noqa: E402
+
+PLAN_SIZES = (1, 2, 5, 10, 20)
+
+
+def make_rows(n: int):
+    return [{
+        "provider": "asana",
+        "action_type": "create_task",
+        "draft_payload": {"tool": "create_asana_task", "provider": "asana",
+                          "parameters": {"name": f"Benchmark task {i}", "notes": "", "project_id": ""}}
+    } for i in range(n)]
+
+
+def cleanup(ids):
+    ids = [i for i in ids if i]
+    if ids:
+        db_manager.execute_query(
+            f"DELETE FROM ai_pending_actions WHERE id IN ({', '.join(['%s'] * len(ids))})",
+            tuple(ids), fetch=False
+        )
+
+
+def bench(user_id: int, runs: int):
+    for n in PLAN_SIZES:
+        rows = make_rows(n)
+        single, bulk = [], []
+        for _ in range(runs):
+            start = time.perf_counter()
+            ids = [db_manager.create_pending_action(user_id, **row) for row in rows]
+            single.append((time.perf_counter() - start) * 1000)
+            cleanup(ids)
+
+            start = time.perf_counter()
+            ids = db_manager.create_pending_actions(user_id, rows)
+            bulk.append((time.perf_counter() - start) * 1000)
+            cleanup(ids)
+
+        s, b = statistics.median(single), statistics.median(bulk)
+        print(f"{n:>3} actions | per-action {s:8.2f} ms | bulk {b:8.2f} ms | {s / b:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("user_id", type=int, nargs="?", default=1)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    if not db_manager.connect():
+        sys.exit("❌ MySQL is required for this benchmark")
+    print("📊 Pending-action save latency (median)")
+    bench(args.user_id, args.runs)
@@ -0,0 +1,88 @@
+"""
+bench_pending_actions.py - Requests/sec on /pending-actions/{user_id}: sync vs async DB path
+
+Needs a reachable MySQL (DB_* settings) and aiomysql for the async path.
+Usage: python benchmarks/bench_pending_actions.py [user_id] [--seconds N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from async_database import async_db  # noqa: E402
+from database import db_manager  # noqa: E402
+
+CONCURRENCY = (50, 100, 200, 500)
+
+
+async def blocking_pending_actions(user_id: int, *args):
+    """The pre-async handler: a blocking driver call on the event loop"""
+    return db_manager.get_pending_actions_page(user_id, 'pending', *args)
+
+
+async def threaded_pending_actions(user_id: int, *args):
+    """Sync pool on the DB worker threads"""
+    return await db_manager.run_async(db_manager.get_pending_actions_page, user_id, 'pending', *args)
+
+
+async def run_clients(client: httpx.AsyncClient, user_id: int, clients: int, seconds: float):
+    latencies = []
+    errors = 0
+    stop_at = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            response = await client.get(f"/pending-actions/{user_id}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95)], errors
+
+
+async def bench(user_id: int, seconds: float):
+    modes = {
+        "sync": blocking_pending_actions,
+        "threads": threaded_pending_actions,
+    }
+    if await async_db.connect():
+        modes["async"] = main.agent_brain.aget_pending_actions_page
+    else:
+        print("(async path unavailable - install aiomysql and check DB settings)")
+
+    original = main.agent_brain.aget_pending_actions_page
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for mode, handler in modes.items():
+            main.agent_brain.aget_pending_actions_page = handler
+            for clients in CONCURRENCY:
+                rps, p50, p95, errors = await run_clients(client, user_id, clients, seconds)
+                print(f"{mode:>7} | {clients:>3} clients | {rps:8.1f} req/s | "
+                      f"p50 {p50:7.1f} ms | p95 {p95:7.1f} ms | errors {errors}")
+    main.agent_brain.aget_pending_actions_page = original
+    await async_db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("user_id", type=int, nargs="?", default=1)
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration per concurrency level")
+    args = parser.parse_args()
+    if not db_manager.connect():
+        sys.exit("❌ MySQL is required for this benchmark")
+    print("📊 /pending-actions throughput by database path")
+    asyncio.run(bench(args.user_id, args.seconds))
@@ -0,0 +1,114 @@
+"""
+bench_prompt_prefix.py - Time-to-first-token: legacy prompt layout vs static prefix
+
+Needs a running Ollama with LLM_MODEL pulled.
+Usage: python benchmarks/bench_prompt_prefix.py [runs]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_ollama import OllamaLLM  # noqa: E402
+
+from agent_brain import PLANNING_PREFIX  # noqa: E402
+
+MODEL = os.getenv('LLM_MODEL', 'llama3:instruct')
+BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+MESSAGES = [
+    "Create a task for API documentation",
+    "Send email to team@example.com about the project update",
+    "Make an asana task for Q4 planning",
+    "Email bob@example.com that the release moved to Friday",
+    "Add a task to review the website copy",
+    "Remind the team by email about the retro",
+]
+TOOLS = ("- create_asana_task: Create a task in Asana (requires: name, notes, project_id)\n"
+         "- send_gmail: Send an email via Gmail (requires: to, subject, body)")
+
+
+def legacy_prompt(message: str) -> str:
+    """The pre-restructure layout: user message before the static instructions"""
+    return f"""
+        You are Gaprio AI Assistant. Analyze the user's request and generate appropriate actions.
+        
+        USER REQUEST: "{message}"
+        
+        AVAILABLE TOOLS:
+        {TOOLS}
+        
+        INSTRUCTIONS:
+        1. Only generate actions for available tools
+        2. Extract parameters from the user's message
+        3. For emails, extract recipient, subject, and body
+        4. For tasks, extract task name and description
+        5. For project_id, leave as empty string if not specified
+        6. Output ONLY a JSON array of action objects
+        7. DO NOT include any other text or explanations
+        
+        OUTPUT FORMAT: A JSON array like this:
+        [
+          {{
+            "tool": "create_asana_task",
+            "provider": "asana",
+            "parameters": {{
+              "name": "Task title here",
+              "notes": "Task description here",
+              "project_id": ""
+            }}
+          }}
+        ]
+        
+        If no action is needed, return empty array: []
+        
+        Generate actions now:
+        """
+
+
+def prefixed_prompt(message: str) -> str:
+    return PLANNING_PREFIX + f'AVAILABLE TOOLS:\n{TOOLS}\n\nUSER REQUEST: "{message}"\n\nGenerate actions now:\n'
+
+
+def ttft(llm: OllamaLLM, prompt: str) -> float:
+    started = time.perf_counter()
+    for _ in llm.stream(prompt, options={"num_predict": 8}):
+        return (time.perf_counter() - started) * 1000
+    return float('nan')
+
+
+def unload(llm: OllamaLLM):
+    llm.invoke("", keep_alive=0)
+
+
+def run_layout(name: str, build, runs: int):
+    llm = OllamaLLM(model=MODEL, base_url=BASE_URL, format="json", keep_alive="10m")
+    unload(llm)
+    cold = ttft(llm, build(MESSAGES[0]))
+
+    samples = [ttft(llm, build(MESSAGES[i % len(MESSAGES)])) for i in range(1, runs + 1)]
+    print(f"{name:<16} cold {cold:8.1f} ms | warm p50 {statistics.median(samples):7.1f} ms "
+          f"| warm max {max(samples):7.1f} ms")
+
+
+def run_warm_up(runs: int):
+    llm = OllamaLLM(model=MODEL, base_url=BASE_URL, format="json", keep_alive="10m")
+    unload(llm)
+    started = time.perf_counter()
+    llm.invoke(PLANNING_PREFIX, options={"num_predict": 1})
+    print(f"{'warm-up call':<16} {((time.perf_counter() - started) * 1000):8.1f} ms (paid at startup)")
+    first = ttft(llm, prefixed_prompt(MESSAGES[0]))
+    print(f"{'first request':<16} {first:8.1f} ms after warm-up")
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"📊 TTFT for {MODEL} at {BASE_URL}")
+    try:
+        run_layout("legacy layout", legacy_prompt, runs)
+        run_layout("static prefix", prefixed_prompt, runs)
+        run_warm_up(runs)
+    except Exception as e:
+        print(f"❌ Ollama not reachable ({e}); start it with: ollama serve")
@@ -0,0 +1,59 @@
+"""
+bench_semantic_cache.py - Semantic cache lookup latency vs an LLM call
+
+Usage: python benchmarks/bench_semantic_cache.py [--with-llm]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticPlanCache  # noqa: E402
+
+DIM = 768
+PLAN = [{"tool": "create_asana_task", "provider": "asana",
+         "parameters": {"name": "x", "notes": "", "project_id": ""}}]
+
+
+def bench_lookup(entries: int, lookups: int = 200):
+    rng = np.random.default_rng(0)
+    cache = SemanticPlanCache(max_entries=entries, threshold=0.92)
+    for vec in rng.standard_normal((entries, DIM), dtype=np.float32):
+        cache.add(vec, (True, True), PLAN)
+
+    queries = rng.standard_normal((lookups, DIM), dtype=np.float32)
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        cache.lookup(q, (True, True))
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(f"{entries:>7} entries | matrix {cache.stats()['matrix_bytes'] / 1e6:6.1f} MB | "
+          f"p50 {statistics.median(timings):6.3f} ms | p95 {timings[int(len(timings) * 0.95)]:6.3f} ms")
+
+
+def bench_llm(runs: int = 3):
+    from langchain_ollama import OllamaLLM
+    llm = OllamaLLM(model=os.getenv('LLM_MODEL', 'llama3:instruct'), format="json")
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        llm.invoke('Return a JSON array with one create_asana_task action for "Q4 planning".')
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"LLM call        | p50 {statistics.median(timings):8.1f} ms")
+
+
+if __name__ == "__main__":
+    print("📊 Semantic cache lookup latency")
+    for n in (10_000, 100_000):
+        bench_lookup(n)
+    if "--with-llm" in sys.argv:
+        bench_llm()
+    else:
+        print("(run with --with-llm to time a real Ollama generation for comparison)")
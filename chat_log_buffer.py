@@ -0,0 +1,245 @@
+"""
+chat_log_buffer.py - Write-behind buffer for agent_chat_logs
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from mysql.connector.errors import InterfaceError, OperationalError, PoolError
+
+from database import db_manager
+
+load_dotenv()
+
+# (user_id, role, content)
+ChatRow = Tuple[int, str, str]
+
+POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+# Writer errors worth retrying: the database is unreachable or busy, not the rows at fault.
+# PoolError covers PoolTimeout and "not connected".
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolError)
+
+
+class ChatLogBuffer:
+    """
+    Queues chat messages in memory and writes them in batches on a background thread
+
+    A flush runs when CHAT_LOG_BATCH_SIZE rows are waiting or CHAT_LOG_FLUSH_INTERVAL
+    seconds after the oldest unflushed row, whichever comes first. The queue holds
+    at most CHAT_LOG_MAX_QUEUE rows; when it is full CHAT_LOG_BACKPRESSURE decides:
+      drop_newest - reject the incoming message (the request never waits)
+      drop_oldest - evict the oldest queued message to make room
+      block       - wait up to CHAT_LOG_BLOCK_TIMEOUT seconds for room, then drop it
+                    (async handlers use alog(), which waits on a worker thread)
+    A batch that fails with a transient error (or a False return) goes back to
+    the front of the queue for the next flush. Any other error is taken to be
+    caused by the rows themselves (e.g. a user_id with no users row), so the
+    batch is retried row by row and the rows that still fail are dropped and
+    counted as rejected.
+    """
+
+    def __init__(self, writer: Callable[[Sequence[ChatRow]], bool], max_queue: int = None,
+                 batch_size: int = None, flush_interval: float = None, policy: str = None,
+                 block_timeout: float = None):
+        self.writer = writer
+        self.max_queue = max_queue or int(os.getenv('CHAT_LOG_MAX_QUEUE', 10000))
+        self.batch_size = batch_size or int(os.getenv('CHAT_LOG_BATCH_SIZE', 200))
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else float(os.getenv('CHAT_LOG_FLUSH_INTERVAL', 1.0)))
+        self.policy = policy or os.getenv('CHAT_LOG_BACKPRESSURE', 'drop_newest')
+        if self.policy not in POLICIES:
+            raise ValueError(f"Unknown chat log backpressure policy: {self.policy}")
+        self.block_timeout = (block_timeout if block_timeout is not None
+                              else float(os.getenv('CHAT_LOG_BLOCK_TIMEOUT', 0.05)))
+        self._queue: "deque[ChatRow]" = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._oldest_at: Optional[float] = None
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.rejected = 0
+
+    def start(self):
+        """Start the background flusher (idempotent)"""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="chat-log-flusher", daemon=True)
+            self._thread.start()
+
+    def log(self, user_id: int, role: str, content: str) -> bool:
+        """Queue one message; False when backpressure dropped it"""
+        return self._enqueue((user_id, role, content), wait=True)
+
+    async def alog(self, user_id: int, role: str, content: str) -> bool:
+        """log() for async handlers: a 'block' wait happens on a worker thread, never on the event loop"""
+        queued = self._enqueue((user_id, role, content), wait=False)
+        if queued is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self.log, user_id, role, content)
+        return queued
+
+    def _enqueue(self, row: ChatRow, wait: bool) -> Optional[bool]:
+        """Queue a row; None when the block policy would have to wait and wait is False"""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                if self.policy == 'drop_oldest':
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self.policy == 'block':
+                    if not wait:
+                        return None
+                    self._cond.wait_for(lambda: len(self._queue) < self.max_queue, self.block_timeout)
+                if len(self._queue) >= self.max_queue:
+                    self.dropped += 1
+                    return False
+
+            self._queue.append(row)
+            self.enqueued += 1
+            if self._oldest_at is None:
+                # First row of a batch: the flusher starts its interval timer
+                self._oldest_at = time.monotonic()
+                self._cond.notify_all()
+            elif len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _take_batch(self) -> List[ChatRow]:
+        batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+        self._oldest_at = time.monotonic() if self._queue else None
+        # Wake producers blocked on a full queue
+        self._cond.notify_all()
+        return batch
+
+    def _write(self, batch: List[ChatRow]) -> bool:
+        """Write one batch; False when it was requeued after a transient failure"""
+        try:
+            ok = bool(self.writer(batch))
+        except TRANSIENT_ERRORS as e:
+            print(f"Error flushing chat log batch: {e}")
+            ok = False
+        except Exception as e:
+            print(f"Chat log batch rejected, retrying row by row: {e}")
+            with self._cond:
+                self.write_errors += 1
+            return self._write_rows(batch)
+
+        with self._cond:
+            if ok:
+                self.flushed += len(batch)
+                self.batches += 1
+                return True
+            self.write_errors += 1
+            self._requeue(batch)
+            return False
+
+    def _write_rows(self, batch: List[ChatRow]) -> bool:
+        """Write rows one at a time, dropping those the database refuses"""
+        for i, row in enumerate(batch):
+            try:
+                ok = bool(self.writer([row]))
+            except TRANSIENT_ERRORS as e:
+                print(f"Error flushing chat log row: {e}")
+                ok = False
+            except Exception as e:
+                print(f"Dropping chat log row for user {row[0]}: {e}")
+                with self._cond:
+                    self.rejected += 1
+                continue
+            with self._cond:
+                if not ok:
+                    self.write_errors += 1
+                    self._requeue(batch[i:])
+                    return False
+                self.flushed += 1
+        with self._cond:
+            self.batches += 1
+        return True
+
+    def _requeue(self, rows: List[ChatRow]):
+        """Put rows back ahead of newer ones, as many as fit (call with the lock held)"""
+        room = self.max_queue - len(self._queue)
+        keep = rows[:max(0, room)]
+        self.dropped += len(rows) - len(keep)
+        self._queue.extendleft(reversed(keep))
+        if keep and self._oldest_at is None:
+            self._oldest_at = time.monotonic()
+
+    def _due(self) -> bool:
+        if len(self._queue) >= self.batch_size or self._closing:
+            return bool(self._queue)
+        return self._oldest_at is not None and time.monotonic() - self._oldest_at >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closing:
+                        return
+                    timeout = None
+                    if self._oldest_at is not None:
+                        timeout = max(0.0, self._oldest_at + self.flush_interval - time.monotonic())
+                    self._cond.wait(timeout)
+                batch = self._take_batch()
+            if self._write(batch):
+                continue
+            # Back off instead of hammering a database that refuses writes
+            with self._cond:
+                if self._closing:
+                    return
+                self._cond.wait(self.flush_interval)
+
+    def flush(self) -> int:
+        """Write everything queued now, on the caller's thread; returns rows written"""
+        with self._cond:
+            flushed_before = self.flushed
+        while True:
+            with self._cond:
+                if not self._queue:
+                    break
+                batch = self._take_batch()
+            if not self._write(batch):
+                break
+        with self._cond:
+            return self.flushed - flushed_before
+
+    def close(self, timeout: float = 10.0):
+        """Stop the flusher after draining the queue (graceful shutdown)"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+        self._thread = None
+
+    def stats(self) -> Dict:
+        """Queue depth and counters for monitoring"""
+        with self._cond:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "policy": self.policy,
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "write_errors": self.write_errors
+            }
+
+
+# Global instance
+chat_log = ChatLogBuffer(db_manager.save_chat_messages)
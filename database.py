@@ -3,14 +3,144 @@ database.py - Fixed database connection with proper cursor handling
 """
 
 import os
+import asyncio
+import base64
+import functools
+import json
 import mysql.connector
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, Sequence, Tuple
 from dotenv import load_dotenv
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+from db_pool import ConnectionPool
+from token_cache import MISS, TokenCache
 
 load_dotenv()
 
+# Columns a /pending-actions page may project
+PENDING_ACTION_FIELDS = ('id', 'user_id', 'provider', 'action_type', 'draft_payload', 'status', 'created_at')
+DEFAULT_PAGE_SIZE = int(os.getenv('PENDING_ACTIONS_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.getenv('PENDING_ACTIONS_MAX_PAGE', 100))
+
+def encode_cursor(action: Dict) -> str:
+    """Opaque keyset cursor for the row after which the next page starts"""
+    raw = f"{action['created_at'].isoformat()}|{action['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor (ValueError on a malformed cursor)"""
+    try:
+        created_at, action_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(action_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def pending_page_query(user_id: int, status: str, limit: int, cursor: Optional[str],
+                       fields: Optional[Sequence[str]]) -> Tuple[str, tuple, int, List[str]]:
+    """
+    Keyset page of a user's actions, newest first
+    Served by idx_user_status_created (user_id, status, created_at, id), so
+    each page reads only its own rows however large the backlog is.
+    Fetches limit + 1 rows to learn whether another page follows.
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    columns = list(PENDING_ACTION_FIELDS) if not fields else list(fields)
+    unknown = [c for c in columns if c not in PENDING_ACTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # The cursor needs these even when the caller didn't ask for them
+    selected = columns + [c for c in ('id', 'created_at') if c not in columns]
+    
+    query = f"""
+        SELECT {', '.join(selected)}
+        FROM ai_pending_actions
+        WHERE user_id = %s AND status = %s
+    """
+    params = [user_id, status]
+    if cursor:
+        created_at, action_id = decode_cursor(cursor)
+        query += " AND (created_at < %s OR (created_at = %s AND id < %s))"
+        params.extend((created_at, created_at, action_id))
+    query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+    return query, tuple(params), limit, columns
+
+def finish_page(rows: List[Dict], limit: int, columns: List[str]) -> Dict:
+    """Trim the look-ahead row, build next_cursor and drop unrequested columns"""
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    actions = [{c: row[c] for c in columns} for row in rows]
+    return {"actions": actions, "next_cursor": next_cursor}
+
+# Every connection of a user, newest first; served by unique_user_provider (user_id, provider)
+USER_TOKENS_QUERY = """
+    SELECT provider, access_token, refresh_token, expires_at, metadata
+    FROM user_connections
+    WHERE user_id = %s
+    ORDER BY updated_at DESC
+"""
+
+def latest_tokens(user_id: int, rows: List[Dict]) -> Dict[str, Optional[Dict]]:
+    """Newest row per provider; expired tokens count as absent"""
+    tokens = {}
+    for row in rows:
+        provider = row.pop('provider')
+        if provider in tokens:
+            continue
+        # Check if token is expired
+        if row['expires_at'] and row['expires_at'] < datetime.now():
+            print(f"⚠️ Token expired for user {user_id}, provider {provider}")
+            row = None
+        tokens[provider] = row
+    return tokens
+
+def capabilities_from_tokens(tokens: Dict[str, Optional[Dict]]) -> Dict[str, Dict]:
+    """Connected providers with their token expiry and parsed metadata"""
+    capabilities = {}
+    for provider, token in tokens.items():
+        if not token:
+            continue
+        metadata = token.get('metadata')
+        if isinstance(metadata, (str, bytes)):
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                metadata = None
+        capabilities[provider] = {"expires_at": token.get('expires_at'), "metadata": metadata or {}}
+    return capabilities
+
+PENDING_ACTIONS_INSERT = """
+    INSERT INTO ai_pending_actions
+    (user_id, provider, action_type, draft_payload, status)
+    VALUES """
+PENDING_ACTION_VALUES = "(%s, %s, %s, %s, 'pending')"
+
+# Every row over the id range a multi-row insert is assumed to have taken
+INSERTED_ACTIONS_QUERY = """
+    SELECT id, user_id, provider, action_type
+    FROM ai_pending_actions
+    WHERE id BETWEEN %s AND %s
+    ORDER BY id
+"""
+
+def pending_action_rows(user_id: int, actions: List[Dict]) -> List[Tuple]:
+    """INSERT parameters for each draft action"""
+    return [(user_id, action['provider'], action['action_type'], json.dumps(action['draft_payload']))
+            for action in actions]
+
+def confirmed_insert_ids(first_id: int, step: int, rows: List[Tuple], found: List[Tuple]) -> Optional[List[int]]:
+    """
+    Ids of a multi-row INSERT's rows, or None if they weren't first_id, first_id + step, ...
+    With innodb_autoinc_lock_mode=2 a concurrent insert can take ids in between,
+    so `found` (INSERTED_ACTIONS_QUERY over the assumed range) must be exactly these rows
+    """
+    ids = [first_id + i * step for i in range(len(rows))]
+    expected = [(action_id, *row[:3]) for action_id, row in zip(ids, rows)]
+    return ids if [tuple(row) for row in found] == expected else None
+
 class DatabaseManager:
     """Handles database connections and operations with proper cursor management"""
     
@@ -25,104 +155,257 @@ class DatabaseManager:
             'buffered': True,  # Important for preventing "unread result found"
             'autocommit': True  # Auto-commit transactions
         }
-        self.connection = None
+        self.pool = None
+        self._autoinc_step = None
+        self.token_cache = TokenCache()
+        # Blocking driver calls run here so async handlers never stall the event loop;
+        # one worker per pooled connection lets them run in parallel
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv('DB_POOL_SIZE', 10)),
+                                            thread_name_prefix="db")
     
     def connect(self) -> bool:
-        """Establish database connection with buffered cursor"""
+        """Create the connection pool and verify the database is reachable"""
+        if self.pool is None:
+            self.pool = ConnectionPool(self.config)
+        # The pool stays in place even if the check fails, so calls reconnect once MySQL is back
+        return self.ping(verbose=True)
+    
+    def ping(self, verbose: bool = False) -> bool:
+        """Run SELECT 1 on a pooled connection"""
         try:
-            self.connection = mysql.connector.connect(**self.config)
-            
-            # Test connection with buffered cursor
-            cursor = self.connection.cursor(buffered=True)
-            cursor.execute("SELECT 1")
-            cursor.fetchall()  # Read all results
-            cursor.close()
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute("SELECT 1")
+                cursor.fetchall()  # Read all results
+                cursor.close()
             
-            print(f"✅ Connected to database: {self.config['database']}")
+            if verbose:
+                print(f"✅ Connected to database: {self.config['database']} (pool size {self.pool.size})")
             return True
         except Error as e:
-            print(f"❌ Database connection error: {e}")
+            if verbose:
+                print(f"❌ Database connection error: {e}")
             return False
     
     def close(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Close pooled database connections"""
+        if self.pool:
+            self.pool.close()
+            self.pool = None
             print("Database connection closed")
     
+    def _connection(self):
+        """Borrow a pooled connection (with-block)"""
+        if self.pool is None:
+            raise PoolError("Database not connected")
+        return self.pool.connection()
+    
+    def stats(self) -> Dict:
+        """Connection pool metrics"""
+        return self.pool.stats() if self.pool else {"connected": False}
+    
     def get_user_token(self, user_id: int, provider: str) -> Optional[Dict]:
-        """Get OAuth token for a user and provider with buffered cursor"""
-        try:
-            cursor = self.connection.cursor(buffered=True, dictionary=True)
-            query = """
-                SELECT access_token, refresh_token, expires_at 
-                FROM user_connections 
-                WHERE user_id = %s AND provider = %s
-                ORDER BY updated_at DESC 
-                LIMIT 1
-            """
-            cursor.execute(query, (user_id, provider))
-            result = cursor.fetchone()
-            cursor.close()
-            
-            if result:
-                # Check if token is expired
-                if result['expires_at'] and result['expires_at'] < datetime.now():
-                    print(f"⚠️ Token expired for user {user_id}, provider {provider}")
-                    return None
-                return result
+        """Get OAuth token for a user and provider (served from the token cache when possible)"""
+        token = self.token_cache.get(user_id, provider)
+        if token is not MISS:
+            return token
+        
+        generation = self.token_cache.generation(user_id)
+        tokens = self.get_user_tokens(user_id)
+        if tokens is None:
             return None
+        self.token_cache.put_user(user_id, tokens, generation)
+        return tokens.get(provider)
+    
+    def get_user_capabilities(self, user_id: int) -> Dict[str, Dict]:
+        """
+        Snapshot of a user's connected providers for the planner
+        {provider: {"expires_at", "metadata"}} from the token cache, or from one
+        query over all of the user's connections; {} when none or on error
+        """
+        tokens = self.token_cache.get_user(user_id)
+        if tokens is None:
+            generation = self.token_cache.generation(user_id)
+            tokens = self.get_user_tokens(user_id)
+            if tokens is None:
+                return {}
+            self.token_cache.put_user(user_id, tokens, generation)
+        return capabilities_from_tokens(tokens)
+    
+    def get_user_tokens(self, user_id: int) -> Optional[Dict[str, Optional[Dict]]]:
+        """All of a user's current tokens by provider in one query (None on error)"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True, dictionary=True)
+                cursor.execute(USER_TOKENS_QUERY, (user_id,))
+                rows = cursor.fetchall()
+                cursor.close()
+            return latest_tokens(user_id, rows)
             
         except Error as e:
             print(f"Error fetching token: {e}")
             return None
     
+    def save_user_connection(self, user_id: int, provider: str, access_token: str,
+                             refresh_token: Optional[str] = None,
+                             expires_at: Optional[datetime] = None) -> bool:
+        """Insert or refresh a provider connection and drop the cached token"""
+        try:
+            query = """
+                INSERT INTO user_connections (user_id, provider, access_token, refresh_token, expires_at)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    access_token = VALUES(access_token),
+                    refresh_token = VALUES(refresh_token),
+                    expires_at = VALUES(expires_at)
+            """
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute(query, (user_id, provider, access_token, refresh_token, expires_at))
+                conn.commit()
+                cursor.close()
+            return True
+        except Error as e:
+            print(f"Error saving connection: {e}")
+            return False
+        finally:
+            self.invalidate_user_tokens(user_id, provider)
+    
+    def save_connection_metadata(self, user_id: int, provider: str, metadata: Dict) -> bool:
+        """Replace a connection's metadata JSON (e.g. the cached Asana projects)"""
+        try:
+            query = """
+                UPDATE user_connections
+                SET metadata = %s
+                WHERE user_id = %s AND provider = %s
+            """
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute(query, (json.dumps(metadata), user_id, provider))
+                conn.commit()
+                cursor.close()
+            return True
+        except Error as e:
+            print(f"Error saving connection metadata: {e}")
+            return False
+        finally:
+            # Capabilities snapshots carry the metadata column
+            self.invalidate_user_tokens(user_id, provider)
+    
+    def invalidate_user_tokens(self, user_id: int, provider: Optional[str] = None):
+        """Call after changing user_connections rows outside save_user_connection"""
+        self.token_cache.invalidate(user_id, provider)
+    
     def save_chat_message(self, user_id: int, role: str, content: str) -> Optional[int]:
         """Save a chat message to maintain context/memory"""
         try:
-            cursor = self.connection.cursor(buffered=True)
             query = """
                 INSERT INTO agent_chat_logs (user_id, role, content)
                 VALUES (%s, %s, %s)
             """
-            cursor.execute(query, (user_id, role, content))
-            self.connection.commit()
-            message_id = cursor.lastrowid
-            cursor.close()
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute(query, (user_id, role, content))
+                conn.commit()
+                message_id = cursor.lastrowid
+                cursor.close()
             print(f"💾 Saved chat message: {role} - {content[:50]}...")
             return message_id
         except Error as e:
             print(f"Error saving chat message: {e}")
             return None
     
+    def save_chat_messages(self, messages: Sequence[Tuple[int, str, str]]) -> bool:
+        """
+        Save (user_id, role, content) rows in one multi-row INSERT and a single commit
+        Errors are raised so the chat log buffer can tell a lost connection from rows
+        the database refuses
+        """
+        if not messages:
+            return True
+        try:
+            query = """
+                INSERT INTO agent_chat_logs (user_id, role, content)
+                VALUES """ + ", ".join(["(%s, %s, %s)"] * len(messages))
+            params = tuple(value for message in messages for value in message)
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute(query, params)
+                conn.commit()
+                cursor.close()
+            return True
+        except Error as e:
+            print(f"Error saving chat messages: {e}")
+            raise
+    
     def create_pending_action(self, user_id: int, provider: str, 
                             action_type: str, draft_payload: Dict) -> Optional[int]:
         """Create a draft action waiting for user approval"""
         try:
             import json
-            cursor = self.connection.cursor(buffered=True)
             query = """
                 INSERT INTO ai_pending_actions 
                 (user_id, provider, action_type, draft_payload, status)
                 VALUES (%s, %s, %s, %s, 'pending')
             """
-            cursor.execute(query, (user_id, provider, action_type, 
-                                 json.dumps(draft_payload)))
-            self.connection.commit()
-            action_id = cursor.lastrowid
-            cursor.close()
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute(query, (user_id, provider, action_type, 
+                                     json.dumps(draft_payload)))
+                conn.commit()
+                action_id = cursor.lastrowid
+                cursor.close()
             print(f"📝 Created pending action {action_id}: {action_type}")
             return action_id
         except Error as e:
             print(f"Error creating pending action: {e}")
             return None
     
+    def create_pending_actions(self, user_id: int, actions: List[Dict]) -> List[int]:
+        """
+        Create several draft actions in one multi-row INSERT and a single commit
+        actions: dicts with provider, action_type and draft_payload
+        Returns the generated ids in input order ([] on failure). The ids are read
+        back before committing; if another insert interleaved with them, the batch
+        is rolled back and inserted a row at a time instead.
+        """
+        if not actions:
+            return []
+        try:
+            rows = pending_action_rows(user_id, actions)
+            query = PENDING_ACTIONS_INSERT + ", ".join([PENDING_ACTION_VALUES] * len(rows))
+            
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                if self._autoinc_step is None:
+                    cursor.execute("SELECT @@auto_increment_increment")
+                    self._autoinc_step = int(cursor.fetchone()[0])
+                conn.start_transaction()
+                cursor.execute(query, tuple(value for row in rows for value in row))
+                # lastrowid is the first id; the rest usually follow auto_increment_increment
+                first_id = cursor.lastrowid
+                cursor.execute(INSERTED_ACTIONS_QUERY, (first_id, first_id + (len(rows) - 1) * self._autoinc_step))
+                action_ids = confirmed_insert_ids(first_id, self._autoinc_step, rows, cursor.fetchall())
+                if action_ids is None:
+                    print("⚠️ Bulk insert ids weren't consecutive, inserting row by row")
+                    conn.rollback()
+                    conn.start_transaction()
+                    action_ids = []
+                    for row in rows:
+                        cursor.execute(PENDING_ACTIONS_INSERT + PENDING_ACTION_VALUES, row)
+                        action_ids.append(cursor.lastrowid)
+                conn.commit()
+                cursor.close()
+            print(f"📝 Created {len(action_ids)} pending action(s): {action_ids}")
+            return action_ids
+        except Error as e:
+            print(f"Error creating pending actions: {e}")
+            return []
+    
     def get_pending_actions(self, user_id: Optional[int] = None, 
                            status: str = 'pending') -> List[Dict]:
         """Get pending actions awaiting approval"""
         try:
-            cursor = self.connection.cursor(buffered=True, dictionary=True)
-            
             if user_id:
                 query = """
                     SELECT id, user_id, provider, action_type, draft_payload, created_at
@@ -130,7 +413,7 @@ class DatabaseManager:
                     WHERE user_id = %s AND status = %s
                     ORDER BY created_at DESC
                 """
-                cursor.execute(query, (user_id, status))
+                params = (user_id, status)
             else:
                 query = """
                     SELECT id, user_id, provider, action_type, draft_payload, created_at
@@ -138,31 +421,144 @@ class DatabaseManager:
                     WHERE status = %s
                     ORDER BY created_at DESC
                 """
-                cursor.execute(query, (status,))
+                params = (status,)
             
-            actions = cursor.fetchall()
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True, dictionary=True)
+                cursor.execute(query, params)
+                actions = cursor.fetchall()
+                cursor.close()
             
-            # Parse JSON payload
-            import json
-            for action in actions:
-                if 'draft_payload' in action and action['draft_payload']:
-                    try:
-                        action['draft_payload'] = json.loads(action['draft_payload'])
-                    except:
-                        action['draft_payload'] = {}
-            
-            cursor.close()
-            return actions
+            return self._decode_payloads(actions)
         except Error as e:
             print(f"Error fetching pending actions: {e}")
             return []
     
+    def get_pending_actions_page(self, user_id: int, status: str = 'pending',
+                                 limit: int = None, cursor: Optional[str] = None,
+                                 fields: Optional[Sequence[str]] = None) -> Dict:
+        """
+        One keyset-paginated page of a user's actions
+        Returns {"actions", "next_cursor"}; raises ValueError for a bad cursor or field
+        """
+        query, params, limit, columns = pending_page_query(user_id, status, limit, cursor, fields)
+        try:
+            with self._connection() as conn:
+                db_cursor = conn.cursor(buffered=True, dictionary=True)
+                db_cursor.execute(query, params)
+                rows = db_cursor.fetchall()
+                db_cursor.close()
+            
+            page = finish_page(rows, limit, columns)
+            if 'draft_payload' in columns:
+                self._decode_payloads(page["actions"])
+            return page
+        except Error as e:
+            print(f"Error fetching pending actions page: {e}")
+            return {"actions": [], "next_cursor": None}
+    
+    @staticmethod
+    def _decode_payloads(actions: List[Dict]) -> List[Dict]:
+        """Parse the JSON draft_payload column in place"""
+        import json
+        for action in actions:
+            if 'draft_payload' in action and action['draft_payload']:
+                try:
+                    action['draft_payload'] = json.loads(action['draft_payload'])
+                except:
+                    action['draft_payload'] = {}
+        return actions
+    
+    def get_action_by_id(self, action_id: int) -> Optional[Dict]:
+        """Get one action by primary key, whatever its status"""
+        try:
+            query = """
+                SELECT id, user_id, provider, action_type, draft_payload, status, created_at
+                FROM ai_pending_actions
+                WHERE id = %s
+            """
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True, dictionary=True)
+                cursor.execute(query, (action_id,))
+                action = cursor.fetchone()
+                cursor.close()
+            return self._decode_payloads([action])[0] if action else None
+        except Error as e:
+            print(f"Error fetching action {action_id}: {e}")
+            return None
+    
+    def claim_pending_actions(self, action_ids: List[int], user_id: int) -> List[Dict]:
+        """
+        Lock the still-pending actions among action_ids that belong to user_id and mark them approved
+        SELECT ... FOR UPDATE makes concurrent approvals of the same ids wait,
+        then find them no longer pending, so each action is executed once
+        """
+        if not action_ids:
+            return []
+        try:
+            placeholders = ", ".join(["%s"] * len(action_ids))
+            with self._connection() as conn:
+                conn.start_transaction()
+                cursor = conn.cursor(buffered=True, dictionary=True)
+                cursor.execute(f"""
+                    SELECT id, user_id, provider, action_type, draft_payload, status, created_at
+                    FROM ai_pending_actions
+                    WHERE id IN ({placeholders}) AND user_id = %s AND status = 'pending'
+                    FOR UPDATE
+                """, (*action_ids, user_id))
+                actions = cursor.fetchall()
+                if actions:
+                    claimed = [a['id'] for a in actions]
+                    cursor.execute(f"""
+                        UPDATE ai_pending_actions
+                        SET status = 'approved', claimed_at = NOW()
+                        WHERE id IN ({", ".join(["%s"] * len(claimed))})
+                    """, tuple(claimed))
+                conn.commit()
+                cursor.close()
+            for action in actions:
+                action['status'] = 'approved'
+            return self._decode_payloads(actions)
+        except Error as e:
+            print(f"Error claiming actions: {e}")
+            return []
+    
+    def update_actions_status(self, statuses: Dict[int, str]) -> bool:
+        """Set a status per action id in one UPDATE"""
+        if not statuses:
+            return True
+        try:
+            ids = list(statuses)
+            executed = [i for i in ids if statuses[i] == 'executed']
+            query = f"""
+                UPDATE ai_pending_actions
+                SET status = CASE id {" ".join(["WHEN %s THEN %s"] * len(ids))} END
+            """
+            params = [value for action_id in ids for value in (action_id, statuses[action_id])]
+            if executed:
+                query += f""",
+                    executed_at = CASE WHEN id IN ({", ".join(["%s"] * len(executed))})
+                                  THEN NOW() ELSE executed_at END
+                """
+                params.extend(executed)
+            query += f"WHERE id IN ({', '.join(['%s'] * len(ids))})"
+            params.extend(ids)
+            
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute(query, tuple(params))
+                conn.commit()
+                cursor.close()
+            print(f"🔄 Updated {len(ids)} action status(es)")
+            return True
+        except Error as e:
+            print(f"Error updating action statuses: {e}")
+            return False
+    
     def update_action_status(self, action_id: int, 
                            status: str, executed_data: Optional[Dict] = None):
         """Update status of a pending action"""
         try:
-            cursor = self.connection.cursor(buffered=True)
-            
             if status == 'executed':
                 query = """
                     UPDATE ai_pending_actions 
@@ -176,9 +572,11 @@ class DatabaseManager:
                     WHERE id = %s
                 """
             
-            cursor.execute(query, (status, action_id))
-            self.connection.commit()
-            cursor.close()
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True)
+                cursor.execute(query, (status, action_id))
+                conn.commit()
+                cursor.close()
             print(f"🔄 Updated action {action_id} status to: {status}")
             return True
         except Error as e:
@@ -188,21 +586,27 @@ class DatabaseManager:
     def execute_query(self, query: str, params: tuple = None, fetch: bool = True):
         """Execute a generic query with buffered cursor"""
         try:
-            cursor = self.connection.cursor(buffered=True, dictionary=True)
-            cursor.execute(query, params or ())
-            
-            if fetch:
-                result = cursor.fetchall()
-            else:
-                self.connection.commit()
-                result = cursor.lastrowid
-            
-            cursor.close()
+            with self._connection() as conn:
+                cursor = conn.cursor(buffered=True, dictionary=True)
+                cursor.execute(query, params or ())
+                
+                if fetch:
+                    result = cursor.fetchall()
+                else:
+                    conn.commit()
+                    result = cursor.lastrowid
+                
+                cursor.close()
             return result
         except Error as e:
             print(f"Query execution error: {e}")
             return None
 
+    async def run_async(self, func, *args, **kwargs):
+        """Run a blocking database call on the DB worker threads"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
 # Global instance
 db_manager = DatabaseManager()
 
@@ -0,0 +1,183 @@
+"""
+db_pool.py - Bounded, thread-safe MySQL connection pool
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import InterfaceError, OperationalError, PoolError
+
+from metrics import LatencyRecorder
+
+
+class PoolTimeout(PoolError):
+    """No connection became available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Hands out one MySQL connection per caller
+
+    At most `size` connections exist; callers wait up to `timeout` seconds for
+    one to come back. Borrowed connections are pinged first and replaced when
+    the server has dropped them, and connections older than `max_lifetime`
+    seconds are recycled before MySQL's wait_timeout can kill them.
+    """
+
+    def __init__(self, config: Dict, size: int = None, timeout: float = None,
+                 max_lifetime: float = None, pre_ping: bool = None,
+                 connect: Callable = None):
+        self.config = config
+        self.size = size or int(os.getenv('DB_POOL_SIZE', 10))
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.max_lifetime = max_lifetime or float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+        if pre_ping is None:
+            pre_ping = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+        self.pre_ping = pre_ping
+        self._connect = connect or mysql.connector.connect
+
+        self._cond = threading.Condition()
+        self._idle = deque()       # (connection, created_at), most recently returned last
+        self._created_at = {}      # id(connection) -> created_at for checked-out connections
+        self._opened = 0
+        self._closed = False
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.recycled = 0
+        self.wait_time = LatencyRecorder()
+
+    def acquire(self):
+        """Borrow a live connection, waiting up to the checkout timeout"""
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Connection pool is closed")
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    # Reserve the slot; the connect itself happens outside the lock
+                    self._opened += 1
+                    conn, created_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout:.1f}s")
+                self._cond.wait(remaining)
+            self.checkouts += 1
+        self.wait_time.record((time.perf_counter() - started) * 1000)
+
+        try:
+            if conn is not None and time.time() - created_at > self.max_lifetime:
+                self._discard(conn)
+                conn = None
+                with self._cond:
+                    self.recycled += 1
+            elif conn is not None and self.pre_ping and not self._is_alive(conn):
+                self._discard(conn)
+                conn = None
+                with self._cond:
+                    self.reconnects += 1
+            if conn is None:
+                conn, created_at = self._connect(**self.config), time.time()
+        except Exception:
+            self._free_slot()
+            raise
+
+        with self._cond:
+            self._created_at[id(conn)] = created_at
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """Return a borrowed connection; broken ones are closed instead of reused"""
+        with self._cond:
+            if id(conn) not in self._created_at:
+                return
+            created_at = self._created_at.pop(id(conn))
+        if discard or self._closed:
+            self._discard(conn)
+            self._free_slot()
+            return
+        with self._cond:
+            self._idle.append((conn, created_at))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except (OperationalError, InterfaceError):
+            # Lost or unusable socket: don't hand it to the next caller
+            discard = True
+            raise
+        except Error:
+            self._rollback(conn)
+            raise
+        finally:
+            self.release(conn, discard)
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed when returned"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _is_alive(self, conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _rollback(conn):
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _free_slot(self):
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "in_use": self._opened - idle,
+                "idle": idle,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "recycled": self.recycled,
+                "wait_time": self.wait_time.stats()
+            }
@@ -2,6 +2,8 @@ import mysql.connector
 from dotenv import load_dotenv
 import os
 
+from migrations import migrate
+
 load_dotenv()
 
 def fix_database():
@@ -28,56 +30,8 @@ def fix_database():
         # Use the database
         cursor.execute("USE gaprio_agent_dev")
         
-        # Create tables
-        tables_sql = [
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                full_name VARCHAR(100),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS user_connections (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                provider ENUM('google', 'asana') NOT NULL,
-                provider_user_id VARCHAR(255),
-                access_token TEXT NOT NULL,
-                refresh_token TEXT,
-                expires_at TIMESTAMP,
-                metadata JSON,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS agent_chat_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                role ENUM('user', 'assistant') NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS ai_pending_actions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                provider ENUM('google', 'asana'),
-                action_type VARCHAR(50),
-                draft_payload JSON,
-                status ENUM('pending', 'approved', 'rejected', 'executed') DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                executed_at TIMESTAMP NULL
-            )
-            """
-        ]
-        
-        for i, sql in enumerate(tables_sql, 1):
-            cursor.execute(sql)
-            print(f"✅ Table {i} created/verified")
+        # Create tables and indexes from models.py
+        migrate(conn)
         
         # Insert sample data
         cursor.execute("""
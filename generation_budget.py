@@ -0,0 +1,105 @@
+"""
+generation_budget.py - Per-request token, stop-sequence and deadline budgets for planning
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List
+
+DEFAULTS = {
+    'small': {"base_tokens": 64, "tokens_per_action": 256, "max_tokens": 2048, "deadline_seconds": 10.0},
+    'large': {"base_tokens": 64, "tokens_per_action": 384, "max_tokens": 4096, "deadline_seconds": 30.0},
+}
+
+# Rough characters per token, for the user text a plan repeats (task names, email bodies)
+CHARS_PER_TOKEN = 3
+
+# Clauses that usually become separate actions: "email Bob, then add a task and ..."
+_CLAUSE_SEPARATORS = re.compile(r"[,;\n]|\b(?:and|then|also)\b", re.IGNORECASE)
+_NUMBER_WORDS = {"two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+                 "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20}
+# "10 tasks", "three follow-up emails"
+_COUNTED_ITEMS = re.compile(r"\b(\d+|" + "|".join(_NUMBER_WORDS) + r")\s+(?:[\w-]+\s+){0,2}?"
+                            r"(?:tasks?|todos?|emails?|mails?|messages?|items?|actions?)\b", re.IGNORECASE)
+MAX_EXPECTED_ACTIONS = 20
+
+
+def expected_actions(user_message: str) -> int:
+    """How many actions a request is likely to plan, from its clauses and any explicit count"""
+    clauses = sum(1 for part in _CLAUSE_SEPARATORS.split(user_message or "") if part.strip())
+    counted = [int(n) if n.isdigit() else _NUMBER_WORDS[n.lower()]
+               for n in _COUNTED_ITEMS.findall(user_message or "")]
+    return max(1, min(MAX_EXPECTED_ACTIONS, max([clauses] + counted)))
+
+# With format="json" Ollama may pad a finished value with whitespace until num_predict;
+# a run of blank lines never occurs inside the plan itself
+DEFAULT_STOP = ["\n\n\n"]
+
+
+def _env(tier: str, name: str, default: float) -> float:
+    """LLM_<TIER>_<NAME> overrides LLM_<NAME>, which overrides the built-in default"""
+    value = os.getenv(f'LLM_{tier.upper()}_{name}') or os.getenv(f'LLM_{name}')
+    return float(value) if value else default
+
+
+class GenerationBudgets:
+    """Computes and accounts for generation budgets per model tier"""
+
+    # truncated: the output ended before the plan closed (num_predict) and its complete actions were kept
+    OUTCOMES = ('completed', 'closure_stop', 'deadline', 'truncated')
+
+    def __init__(self):
+        self.config = {
+            tier: {
+                "base_tokens": int(_env(tier, 'BASE_TOKENS', d["base_tokens"])),
+                "tokens_per_action": int(_env(tier, 'TOKENS_PER_ACTION', d["tokens_per_action"])),
+                "max_tokens": int(_env(tier, 'MAX_TOKENS', d["max_tokens"])),
+                "deadline_seconds": _env(tier, 'DEADLINE_SECONDS', d["deadline_seconds"]),
+            }
+            for tier, d in DEFAULTS.items()
+        }
+        stop = os.getenv('LLM_STOP_SEQUENCES')
+        self.stop: List[str] = ([s.encode().decode('unicode_escape') for s in stop.split('|')]
+                                if stop else list(DEFAULT_STOP))
+
+        self._lock = threading.Lock()
+        self.counters = {tier: {o: 0 for o in self.OUTCOMES} for tier in DEFAULTS}
+        self.tokens_budgeted = {tier: 0 for tier in DEFAULTS}
+
+    def for_request(self, tier: str, user_message: str = "") -> Dict:
+        """
+        Budget for one generation
+        Max tokens scale with the actions the request is expected to produce and
+        the text of it the plan will repeat, up to the tier's max_tokens
+        """
+        config = self.config.get(tier, self.config['large'])
+        num_predict = min(config["max_tokens"],
+                          config["base_tokens"]
+                          + config["tokens_per_action"] * expected_actions(user_message)
+                          + len(user_message or "") // CHARS_PER_TOKEN)
+        with self._lock:
+            self.tokens_budgeted[tier] += num_predict
+        return {
+            "tier": tier,
+            "num_predict": num_predict,
+            "stop": list(self.stop),
+            "deadline": config["deadline_seconds"]
+        }
+
+    def record(self, tier: str, outcome: str):
+        """Count how a budgeted generation ended"""
+        with self._lock:
+            self.counters[tier][outcome] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            tiers = {}
+            for tier, counts in self.counters.items():
+                total = sum(counts.values())
+                tiers[tier] = dict(
+                    self.config[tier],
+                    **counts,
+                    avg_num_predict=round(self.tokens_budgeted[tier] / total, 1) if total else 0.0
+                )
+            return {"stop": self.stop, "tiers": tiers}
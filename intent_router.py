@@ -0,0 +1,137 @@
+"""
+intent_router.py - Deterministic fast path for formulaic commands
+"""
+
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from metrics import LatencyRecorder
+
+EMAIL = r'[\w.+-]+@[\w-]+\.[\w.-]+'
+
+# Intent patterns are only tried after the keyword trie picks an intent
+PATTERNS = {
+    'send_gmail': re.compile(
+        r'^(?:please\s+)?(?:send\s+(?:an?\s+)?)?(?:e-?mail|mail)\s+(?:to\s+)?(?P<to>' + EMAIL + r')[\s,]+'
+        r'subject\s*:\s*(?P<subject>.+?)'
+        r'(?:[\s,]+body\s*:\s*(?P<body>.+))?$',
+        re.IGNORECASE | re.DOTALL
+    ),
+    'create_asana_task': re.compile(
+        r'^(?:please\s+)?(?:(?:create|add|new)\s+(?:an?\s+)?(?:asana\s+)?)?task\s*:\s*(?P<name>.+?)'
+        r'(?:[\s,]+notes?\s*:\s*(?P<notes>.+))?$',
+        re.IGNORECASE | re.DOTALL
+    )
+}
+
+# Leading keyword sequences that identify an intent candidate
+KEYWORDS = {
+    ('email',): 'send_gmail',
+    ('e-mail',): 'send_gmail',
+    ('mail',): 'send_gmail',
+    ('send', 'email'): 'send_gmail',
+    ('send', 'an', 'email'): 'send_gmail',
+    ('send', 'mail'): 'send_gmail',
+    ('task',): 'create_asana_task',
+    ('create', 'task'): 'create_asana_task',
+    ('create', 'a', 'task'): 'create_asana_task',
+    ('create', 'asana', 'task'): 'create_asana_task',
+    ('create', 'an', 'asana', 'task'): 'create_asana_task',
+    ('add', 'task'): 'create_asana_task',
+    ('add', 'a', 'task'): 'create_asana_task',
+    ('new', 'task'): 'create_asana_task',
+}
+
+# Words that suggest more than one intent - leave those to the LLM
+MULTI_INTENT_RE = re.compile(r'\b(?:and\s+(?:then\s+)?(?:send|email|create|add)|then|also)\b', re.IGNORECASE)
+
+TOOL_PROVIDERS = {'send_gmail': 'google', 'create_asana_task': 'asana'}
+
+
+class KeywordTrie:
+    """Word-level trie matching the longest keyword sequence at the start of a message"""
+
+    def __init__(self, entries: Dict[Tuple[str, ...], str]):
+        self._root: Dict = {}
+        for words, intent in entries.items():
+            node = self._root
+            for word in words:
+                node = node.setdefault(word, {})
+            node[None] = intent
+
+    def match(self, tokens: List[str]) -> Optional[str]:
+        node = self._root
+        found = None
+        for token in tokens:
+            node = node.get(token)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
+class IntentRouter:
+    """Produces actions for formulaic messages without calling the LLM"""
+
+    TOKEN_RE = re.compile(r"[a-z][a-z-]*")
+
+    def __init__(self):
+        self.trie = KeywordTrie(KEYWORDS)
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.hits_by_intent = {intent: 0 for intent in PATTERNS}
+        self.latency = LatencyRecorder()
+
+    def route(self, message: str, has_asana: bool, has_gmail: bool) -> Optional[List[Dict]]:
+        """Return a one-action plan when confident, otherwise None to fall through"""
+        start = time.perf_counter()
+        actions = self._route(message.strip(), {'create_asana_task': has_asana, 'send_gmail': has_gmail})
+        self.latency.record((time.perf_counter() - start) * 1000)
+
+        with self._lock:
+            self.attempts += 1
+            if actions:
+                self.hits += 1
+                self.hits_by_intent[actions[0]['tool']] += 1
+        return actions
+
+    def _route(self, message: str, available: Dict[str, bool]) -> Optional[List[Dict]]:
+        tokens = self.TOKEN_RE.findall(message[:64].lower())
+        intent = self.trie.match(tokens)
+        if not intent or not available.get(intent):
+            return None
+
+        match = PATTERNS[intent].match(message)
+        if not match:
+            return None
+
+        # Labelled fields must not hide a second command
+        if MULTI_INTENT_RE.search(match.group('subject' if intent == 'send_gmail' else 'name')):
+            return None
+
+        if intent == 'send_gmail':
+            parameters = {
+                "to": match.group('to'),
+                "subject": match.group('subject').strip(),
+                "body": (match.group('body') or '').strip()
+            }
+        else:
+            parameters = {
+                "name": match.group('name').strip(),
+                "notes": (match.group('notes') or '').strip(),
+                "project_id": ""
+            }
+        return [{"tool": intent, "provider": TOOL_PROVIDERS[intent], "parameters": parameters}]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.attempts, 4) if self.attempts else 0.0,
+                "hits_by_intent": dict(self.hits_by_intent),
+                "latency": self.latency.stats()
+            }
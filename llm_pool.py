@@ -0,0 +1,361 @@
+"""
+llm_pool.py - Health-aware pool of Ollama backends with optional hedging
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+from langchain_ollama import OllamaLLM
+
+from metrics import LatencyRecorder
+
+# Per-stream predicate fed each chunk; True stops the generation early
+StopCheck = Callable[[str], bool]
+
+
+class DeadlineExceeded(Exception):
+    """A generation ran past its wall-clock budget; carries the text produced so far"""
+
+    def __init__(self, partial: str):
+        super().__init__("generation deadline exceeded")
+        self.partial = partial
+
+
+class LLMBackend:
+    """One Ollama endpoint plus its load and health state"""
+
+    def __init__(self, base_url: str, model: str, **llm_kwargs):
+        self.base_url = base_url
+        self.llm = OllamaLLM(model=model, base_url=base_url, **llm_kwargs)
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ttft = LatencyRecorder()
+
+    def is_healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def stats(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "healthy": self.is_healthy(time.monotonic()),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ttft": self.ttft.stats()
+        }
+
+
+class LLMPool:
+    """
+    Routes generations across several Ollama hosts
+
+    Picks the healthy backend with the fewest outstanding requests. A backend
+    is ejected after LLM_EJECT_AFTER consecutive failures and gets one probe
+    request once LLM_EJECT_SECONDS have passed. With hedging on, an async call
+    whose first token hasn't arrived by the observed p95 time-to-first-token
+    is duplicated on a second backend and the first finished result wins.
+    """
+
+    def __init__(self, model: str, base_urls: List[str] = None, hedge: bool = None,
+                 eject_after: int = None, eject_seconds: float = None, **llm_kwargs):
+        if base_urls is None:
+            urls = os.getenv('OLLAMA_BASE_URLS') or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+            base_urls = [u.strip() for u in urls.split(',') if u.strip()]
+        self.model = model
+        self.backends = [LLMBackend(url, model, **llm_kwargs) for url in base_urls]
+
+        if hedge is None:
+            hedge = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+        self.hedge = hedge and len(self.backends) > 1
+        self.hedge_default_ms = float(os.getenv('LLM_HEDGE_DEFAULT_MS', 2000))
+        self.eject_after = eject_after or int(os.getenv('LLM_EJECT_AFTER', 3))
+        self.eject_seconds = eject_seconds or float(os.getenv('LLM_EJECT_SECONDS', 30))
+
+        self._lock = threading.Lock()
+        self._rr = 0
+        self.ttft = LatencyRecorder()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    # Routing and health
+
+    def _acquire(self, exclude: Sequence[LLMBackend] = ()) -> LLMBackend:
+        """Pick the least-loaded healthy backend not in exclude and count it as outstanding"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b not in exclude] or self.backends
+            healthy = [b for b in candidates if b.is_healthy(now)]
+            if healthy:
+                # Rotate the start point so ties spread across backends
+                self._rr = (self._rr + 1) % len(healthy)
+                rotated = healthy[self._rr:] + healthy[:self._rr]
+                backend = min(rotated, key=lambda b: b.outstanding)
+            else:
+                backend = min(candidates, key=lambda b: b.ejected_until)
+            if not backend.is_healthy(now):
+                # Half-open probe: hold it out again unless this request succeeds
+                backend.ejected_until = now + self.eject_seconds
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend: LLMBackend, ok: bool):
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.consecutive_failures = 0
+                backend.ejected_until = 0.0
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if backend.consecutive_failures >= self.eject_after:
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+                print(f"⚠️ Ejected LLM backend {backend.base_url} for {self.eject_seconds:.0f}s")
+
+    def _record_ttft(self, backend: LLMBackend, started: float):
+        ms = (time.perf_counter() - started) * 1000
+        backend.ttft.record(ms)
+        self.ttft.record(ms)
+
+    def hedge_deadline(self) -> float:
+        """Seconds to wait for a first token before hedging"""
+        if self.ttft.count >= 20:
+            return self.ttft.percentile(95) / 1000
+        return self.hedge_default_ms / 1000
+
+    # OllamaLLM-compatible interface
+
+    def invoke(self, prompt: str, deadline: float = None,
+               make_stop_check: Callable[[], StopCheck] = None, **kwargs) -> str:
+        """
+        Generate on the best backend, failing over on errors
+
+        deadline: wall-clock seconds; DeadlineExceeded carries the partial text
+        make_stop_check: returns a fresh per-stream predicate; generation stops
+        early once it returns True for a chunk
+        """
+        deadline_at = time.monotonic() + deadline if deadline else None
+        last_error = None
+        tried = []
+        for _ in range(len(self.backends)):
+            backend = self._acquire(exclude=tried)
+            tried.append(backend)
+            ok = False
+            try:
+                if deadline_at is None and make_stop_check is None:
+                    result = backend.llm.invoke(prompt, **kwargs)
+                else:
+                    result = self._collect_sync(backend, prompt, deadline_at, make_stop_check, **kwargs)
+                ok = True
+                return result
+            except DeadlineExceeded:
+                ok = True
+                raise
+            except Exception as e:
+                last_error = e
+            finally:
+                self._release(backend, ok)
+        raise last_error
+
+    def _collect_sync(self, backend: LLMBackend, prompt: str, deadline_at: Optional[float],
+                      make_stop_check: Optional[Callable[[], StopCheck]], **kwargs) -> str:
+        """
+        Stream a full generation, giving up at deadline_at
+        A blocking read can't be interrupted, so the stream is read on a helper
+        thread and the caller waits on its chunks with a timeout; a backend that
+        stalls before its first token or between tokens is cut off on time
+        """
+        started = time.perf_counter()
+        stop_check = make_stop_check() if make_stop_check else None
+        chunks = queue.Queue()
+        stop = threading.Event()
+        threading.Thread(target=self._read_stream, args=(backend, prompt, kwargs, chunks, stop),
+                         name="llm-stream", daemon=True).start()
+        parts = []
+        try:
+            while True:
+                timeout = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+                try:
+                    kind, value = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise DeadlineExceeded("".join(parts))
+                if kind == 'end':
+                    break
+                if kind == 'error':
+                    raise value
+                if not parts:
+                    self._record_ttft(backend, started)
+                parts.append(value)
+                if stop_check and stop_check(value):
+                    break
+        finally:
+            # The reader drops the stream at its next chunk
+            stop.set()
+        return "".join(parts)
+
+    @staticmethod
+    def _read_stream(backend: LLMBackend, prompt: str, kwargs: Dict, chunks: queue.Queue,
+                     stop: threading.Event):
+        """Helper thread for _collect_sync: feeds ('chunk', text), then ('end', None) or ('error', e)"""
+        stream = backend.llm.stream(prompt, **kwargs)
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                chunks.put(('chunk', chunk))
+            chunks.put(('end', None))
+        except Exception as e:
+            chunks.put(('error', e))
+        finally:
+            stream.close()
+
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        backend = self._acquire()
+        started = time.perf_counter()
+        stream = backend.llm.astream(prompt, **kwargs)
+        ok = False
+        first = True
+        try:
+            async for chunk in stream:
+                if first:
+                    self._record_ttft(backend, started)
+                    first = False
+                yield chunk
+            ok = True
+        except (GeneratorExit, asyncio.CancelledError):
+            # The caller stopped reading early; the backend is fine
+            ok = True
+            raise
+        finally:
+            await stream.aclose()
+            self._release(backend, ok)
+
+    async def ainvoke(self, prompt: str, deadline: float = None,
+                      make_stop_check: Callable[[], StopCheck] = None, **kwargs) -> str:
+        """Async variant of invoke, with optional hedging"""
+        deadline_at = time.monotonic() + deadline if deadline else None
+        last_error = None
+        # Backends this call has used; a retry goes elsewhere
+        tried = []
+        for _ in range(len(self.backends)):
+            try:
+                if self.hedge:
+                    return await self._hedged(prompt, tried, deadline_at, make_stop_check, **kwargs)
+                backend = self._acquire(exclude=tried)
+                tried.append(backend)
+                return await self._collect(backend, prompt, asyncio.Event(),
+                                           deadline_at, make_stop_check, **kwargs)
+            except (asyncio.CancelledError, DeadlineExceeded):
+                raise
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    async def _collect(self, backend: LLMBackend, prompt: str, first_token: asyncio.Event,
+                       deadline_at: Optional[float] = None,
+                       make_stop_check: Optional[Callable[[], StopCheck]] = None, **kwargs) -> str:
+        """Stream a full generation from an already-acquired backend"""
+        started = time.perf_counter()
+        stop_check = make_stop_check() if make_stop_check else None
+        parts = []
+        ok = False
+        stream = backend.llm.astream(prompt, **kwargs)
+        try:
+            while True:
+                timeout = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded("".join(parts))
+                if not first_token.is_set():
+                    self._record_ttft(backend, started)
+                    first_token.set()
+                parts.append(chunk)
+                if stop_check and stop_check(chunk):
+                    break
+            ok = True
+            return "".join(parts)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # Losing a hedge race or running out of budget is not a backend failure
+            ok = True
+            raise
+        finally:
+            await stream.aclose()
+            self._release(backend, ok)
+
+    async def _hedged(self, prompt: str, tried: List[LLMBackend], deadline_at: Optional[float],
+                      make_stop_check: Optional[Callable[[], StopCheck]], **kwargs) -> str:
+        """Race a second backend if the first is slow to start; both are added to tried"""
+        primary_backend = self._acquire(exclude=tried)
+        tried.append(primary_backend)
+        primary_first = asyncio.Event()
+        primary = asyncio.create_task(self._collect(primary_backend, prompt, primary_first,
+                                                    deadline_at, make_stop_check, **kwargs))
+        first_wait = asyncio.create_task(primary_first.wait())
+
+        try:
+            done, _ = await asyncio.wait({primary, first_wait}, timeout=self.hedge_deadline(),
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            first_wait.cancel()
+
+        if done:
+            return await primary
+
+        # No first token by the deadline: race a duplicate on another backend
+        with self._lock:
+            self.hedges_fired += 1
+        hedge_backend = self._acquire(exclude=tried)
+        tried.append(hedge_backend)
+        hedge = asyncio.create_task(
+            self._collect(hedge_backend, prompt, asyncio.Event(),
+                          deadline_at, make_stop_check, **kwargs)
+        )
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            with self._lock:
+                                self.hedges_won += 1
+                        return task.result()
+            # Both failed
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def warm_up(self, prompt: str) -> Dict[str, float]:
+        """Load the model on every backend and prime its prefix cache; returns ms per backend"""
+        timings = {}
+        for backend in self.backends:
+            started = time.perf_counter()
+            try:
+                backend.llm.invoke(prompt, options={"num_predict": 1})
+                timings[backend.base_url] = round((time.perf_counter() - started) * 1000, 1)
+                print(f"🔥 Warmed {self.model} on {backend.base_url} in {timings[backend.base_url]:.0f} ms")
+            except Exception as e:
+                print(f"⚠️ Warm-up failed for {backend.base_url}: {e}")
+        return timings
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "hedge": self.hedge,
+                "hedge_deadline_ms": round(self.hedge_deadline() * 1000, 3),
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won,
+                "backends": [b.stats() for b in self.backends]
+            }
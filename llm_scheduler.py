@@ -0,0 +1,83 @@
+"""
+llm_scheduler.py - Admission of planning generations into the server's parallel slots
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from metrics import LatencyRecorder
+
+
+class PlanningScheduler:
+    """
+    The one gate every planning generation, whole or streamed, passes through
+
+    Ollama has no multi-prompt generate call; it batches whatever requests are
+    running at once across its OLLAMA_NUM_PARALLEL slots. Holding prompts back
+    to form a batch would only add latency, so a generation starts as soon as
+    fewer than max_concurrency are in flight and otherwise waits its turn.
+    Waiting and running happen in the caller's task: a caller that is
+    cancelled frees its slot and leaves nothing pending.
+    """
+
+    KINDS = ('generate', 'stream')
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.largest_queue = 0
+        self.admitted = {kind: 0 for kind in self.KINDS}
+        self.cancelled = 0
+        self.wait_time = LatencyRecorder()
+
+    @asynccontextmanager
+    async def slot(self, kind: str = 'generate') -> AsyncIterator[None]:
+        """Hold one of the server's slots for the body of the block"""
+        queued_at = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.largest_queue = max(self.largest_queue, self.waiting)
+        admitted = False
+        try:
+            async with self._semaphore:
+                admitted = True
+                self._admit(queued_at, kind)
+                try:
+                    yield
+                finally:
+                    with self._lock:
+                        self.in_flight -= 1
+        except asyncio.CancelledError:
+            with self._lock:
+                self.cancelled += 1
+            raise
+        finally:
+            if not admitted:
+                with self._lock:
+                    self.waiting -= 1
+
+    def _admit(self, queued_at: float, kind: str):
+        self.wait_time.record((time.perf_counter() - queued_at) * 1000)
+        with self._lock:
+            self.waiting -= 1
+            self.in_flight += 1
+            self.admitted[kind] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "largest_queue": self.largest_queue,
+                "admitted": dict(self.admitted),
+                "cancelled": self.cancelled,
+                "wait_time": self.wait_time.stats()
+            }
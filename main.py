@@ -3,20 +3,63 @@ main.py - FastAPI application
 """
 
 import os
-from typing import List, Dict
+import json
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Dict, Optional
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
-from agent_brain import agent_brain, get_agent_plan
+from agent_brain import agent_brain, aget_agent_plan
 from database import db_manager  # Add this import
+from async_database import async_db
+from chat_log_buffer import chat_log
+from retention import retention
 from tools.asana_tool import execute_asana_task
 from tools.google_tool import send_gmail
+from tools.http_client import http_client
 
 load_dotenv()
 
-app = FastAPI(title="Gaprio Agent API", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+# Conversation logging goes through the write-behind buffer, off the request path
+CHAT_LOGGING_ENABLED = os.getenv('CHAT_LOGGING_ENABLED', 'false').lower() == 'true'
+
+# Longest a GET /actions/{id}/result long-poll may hold the request
+ACTION_RESULT_MAX_WAIT = float(os.getenv('ACTION_RESULT_MAX_WAIT', 30))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown hooks"""
+    if os.getenv('DB_ASYNC_ENABLED', 'true').lower() == 'true':
+        await async_db.connect()
+    if os.getenv('LLM_WARM_UP', 'true').lower() == 'true':
+        # Load planning models in the background so the first request isn't cold
+        asyncio.get_running_loop().run_in_executor(None, agent_brain.warm_up)
+    if CHAT_LOGGING_ENABLED:
+        chat_log.start()
+    # Claims left by a dead worker are released by the retention loop once their
+    # lease runs out; other workers' claims at boot may still be running
+    if os.getenv('RETENTION_ENABLED', 'false').lower() == 'true':
+        retention.start()
+    yield
+    retention.close()
+    agent_brain.asana_metadata.close()
+    # Let queued actions finish before their HTTP client and status writes go away
+    await run_in_threadpool(agent_brain.executor.close)
+    http_client.close()
+    # Drain queued chat logs while the database is still reachable
+    await run_in_threadpool(chat_log.close)
+    await async_db.close()
+    db_manager.close()
+
+app = FastAPI(title="Gaprio Agent API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -31,10 +74,18 @@ app.add_middleware(
 class UserMessage(BaseModel):
     user_id: int
     message: str
+    use_cache: bool = True
 
 class ActionApproval(BaseModel):
     user_id: int
     action_id: int
+    # False returns as soon as the action is queued; poll /actions/{id}/result
+    wait: bool = True
+
+class BulkActionApproval(BaseModel):
+    user_id: int
+    action_ids: List[int]
+    wait: bool = True
 
 class ActionData(BaseModel):
     tool: str
@@ -52,30 +103,69 @@ async def ask_agent(user_msg: UserMessage):
     Process user message and generate action plan
     """
     try:
-        plan = get_agent_plan(user_msg.user_id, user_msg.message)
+        if CHAT_LOGGING_ENABLED:
+            await chat_log.alog(user_msg.user_id, 'user', user_msg.message)
+        plan = await aget_agent_plan(user_msg.user_id, user_msg.message, user_msg.use_cache)
+        message = f"Generated {len(plan)} action(s) pending approval"
+        if CHAT_LOGGING_ENABLED:
+            await chat_log.alog(user_msg.user_id, 'assistant', message)
         
         return {
             "status": "success",
             "plan": plan,
             "requires_approval": len(plan) > 0,
-            "message": f"Generated {len(plan)} action(s) pending approval"
+            "message": message
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ask-agent/stream")
+async def ask_agent_stream(user_msg: UserMessage):
+    """
+    Stream the action plan as NDJSON, one line per action as soon as it is saved
+    """
+    async def events():
+        count = 0
+        if CHAT_LOGGING_ENABLED:
+            await chat_log.alog(user_msg.user_id, 'user', user_msg.message)
+        try:
+            async for item in agent_brain.astream_agent_plan(
+                user_msg.user_id, user_msg.message, user_msg.use_cache
+            ):
+                count += 1
+                yield json.dumps({"event": "action", **item}, default=str) + "\n"
+            if CHAT_LOGGING_ENABLED:
+                await chat_log.alog(user_msg.user_id, 'assistant', f"Generated {count} action(s) pending approval")
+            yield json.dumps({
+                "event": "done",
+                "count": count,
+                "requires_approval": count > 0
+            }) + "\n"
+        except Exception as e:
+            yield json.dumps({"event": "error", "message": str(e)}) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.get("/pending-actions/{user_id}", response_model=Dict)
-async def get_pending_actions(user_id: int):
+async def get_pending_actions(user_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                              fields: Optional[str] = None):
     """
-    Get all pending actions for a user
+    Get a user's pending actions, newest first, one page at a time
+    Pass next_cursor back as `cursor` for the following page; `fields` is a
+    comma-separated projection (leave out draft_payload for a light listing)
     """
     try:
-        actions = agent_brain.get_pending_actions(user_id)
+        field_list = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+        page = await agent_brain.aget_pending_actions_page(user_id, limit, cursor, field_list)
         
         return {
             "status": "success",
-            "count": len(actions),
-            "actions": actions
+            "count": len(page["actions"]),
+            "actions": page["actions"],
+            "next_cursor": page["next_cursor"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -85,7 +175,15 @@ async def approve_action(approval: ActionApproval):
     Approve and execute a pending action
     """
     try:
-        result = agent_brain.approve_action(approval.action_id)
+        result = await run_in_threadpool(agent_brain.submit_action, approval.action_id, approval.user_id)
+        if result["success"]:
+            if not approval.wait:
+                return {
+                    "status": "accepted",
+                    "message": "Action queued for execution",
+                    "action_id": approval.action_id
+                }
+            result = await agent_brain.await_action(approval.action_id, approval.user_id)
         
         if result["success"]:
             return {
@@ -101,6 +199,46 @@ async def approve_action(approval: ActionApproval):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/approve-actions", response_model=Dict)
+async def approve_actions(approval: BulkActionApproval):
+    """
+    Approve and execute several pending actions at once
+    """
+    try:
+        if not approval.wait:
+            results = await run_in_threadpool(agent_brain.submit_actions, approval.action_ids, approval.user_id)
+            accepted = sum(1 for r in results.values() if r["success"])
+            return {
+                "status": "accepted" if accepted == len(results) else "partial",
+                "accepted": accepted,
+                "results": {str(action_id): r for action_id, r in results.items()}
+            }
+        
+        results = await run_in_threadpool(agent_brain.approve_actions, approval.action_ids, approval.user_id,
+                                          ACTION_RESULT_MAX_WAIT)
+        executed = sum(1 for r in results.values() if r["success"])
+        
+        return {
+            "status": "success" if executed == len(results) else "partial",
+            "executed": executed,
+            "results": {str(action_id): r for action_id, r in results.items()}
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/actions/{action_id}/result", response_model=Dict)
+async def action_result(action_id: int, user_id: int, timeout: float = 0):
+    """
+    Outcome of one of user_id's approved actions
+    Waits up to `timeout` seconds (at most ACTION_RESULT_MAX_WAIT) for a queued
+    or running action to finish before answering with its current state
+    """
+    timeout = min(max(timeout, 0), ACTION_RESULT_MAX_WAIT)
+    result = await agent_brain.await_action(action_id, user_id, timeout)
+    if result.get("error") == "Action not found":
+        raise HTTPException(status_code=404, detail="Action not found")
+    return {"action_id": action_id, **result}
+
 @app.post("/execute-action", response_model=Dict)
 async def execute_action(action: ActionData):
     """
@@ -128,6 +266,13 @@ async def execute_action(action: ActionData):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics", response_model=Dict)
+async def metrics():
+    """Planner, cache, token cache and database pool metrics"""
+    return {**agent_brain.stats(), "database": db_manager.stats(), "async_database": async_db.stats(),
+            "token_cache": db_manager.token_cache.stats(), "chat_log": chat_log.stats(),
+            "retention": retention.stats(), "provider_http": http_client.stats()}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint with proper database connection test"""
@@ -135,16 +280,11 @@ async def health_check():
         # Test database connection
         db_status = "disconnected"
         try:
-            # Use db_manager instance
-            if db_manager.connection and db_manager.connection.is_connected():
-                # Test with a simple query
-                cursor = db_manager.connection.cursor(buffered=True)
-                cursor.execute("SELECT 1")
-                cursor.fetchall()
-                cursor.close()
+            # Test with a simple query on a pooled connection; waiting for one off the event loop
+            if await run_in_threadpool(db_manager.ping):
                 db_status = "connected"
         except Exception as e:
-            print(f"Database health check error: {e}")
+            logger.warning("Database health check error: %s", e)
             db_status = "disconnected"
         
         return {
@@ -0,0 +1,40 @@
+"""
+metrics.py - Lightweight in-process counters for the /metrics endpoint
+"""
+
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyRecorder:
+    """Running count/mean plus percentiles over a sliding window of samples"""
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+
+    def record(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+            self.total_ms += ms
+
+    def percentile(self, pct: float) -> float:
+        """Percentile over the current window (0.0 when empty)"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def stats(self) -> Dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3)
+        }
@@ -0,0 +1,218 @@
+"""
+migrations.py - Versioned schema migrations driven by models.py
+
+Each migration runs once per database and is recorded in schema_migrations.
+Run `python migrations.py` to bring the configured database up to date, or
+`python migrations.py --sql` to print the DDL for a fresh database.
+"""
+
+import argparse
+import os
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+from mysql.connector import Error
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.dialects import mysql as mysql_dialect
+from sqlalchemy.schema import AddConstraint, CreateIndex, CreateTable
+
+from models import Base
+
+load_dotenv()
+
+SCHEMA_TABLE = 'schema_migrations'
+
+SCHEMA_TABLE_DDL = f"""CREATE TABLE IF NOT EXISTS {SCHEMA_TABLE} (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)"""
+
+# Indexes older setup scripts created that a model index now covers
+LEGACY_INDEXES = {
+    'ai_pending_actions': ['idx_user_status'],
+}
+
+_DIALECT = mysql_dialect.dialect()
+
+
+def _compile(ddl) -> str:
+    sql = str(ddl.compile(dialect=_DIALECT)).strip().replace('\t', '    ')
+    return "\n".join(line.rstrip() for line in sql.splitlines())
+
+
+def create_table_statements() -> List[str]:
+    """CREATE TABLE IF NOT EXISTS for every model, parents first"""
+    return [_compile(CreateTable(table, if_not_exists=True)) for table in Base.metadata.sorted_tables]
+
+
+def model_indexes() -> Dict[str, Dict[str, str]]:
+    """{table: {index name: DDL that adds it}} for every named index and unique key"""
+    indexes = {}
+    for table in Base.metadata.sorted_tables:
+        statements = {}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            statements[index.name] = _compile(CreateIndex(index))
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name:
+                statements[constraint.name] = _compile(AddConstraint(constraint))
+        indexes[table.name] = statements
+    return indexes
+
+
+def existing_indexes(cursor, table: str) -> Set[str]:
+    """Names of the indexes a table already has"""
+    cursor.execute("""
+        SELECT DISTINCT index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def existing_columns(cursor, table: str) -> Set[str]:
+    """Names of a table's columns"""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def create_tables(cursor):
+    """Create any missing table (existing ones are left as they are)"""
+    for statement in create_table_statements():
+        cursor.execute(statement)
+
+
+def sync_indexes(cursor):
+    """Add the model indexes a database lacks and drop the legacy ones they replace"""
+    # Older schemas had no unique key; before adding it keep the row per (user_id, provider)
+    # the app reads, the most recently updated one (highest id on a tie)
+    if 'unique_user_provider' not in existing_indexes(cursor, 'user_connections'):
+        cursor.execute("""
+            DELETE older FROM user_connections older
+            JOIN user_connections newer
+              ON newer.user_id = older.user_id AND newer.provider = older.provider
+             AND (newer.updated_at > older.updated_at
+                  OR (newer.updated_at = older.updated_at AND newer.id > older.id))
+        """)
+
+    for table, statements in model_indexes().items():
+        present = existing_indexes(cursor, table)
+        for name, statement in statements.items():
+            if name not in present:
+                print(f"   + {table}.{name}")
+                cursor.execute(statement)
+        # Dropped after the replacements exist so foreign keys always have an index
+        for name in LEGACY_INDEXES.get(table, []):
+            if name in present:
+                print(f"   - {table}.{name}")
+                cursor.execute(f"DROP INDEX {name} ON {table}")
+
+
+def column_spec(table: str, column: str) -> str:
+    """The model's column definition, for ALTER TABLE ... MODIFY"""
+    compiler = _DIALECT.ddl_compiler(_DIALECT, None)
+    return compiler.get_column_specification(Base.metadata.tables[table].c[column])
+
+
+def add_expired_status(cursor):
+    """Let the retention sweeper mark stale drafts 'expired'"""
+    cursor.execute(f"ALTER TABLE ai_pending_actions MODIFY COLUMN {column_spec('ai_pending_actions', 'status')}")
+
+
+def add_claimed_at(cursor):
+    """Record when an approval claims an action, so lost claims can be released"""
+    # Databases created at version 1 after the column was modelled already have it
+    if 'claimed_at' not in existing_columns(cursor, 'ai_pending_actions'):
+        cursor.execute("ALTER TABLE ai_pending_actions ADD COLUMN "
+                       f"{column_spec('ai_pending_actions', 'claimed_at')}")
+
+
+# (version, description, step); append new versions, never edit applied ones
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "create tables from models", create_tables),
+    (2, "hot-path indexes", sync_indexes),
+    (3, "expired action status", add_expired_status),
+    (4, "approval claim timestamp", add_claimed_at),
+]
+
+
+def applied_versions(cursor) -> Set[int]:
+    """Versions already recorded in schema_migrations"""
+    cursor.execute(SCHEMA_TABLE_DDL)
+    cursor.execute(f"SELECT version FROM {SCHEMA_TABLE}")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (default: latest); returns the versions applied"""
+    cursor = conn.cursor(buffered=True)
+    try:
+        done = applied_versions(cursor)
+        applied = []
+        for version, description, step in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+            print(f"🔧 Migration {version}: {description}")
+            step(cursor)
+            cursor.execute(f"INSERT INTO {SCHEMA_TABLE} (version, description) VALUES (%s, %s)",
+                           (version, description))
+            conn.commit()
+            applied.append(version)
+        return applied
+    finally:
+        cursor.close()
+
+
+def run_migrations(config: Optional[Dict] = None, target: Optional[int] = None) -> Optional[List[int]]:
+    """Create the database if needed and migrate it; None on connection/DDL errors"""
+    config = dict(config or {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', 'Axkpq@8210'),
+        'database': os.getenv('DB_NAME', 'gaprio_agent_dev'),
+    })
+    database = config.pop('database')
+    try:
+        conn = mysql.connector.connect(**config)
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+        cursor.execute(f"USE `{database}`")
+        cursor.close()
+        try:
+            applied = migrate(conn, target)
+        finally:
+            conn.close()
+        print(f"✅ {database} is at version {MIGRATIONS[-1][0] if target is None else target}"
+              f" ({len(applied)} migration(s) applied)")
+        return applied
+    except Error as e:
+        print(f"❌ Migration failed: {e}")
+        return None
+
+
+def schema_sql() -> str:
+    """DDL for a fresh database at the latest version, for review or `mysql <`"""
+    statements = create_table_statements()
+    for table_indexes in model_indexes().values():
+        # Unique keys are already part of CREATE TABLE
+        statements.extend(s for s in table_indexes.values() if s.startswith("CREATE"))
+    statements.append(SCHEMA_TABLE_DDL)
+    statements.extend(f"INSERT IGNORE INTO {SCHEMA_TABLE} (version, description) VALUES ({v}, '{d}')"
+                      for v, d, _ in MIGRATIONS)
+    return ";\n\n".join(statements) + ";\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--target", type=int, help="stop at this version")
+    parser.add_argument("--sql", action="store_true", help="print the schema DDL instead of applying it")
+    args = parser.parse_args()
+
+    if args.sql:
+        print(schema_sql())
+    else:
+        run_migrations(target=args.target)
@@ -0,0 +1,83 @@
+"""
+model_router.py - Complexity-based routing between a small and a large planning model
+"""
+
+import os
+import re
+import threading
+from typing import Dict
+
+from metrics import LatencyRecorder
+
+INTENT_VERBS = re.compile(
+    r'\b(?:create|make|add|send|email|e-mail|mail|schedule|remind|assign|invite|'
+    r'forward|reply|update|move|share|notify|book|follow\s+up)\b',
+    re.IGNORECASE
+)
+CONJUNCTIONS = re.compile(r'\b(?:and|then|also|plus|after\s+that)\b|[;,]', re.IGNORECASE)
+AMBIGUITY = re.compile(r'\?|\b(?:maybe|somehow|something|whatever|figure\s+out|not\s+sure|either)\b',
+                       re.IGNORECASE)
+
+
+class ModelRouter:
+    """
+    Scores how hard a planning request is and picks a model tier
+
+    Short single-intent commands go to the small model; long, multi-intent or
+    ambiguous requests go to the large one. Small-tier output that doesn't
+    parse is escalated to the large tier by AgentBrain.
+    """
+
+    TIERS = ('small', 'large')
+
+    def __init__(self, threshold: float = None, max_simple_words: int = None):
+        self.threshold = threshold or float(os.getenv('LLM_COMPLEXITY_THRESHOLD', 2.0))
+        self.max_simple_words = max_simple_words or int(os.getenv('LLM_SIMPLE_MAX_WORDS', 20))
+        self._lock = threading.Lock()
+        self.counters = {tier: {"requests": 0, "parse_ok": 0, "parse_failed": 0} for tier in self.TIERS}
+        self.escalations = 0
+        self.latency = {tier: LatencyRecorder() for tier in self.TIERS}
+
+    def complexity(self, message: str, tool_count: int) -> float:
+        """Heuristic complexity score; higher means the large model is needed"""
+        words = len(message.split())
+        intents = len(INTENT_VERBS.findall(message))
+        score = 0.0
+        score += max(0, intents - 1) * 1.5
+        score += len(CONJUNCTIONS.findall(message)) * 0.5
+        score += len(AMBIGUITY.findall(message)) * 1.0
+        score += max(0, words - self.max_simple_words) / self.max_simple_words
+        score += max(0, tool_count - 1) * 0.25
+        if intents == 0:
+            # No recognizable command: let the stronger model decide what was meant
+            score += 1.0
+        return score
+
+    def select_tier(self, message: str, tool_count: int) -> str:
+        return 'small' if self.complexity(message, tool_count) < self.threshold else 'large'
+
+    def record(self, tier: str, ms: float, parsed: bool):
+        """Count one generation and whether its output parsed into a plan"""
+        self.latency[tier].record(ms)
+        with self._lock:
+            self.counters[tier]["requests"] += 1
+            self.counters[tier]["parse_ok" if parsed else "parse_failed"] += 1
+
+    def record_escalation(self):
+        with self._lock:
+            self.escalations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            tiers = {}
+            for tier in self.TIERS:
+                counts = dict(self.counters[tier])
+                counts["parse_rate"] = (round(counts["parse_ok"] / counts["requests"], 4)
+                                        if counts["requests"] else 0.0)
+                counts["latency"] = self.latency[tier].stats()
+                tiers[tier] = counts
+            return {
+                "threshold": self.threshold,
+                "escalations": self.escalations,
+                "tiers": tiers
+            }
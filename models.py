@@ -1,55 +1,81 @@
 """
 models.py - SQLAlchemy models
+
+The single source of the schema: migrations.py builds the tables and indexes from
+these definitions. Indexes are named after the queries in database.py they serve.
 """
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, JSON, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import (Column, Integer, String, Text, ForeignKey, Enum, JSON, TIMESTAMP, Index,
+                        UniqueConstraint, text)
+from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
-import datetime
 
 Base = declarative_base()
 
 class User(Base):
     __tablename__ = 'users'
-    
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False)
     full_name = Column(String(100))
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(TIMESTAMP, server_default=func.now())
 
 class UserConnection(Base):
     __tablename__ = 'user_connections'
-    
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     provider = Column(Enum('google', 'asana'), nullable=False)
     provider_user_id = Column(String(255))
     access_token = Column(Text, nullable=False)
     refresh_token = Column(Text)
-    expires_at = Column(DateTime)
-    metadata = Column(JSON)
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    expires_at = Column(TIMESTAMP, nullable=True)
+    # `metadata` is reserved on declarative classes; the column keeps its name
+    metadata_ = Column('metadata', JSON)
+    updated_at = Column(TIMESTAMP, server_default=text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'))
+
+    __table_args__ = (
+        # save_user_connection upserts on it
+        UniqueConstraint('user_id', 'provider', name='unique_user_provider'),
+        # USER_TOKENS_QUERY: WHERE user_id ORDER BY updated_at DESC
+        Index('idx_user_updated', 'user_id', 'updated_at'),
+    )
 
 class AgentChatLog(Base):
     __tablename__ = 'agent_chat_logs'
-    
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     role = Column(Enum('user', 'assistant'), nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+    __table_args__ = (
+        # A user's conversation in time order
+        Index('idx_user_chat', 'user_id', 'created_at'),
+    )
 
 class AIPendingAction(Base):
     __tablename__ = 'ai_pending_actions'
-    
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     provider = Column(Enum('google', 'asana'))
     action_type = Column(String(50))
     draft_payload = Column(JSON)
     status = Column(
-        Enum('pending', 'approved', 'rejected', 'executed'),
-        default='pending'
+        # New values go at the end so widening the ENUM stays a metadata-only change
+        Enum('pending', 'approved', 'rejected', 'executed', 'expired'),
+        server_default='pending'
+    )
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    executed_at = Column(TIMESTAMP, nullable=True)
+    # When an approval claimed the row; a claim older than the lease was lost with its process
+    claimed_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        # Keyset pagination of /pending-actions: WHERE user_id, status ORDER BY created_at, id
+        Index('idx_user_status_created', 'user_id', 'status', 'created_at', 'id'),
+        # get_pending_actions without a user: WHERE status ORDER BY created_at
+        Index('idx_status_created', 'status', 'created_at'),
     )
-    created_at = Column(DateTime, default=func.now())
-    executed_at = Column(DateTime)
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+plan_cache.py - Exact-match cache for LLM action plans
+"""
+
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class PlanCache:
+    """LRU cache of action plans with a per-entry TTL"""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None):
+        self.max_entries = max_entries or int(os.getenv('PLAN_CACHE_SIZE', 1024))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('PLAN_CACHE_TTL', 3600))
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Normalize a message so trivial formatting differences share an entry"""
+        message = re.sub(r'\s+', ' ', message.strip().lower())
+        return message.rstrip('.!?')
+
+    @classmethod
+    def make_key(cls, message: str, *tool_flags: bool) -> Tuple:
+        """Cache key: normalized message plus the tool-availability tuple"""
+        return (cls.normalize(message), tuple(bool(f) for f in tool_flags))
+
+    def get(self, key: Tuple) -> Optional[List[Dict]]:
+        """Return a copy of the cached plan, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, actions = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(actions)
+
+    def put(self, key: Tuple, actions: List[Dict]):
+        """Store a plan, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(actions))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,124 @@
+"""
+plan_stream.py - Incremental parsing of streamed LLM action plans
+"""
+
+import json
+from typing import Dict, List, Optional
+
+
+class IncrementalActionParser:
+    """
+    Emits action objects from a JSON plan as soon as each one closes
+
+    Accepts the same shapes as AgentBrain._parse_llm_response: a bare list,
+    a dict wrapping the list under actions/plan/tools (or any other key as a
+    fallback), optionally inside markdown code fences.
+    """
+
+    WRAPPER_KEYS = ('actions', 'plan', 'tools')
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: List[Dict] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._object_start: Optional[int] = None
+        self._fallback: List[Dict] = []
+        self._fallback_seen = False
+        self.emitted = 0
+        self.complete = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a chunk of model output and return newly completed actions"""
+        if self.complete:
+            return []
+
+        self._text += chunk
+        actions = []
+        text = self._text
+
+        while self._pos < len(text) and not self.complete:
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._stack[0]['type'] == '{':
+                        self._last_string = json.loads(text[self._string_start:i + 1])
+                continue
+
+            if not self._stack:
+                # Skip fences and chatter before the root container
+                if ch in '[{':
+                    self._open(ch, i)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in '[{':
+                self._open(ch, i)
+            elif ch in ']}':
+                action = self._close(i)
+                if action is not None:
+                    actions.append(action)
+
+        self.emitted += len(actions)
+        return actions
+
+    def finish(self) -> List[Dict]:
+        """Return actions found under a non-standard wrapper key, if nothing else was emitted"""
+        if self.emitted or not self._fallback:
+            return []
+        actions, self._fallback = self._fallback, []
+        self.emitted += len(actions)
+        return actions
+
+    def _open(self, ch: str, index: int):
+        parent = self._stack[-1] if self._stack else None
+        entry = {'type': ch, 'role': None}
+
+        if ch == '[':
+            if parent is None:
+                entry['role'] = 'actions'
+            elif parent['role'] == 'root':
+                if self._last_string in self.WRAPPER_KEYS:
+                    entry['role'] = 'actions'
+                elif not self._fallback_seen:
+                    # Like _parse_llm_response, only the first other list counts
+                    entry['role'] = 'fallback'
+                    self._fallback_seen = True
+        elif parent is None:
+            entry['role'] = 'root'
+        elif parent['role'] in ('actions', 'fallback'):
+            entry['role'] = 'item'
+            self._object_start = index
+
+        self._stack.append(entry)
+
+    def _close(self, index: int) -> Optional[Dict]:
+        entry = self._stack.pop()
+        if not self._stack:
+            self.complete = True
+
+        if entry['role'] != 'item':
+            return None
+
+        try:
+            obj = json.loads(self._text[self._object_start:index + 1])
+        except json.JSONDecodeError:
+            return None
+
+        if self._stack[-1]['role'] == 'fallback':
+            self._fallback.append(obj)
+            return None
+        return obj
@@ -13,6 +13,7 @@ def reset_database():
     
     import mysql.connector
     from dotenv import load_dotenv
+    from migrations import migrate
     
     load_dotenv()
     
@@ -31,55 +32,8 @@ def reset_database():
         cursor.execute("CREATE DATABASE gaprio_agent_dev")
         cursor.execute("USE gaprio_agent_dev")
         
-        # Create tables
-        tables = [
-            """
-            CREATE TABLE users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                full_name VARCHAR(100),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE user_connections (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                provider ENUM('google', 'asana') NOT NULL,
-                provider_user_id VARCHAR(255),
-                access_token TEXT NOT NULL,
-                refresh_token TEXT,
-                expires_at TIMESTAMP,
-                metadata JSON,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-            """,
-            """
-            CREATE TABLE agent_chat_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                role ENUM('user', 'assistant') NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE ai_pending_actions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                provider ENUM('google', 'asana'),
-                action_type VARCHAR(50),
-                draft_payload JSON,
-                status ENUM('pending', 'approved', 'rejected', 'executed') DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                executed_at TIMESTAMP NULL
-            )
-            """
-        ]
-        
-        for sql in tables:
-            cursor.execute(sql)
+        # Create tables and indexes from models.py
+        migrate(conn)
         
         # Insert sample data
         cursor.execute("""
@@ -0,0 +1,300 @@
+"""
+retention.py - Archival of settled actions and old chat logs, expiry of stale drafts
+
+Rows move into monthly archive tables (<table>_archive_YYYYMM, keyed by the row's
+created_at) a bounded batch at a time. Each batch is one short transaction that
+copies and deletes the same ids, so no lock is held for longer than one batch and
+a run can stop at any point and resume where it left off.
+
+Run `python retention.py` for a single pass, or set RETENTION_ENABLED=true to have
+the API run it every RETENTION_INTERVAL seconds.
+"""
+
+import argparse
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from mysql.connector import Error
+
+from database import DatabaseManager, db_manager
+
+load_dotenv()
+
+# Statuses an action never leaves; only these are archived
+SETTLED_STATUSES = ('executed', 'rejected', 'expired')
+
+
+def archive_table(table: str, created_at: datetime) -> str:
+    """Monthly archive table a row belongs to"""
+    return f"{table}_archive_{created_at:%Y%m}"
+
+
+class RetentionManager:
+    """
+    Moves rows out of the hot tables in bounded batches and reports throughput
+
+    ACTION_RETENTION_DAYS    - settled actions older than this are archived (30)
+    CHAT_LOG_RETENTION_DAYS  - chat messages older than this are archived (90)
+    PENDING_EXPIRY_HOURS     - drafts still pending after this become 'expired' (72)
+    ACTION_CLAIM_LEASE       - seconds an approved action may wait or run before its claim
+                               is considered lost with its process (900)
+    RETENTION_BATCH_SIZE     - rows per transaction (500)
+    RETENTION_BATCH_PAUSE    - seconds between batches, to leave room for live traffic (0.05)
+    RETENTION_MAX_SECONDS    - time budget per task per run; the rest waits for the next run (60)
+    """
+
+    def __init__(self, db: DatabaseManager = None, batch_size: int = None, batch_pause: float = None,
+                 max_seconds: float = None, action_days: float = None, chat_days: float = None,
+                 pending_hours: float = None, claim_lease: float = None):
+        self.db = db or db_manager
+        self.batch_size = batch_size or int(os.getenv('RETENTION_BATCH_SIZE', 500))
+        self.batch_pause = batch_pause if batch_pause is not None else float(os.getenv('RETENTION_BATCH_PAUSE', 0.05))
+        self.max_seconds = max_seconds or float(os.getenv('RETENTION_MAX_SECONDS', 60))
+        self.action_days = action_days or float(os.getenv('ACTION_RETENTION_DAYS', 30))
+        self.chat_days = chat_days or float(os.getenv('CHAT_LOG_RETENTION_DAYS', 90))
+        self.pending_hours = pending_hours or float(os.getenv('PENDING_EXPIRY_HOURS', 72))
+        self.claim_lease = claim_lease or float(os.getenv('ACTION_CLAIM_LEASE', 900))
+        self._archive_columns: Dict[str, List[str]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.last_run: Dict[str, Dict] = {}
+        self.totals: Dict[str, int] = defaultdict(int)
+
+    # Tasks
+
+    def expire_stale_pending(self, now: datetime = None) -> Dict:
+        """Mark drafts nobody approved within PENDING_EXPIRY_HOURS as expired"""
+        cutoff = (now or datetime.now()) - timedelta(hours=self.pending_hours)
+        # Served by idx_status_created; the ORDER BY keeps the batch deterministic
+        query = """
+            UPDATE ai_pending_actions
+            SET status = 'expired'
+            WHERE status = 'pending' AND created_at < %s
+            ORDER BY created_at
+            LIMIT %s
+        """
+        return self._run_batches('expire_pending', lambda conn: self._update_batch(conn, query, cutoff))
+
+    def release_stale_claims(self, now: datetime = None) -> Dict:
+        """
+        Put actions stuck in 'approved' back to 'pending'
+        Approvals run on an in-memory queue; if the process dies first, the row keeps
+        its claim and can't be approved again. Rows claimed before claimed_at existed
+        count from created_at. A released action may have run before the crash, so
+        the user sees it again rather than it being retried automatically.
+        """
+        cutoff = (now or datetime.now()) - timedelta(seconds=self.claim_lease)
+        # Served by idx_status_created; approved rows are few
+        query = """
+            UPDATE ai_pending_actions
+            SET status = 'pending', claimed_at = NULL
+            WHERE status = 'approved' AND COALESCE(claimed_at, created_at) < %s
+            ORDER BY created_at
+            LIMIT %s
+        """
+        return self._run_batches('release_claims', lambda conn: self._update_batch(conn, query, cutoff))
+
+    def archive_actions(self, now: datetime = None) -> Dict:
+        """Move settled actions older than ACTION_RETENTION_DAYS into monthly archives"""
+        cutoff = (now or datetime.now()) - timedelta(days=self.action_days)
+        placeholders = ", ".join(["%s"] * len(SETTLED_STATUSES))
+        # Served by idx_status_created
+        select = f"""
+            SELECT id, created_at FROM ai_pending_actions
+            WHERE status IN ({placeholders}) AND created_at < %s
+            LIMIT %s
+        """
+        # Re-checked on the copy and delete so a row that changed since the SELECT stays put
+        recheck = (f"status IN ({placeholders})", SETTLED_STATUSES)
+        return self._run_batches('archive_actions', lambda conn: self._move_batch(
+            conn, 'ai_pending_actions', select, SETTLED_STATUSES + (cutoff,), recheck))
+
+    def archive_chat_logs(self, now: datetime = None) -> Dict:
+        """Move chat messages older than CHAT_LOG_RETENTION_DAYS into monthly archives"""
+        cutoff = (now or datetime.now()) - timedelta(days=self.chat_days)
+        # Ids grow with created_at, so the oldest rows are at the front of the primary key
+        select = """
+            SELECT id, created_at FROM agent_chat_logs
+            WHERE created_at < %s
+            ORDER BY id
+            LIMIT %s
+        """
+        return self._run_batches('archive_chat_logs', lambda conn: self._move_batch(
+            conn, 'agent_chat_logs', select, (cutoff,)))
+
+    def run_once(self, now: datetime = None) -> Dict[str, Dict]:
+        """
+        One pass of every task; expiry before archival so fresh expiries age toward it,
+        and after releasing claims so a released action waits a full interval to expire
+        """
+        now = now or datetime.now()
+        report = {}
+        for task in (self.release_stale_claims, self.expire_stale_pending, self.archive_actions,
+                     self.archive_chat_logs):
+            result = task(now)
+            report[result['task']] = result
+        return report
+
+    # Batching
+
+    def _run_batches(self, task: str, batch) -> Dict:
+        """
+        Call batch(conn) -> (rows moved, more left) until the backlog is drained,
+        the time budget runs out, or close() is called
+        """
+        started = time.perf_counter()
+        moved = batches = 0
+        error = None
+        while not self._stop.is_set() and time.perf_counter() - started < self.max_seconds:
+            try:
+                with self.db._connection() as conn:
+                    count, more = batch(conn)
+            except Error as e:
+                print(f"Error in retention task {task}: {e}")
+                error = str(e)
+                break
+            moved += count
+            batches += 1
+            if not more:
+                break
+            if self.batch_pause:
+                time.sleep(self.batch_pause)
+
+        seconds = time.perf_counter() - started
+        result = {
+            "task": task,
+            "moved": moved,
+            "batches": batches,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(moved / seconds, 1) if seconds > 0 else 0.0,
+            "error": error
+        }
+        with self._lock:
+            self.last_run[task] = result
+            self.totals[task] += moved
+        if moved:
+            print(f"🗄️  {task}: {moved} row(s) in {seconds:.2f}s ({result['rows_per_second']} rows/s)")
+        return result
+
+    def _update_batch(self, conn, query: str, cutoff: datetime) -> Tuple[int, bool]:
+        cursor = conn.cursor(buffered=True)
+        cursor.execute(query, (cutoff, self.batch_size))
+        conn.commit()
+        count = cursor.rowcount
+        cursor.close()
+        return count, count == self.batch_size
+
+    def _move_batch(self, conn, table: str, select: str, params: Tuple,
+                    recheck: Optional[Tuple[str, Sequence]] = None) -> Tuple[int, bool]:
+        """Copy one batch into its monthly archives and delete it from `table`"""
+        cursor = conn.cursor(buffered=True)
+        cursor.execute(select, tuple(params) + (self.batch_size,))
+        rows = cursor.fetchall()
+        by_month: Dict[str, List[int]] = defaultdict(list)
+        for row_id, created_at in rows:
+            by_month[archive_table(table, created_at)].append(row_id)
+        # DDL commits implicitly, so archives are created before the transaction opens
+        columns = {archive: self._ensure_archive(cursor, table, archive) for archive in by_month}
+
+        moved = 0
+        conn.start_transaction()
+        for archive, ids in by_month.items():
+            where = f"WHERE id IN ({', '.join(['%s'] * len(ids))})"
+            where_params = tuple(ids)
+            if recheck:
+                where += f" AND {recheck[0]}"
+                where_params += tuple(recheck[1])
+            column_list = ", ".join(columns[archive])
+            cursor.execute(f"INSERT INTO {archive} ({column_list}) SELECT {column_list} FROM {table} {where}",
+                           where_params)
+            cursor.execute(f"DELETE FROM {table} {where}", where_params)
+            moved += cursor.rowcount
+        conn.commit()
+        cursor.close()
+        return moved, len(rows) == self.batch_size
+
+    def _ensure_archive(self, cursor, table: str, archive: str) -> List[str]:
+        """
+        Create the archive if needed and return the columns to copy into it
+        An archive made before a migration added a column to `table` gets that
+        column added (nullable), so copies keep matching whatever the schema is now
+        """
+        if archive in self._archive_columns:
+            return self._archive_columns[archive]
+        cursor.execute("SHOW TABLES LIKE %s", (archive,))
+        if not cursor.fetchall():
+            # LIKE copies columns and indexes but not foreign keys, so archived rows outlive their users
+            cursor.execute(f"CREATE TABLE {archive} LIKE {table}")
+
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN (%s, %s)
+            ORDER BY ORDINAL_POSITION
+        """, (table, archive))
+        existing = defaultdict(dict)
+        for table_name, column, column_type in cursor.fetchall():
+            existing[table_name][column] = column_type
+        for column, column_type in existing[table].items():
+            if column not in existing[archive]:
+                print(f"🗄️  Adding {column} to {archive}")
+                cursor.execute(f"ALTER TABLE {archive} ADD COLUMN {column} {column_type} NULL")
+
+        self._archive_columns[archive] = list(existing[table])
+        return self._archive_columns[archive]
+
+    # Background loop
+
+    def start(self, interval: float = None):
+        """Run run_once() every `interval` seconds on a daemon thread"""
+        interval = interval or float(os.getenv('RETENTION_INTERVAL', 3600))
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                self.run_once()
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 10.0):
+        """Stop the background loop; an in-flight batch finishes first"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict:
+        """Last run per task and rows moved since startup"""
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "last_run": dict(self.last_run),
+                "total_moved": dict(self.totals)
+            }
+
+
+# Global instance
+retention = RetentionManager()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old rows and expire stale drafts")
+    parser.add_argument("--batch-size", type=int, help="rows per transaction")
+    args = parser.parse_args()
+
+    if args.batch_size:
+        retention.batch_size = args.batch_size
+    if db_manager.connect():
+        for task, result in retention.run_once().items():
+            print(f"  {task}: {result['moved']} moved, {result['rows_per_second']} rows/s")
+        db_manager.close()
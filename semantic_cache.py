@@ -0,0 +1,162 @@
+"""
+semantic_cache.py - Embedding-similarity cache for paraphrased requests
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+SUBJECT_RE = re.compile(r'subject\s*:\s*(.+?)(?=\s+body\s*:|$)', re.IGNORECASE | re.DOTALL)
+BODY_RE = re.compile(r'body\s*:\s*(.+)$', re.IGNORECASE | re.DOTALL)
+ABOUT_RE = re.compile(r'\b(?:about|regarding|re:)\s+(.+)$', re.IGNORECASE)
+TASK_VERB_RE = re.compile(r'^(?:please\s+)?(?:create|make|add|open)\s+(?:an?\s+|the\s+)?(?:new\s+)?',
+                          re.IGNORECASE)
+TASK_PREFIX_RE = re.compile(r'^(?:asana\s+)?task\s*(?:for|to|about|called|named|:)?\s*', re.IGNORECASE)
+TASK_SUFFIX_RE = re.compile(r'\s+(?:(?:asana\s+)?task|(?:in|on)\s+asana)$', re.IGNORECASE)
+
+
+def plan_skeleton(actions: List[Dict]) -> List[Dict]:
+    """Strip parameter values from a plan, keeping tools and parameter names"""
+    return [{
+        "tool": a.get("tool", ""),
+        "provider": a.get("provider", ""),
+        "parameters": {k: "" for k in a.get("parameters", {})}
+    } for a in actions]
+
+
+def reextract_parameters(skeleton: List[Dict], message: str) -> Optional[List[Dict]]:
+    """
+    Fill a cached skeleton from the new message without calling the LLM
+    Returns None when a required value cannot be recovered
+    """
+    message = message.strip()
+    actions = []
+    for step in skeleton:
+        params = dict(step.get("parameters", {}))
+        tool = step.get("tool")
+
+        if tool == "send_gmail":
+            recipient = EMAIL_RE.search(message)
+            if not recipient:
+                return None
+            subject = SUBJECT_RE.search(message) or ABOUT_RE.search(message)
+            body = BODY_RE.search(message)
+            params.update({
+                "to": recipient.group(0),
+                "subject": subject.group(1).strip() if subject else "",
+                "body": body.group(1).strip() if body else ""
+            })
+        elif tool == "create_asana_task":
+            name = TASK_VERB_RE.sub('', message.rstrip(' .!'), count=1)
+            name = TASK_SUFFIX_RE.sub('', TASK_PREFIX_RE.sub('', name, count=1)).strip()
+            if not name:
+                return None
+            params.update({"name": name[0].upper() + name[1:], "notes": ""})
+            params.setdefault("project_id", "")
+        else:
+            return None
+
+        actions.append({"tool": tool, "provider": step.get("provider", ""), "parameters": params})
+    return actions
+
+
+class SemanticPlanCache:
+    """
+    Nearest-neighbour plan cache over message embeddings
+    Embeddings live in one preallocated float32 matrix so a lookup is a single
+    matrix-vector product; the least recently used row is overwritten when full.
+    """
+
+    def __init__(self, max_entries: int = None, threshold: float = None):
+        self.max_entries = max_entries or int(os.getenv('SEMANTIC_CACHE_SIZE', 10000))
+        self.threshold = threshold or float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+        self._matrix: Optional[np.ndarray] = None
+        self._flags = np.zeros(self.max_entries, dtype=np.int8)
+        self._last_used = np.zeros(self.max_entries, dtype=np.int64)
+        self._skeletons: List[Optional[List[Dict]]] = [None] * self.max_entries
+        self._size = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _flag_code(tool_flags: Sequence[bool]) -> int:
+        """Pack the tool-availability tuple into a small int"""
+        code = 0
+        for i, flag in enumerate(tool_flags):
+            code |= int(bool(flag)) << i
+        return code
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, embedding: Sequence[float],
+               tool_flags: Tuple[bool, ...]) -> Optional[Tuple[List[Dict], float]]:
+        """Return (skeleton, similarity) of the closest entry above the threshold"""
+        query = self._normalize(embedding)
+        with self._lock:
+            if not self._size or self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            scores = self._matrix[:self._size] @ query
+            scores[self._flags[:self._size] != self._flag_code(tool_flags)] = -1.0
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            return [dict(step, parameters=dict(step["parameters"])) for step in self._skeletons[best]], score
+
+    def add(self, embedding: Sequence[float], tool_flags: Tuple[bool, ...], actions: List[Dict]):
+        """Store the skeleton of a single-action plan"""
+        # Parameters of multi-action plans can't be split back out without the LLM
+        if len(actions) != 1:
+            return
+
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+                self._matrix = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+                self._size = 0
+
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._clock += 1
+            self._matrix[slot] = vec
+            self._flags[slot] = self._flag_code(tool_flags)
+            self._last_used[slot] = self._clock
+            self._skeletons[slot] = plan_skeleton(actions)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and memory footprint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "matrix_bytes": int(self._matrix.nbytes) if self._matrix is not None else 0
+            }
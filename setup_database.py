@@ -7,6 +7,8 @@ from mysql.connector import Error
 import os
 from dotenv import load_dotenv
 
+from migrations import migrate
+
 load_dotenv()
 
 def setup_database():
@@ -30,61 +32,8 @@ def setup_database():
         cursor.execute("USE gaprio_agent_dev")
         print("✅ Database created/selected")
         
-        # Create tables
-        tables = [
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                full_name VARCHAR(100),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS user_connections (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                provider ENUM('google', 'asana') NOT NULL,
-                provider_user_id VARCHAR(255),
-                access_token TEXT NOT NULL,
-                refresh_token TEXT,
-                expires_at TIMESTAMP,
-                metadata JSON,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                UNIQUE KEY unique_user_provider (user_id, provider)
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS agent_chat_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                role ENUM('user', 'assistant') NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                INDEX idx_user_chat (user_id, created_at)
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS ai_pending_actions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                provider ENUM('google', 'asana'),
-                action_type VARCHAR(50),
-                draft_payload JSON,
-                status ENUM('pending', 'approved', 'rejected', 'executed') DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                executed_at TIMESTAMP NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                INDEX idx_user_status (user_id, status)
-            )
-            """
-        ]
-        
-        for i, table_sql in enumerate(tables, 1):
-            cursor.execute(table_sql)
-            print(f"✅ Table {i} created/verified")
+        # Create tables and indexes from models.py
+        migrate(conn)
         
         # Insert sample user if not exists
         cursor.execute("""
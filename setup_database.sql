@@ -1,29 +1,78 @@
 -- Setup Gaprio Agent Database
+-- Schema generated from models.py by `python migrations.py --sql`; prefer `python migrations.py`
 CREATE DATABASE IF NOT EXISTS gaprio_agent_dev;
 USE gaprio_agent_dev;
 
--- Users table
 CREATE TABLE IF NOT EXISTS users (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    email VARCHAR(255) UNIQUE NOT NULL,
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    email VARCHAR(255) NOT NULL,
     full_name VARCHAR(100),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NULL DEFAULT now(),
+    PRIMARY KEY (id),
+    UNIQUE (email)
+);
+
+CREATE TABLE IF NOT EXISTS agent_chat_logs (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    user_id INTEGER,
+    `role` ENUM('user','assistant') NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP NULL DEFAULT now(),
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS ai_pending_actions (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    user_id INTEGER,
+    provider ENUM('google','asana'),
+    action_type VARCHAR(50),
+    draft_payload JSON,
+    status ENUM('pending','approved','rejected','executed','expired') DEFAULT 'pending',
+    created_at TIMESTAMP NULL DEFAULT now(),
+    executed_at TIMESTAMP NULL,
+    claimed_at TIMESTAMP NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
 );
 
--- User connections table
 CREATE TABLE IF NOT EXISTS user_connections (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    user_id INT,
-    provider ENUM('google', 'asana') NOT NULL,
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    user_id INTEGER NOT NULL,
+    provider ENUM('google','asana') NOT NULL,
     provider_user_id VARCHAR(255),
     access_token TEXT NOT NULL,
     refresh_token TEXT,
-    expires_at TIMESTAMP,
+    expires_at TIMESTAMP NULL,
     metadata JSON,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    updated_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    CONSTRAINT unique_user_provider UNIQUE (user_id, provider),
+    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_user_chat ON agent_chat_logs (user_id, created_at);
+
+CREATE INDEX idx_status_created ON ai_pending_actions (status, created_at);
+
+CREATE INDEX idx_user_status_created ON ai_pending_actions (user_id, status, created_at, id);
+
+CREATE INDEX idx_user_updated ON user_connections (user_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+INSERT IGNORE INTO schema_migrations (version, description) VALUES (1, 'create tables from models');
+
+INSERT IGNORE INTO schema_migrations (version, description) VALUES (2, 'hot-path indexes');
+
+INSERT IGNORE INTO schema_migrations (version, description) VALUES (3, 'expired action status');
+
+INSERT IGNORE INTO schema_migrations (version, description) VALUES (4, 'approval claim timestamp');
+
 -- Insert sample data
 INSERT INTO users (email, full_name) VALUES
 ('test@example.com', 'Test User'),
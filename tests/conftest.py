@@ -0,0 +1,42 @@
+"""
+conftest.py - Shared fixtures for offline tests
+"""
+
+import pytest
+
+from agent_brain import AgentBrain
+from database import db_manager
+
+
+@pytest.fixture
+def make_brain(monkeypatch):
+    """Build an AgentBrain wired to a fake LLM and in-memory persistence"""
+    saved = []
+
+    def fake_token(user_id, provider):
+        return {"access_token": "tok", "expires_at": None}
+
+    def fake_capabilities(user_id):
+        return {"asana": {"expires_at": None, "metadata": {}}, "google": {"expires_at": None, "metadata": {}}}
+
+    def fake_create(user_id, provider, action_type, draft_payload):
+        saved.append((user_id, action_type))
+        return len(saved)
+
+    def fake_create_many(user_id, rows):
+        return [fake_create(user_id, **row) for row in rows]
+
+    monkeypatch.setattr(db_manager, "connect", lambda: True)
+    monkeypatch.setattr(db_manager, "get_user_token", fake_token)
+    monkeypatch.setattr(db_manager, "get_user_capabilities", fake_capabilities)
+    monkeypatch.setattr(db_manager, "create_pending_action", fake_create)
+    monkeypatch.setattr(db_manager, "create_pending_actions", fake_create_many)
+
+    def factory(llm, **kwargs):
+        brain = AgentBrain(model="fake", **kwargs)
+        brain.llm = llm
+        # Background metadata refreshes must not reach the real Asana
+        brain.asana_metadata.fetch = lambda user_id: None
+        return brain, saved
+
+    return factory
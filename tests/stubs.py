@@ -0,0 +1,198 @@
+"""
+stubs.py - Local stub HTTP servers imitating the external APIs
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive or cancelled streams is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Runs a handler class on a random localhost port in a background thread"""
+
+    def __init__(self, handler_class, **state):
+        self.httpd = _QuietServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.state = dict(state, requests=0)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def state(self) -> dict:
+        return self.httpd.state
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    """
+    Minimal /api/generate: streams `response` in small NDJSON chunks
+
+    State: response (str), first_token_delay (s), fail (bool)
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        state["requests"] += 1
+        state.setdefault("bodies", []).append(body)
+
+        if state.get("fail"):
+            payload = json.dumps({"error": "stub failure"}).encode()
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        time.sleep(state.get("first_token_delay", 0))
+        text = state.get("response", "[]")
+        chunks = [text[i:i + 8] for i in range(0, len(text), 8)] or [""]
+
+        if not body.get("stream", True):
+            payload = json.dumps({"model": body.get("model"), "response": text, "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                self._write_chunk({"model": body.get("model"), "response": chunk, "done": False})
+                time.sleep(state.get("token_delay", 0))
+            self._write_chunk({"model": body.get("model"), "response": "", "done": True})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class ProviderHandler(BaseHTTPRequestHandler):
+    """
+    Keep-alive JSON API standing in for Asana and Gmail
+
+    Answers every request with {"data": {...}} echoing the method and path, and
+    records each request and the client port it arrived on (one per connection).
+    GETs of a path in `collections` are paged like Asana: limit (max 100),
+    offset tokens in next_page, and opt_fields trimming each item to gid plus
+    those fields. POST /batch answers each action like Asana's batch API.
+    State: delay (s), status (int), set_cookie (str), collections ({path: [items]}),
+    fail_offset (str: answer 500 for that page), reject_names (batched tasks answered 400)
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, keep-alive
+    # responses stall on Nagle + delayed ACK for ~40 ms each
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        state["requests"] += 1
+        state.setdefault("calls", []).append({
+            "method": self.command, "path": self.path, "body": body,
+            "authorization": self.headers.get("Authorization"), "cookie": self.headers.get("Cookie")
+        })
+        state.setdefault("connections", set()).add(self.client_address[1])
+        time.sleep(state.get("delay", 0))
+
+        url = urlsplit(self.path)
+        if self.command == "GET" and url.path in state.get("collections", {}):
+            return self._page(state["collections"][url.path], parse_qs(url.query))
+        if self.command == "POST" and url.path.endswith("/batch") and state.get("status", 200) == 200:
+            return self._batch(body["data"]["actions"])
+
+        payload = json.dumps({"data": {"gid": str(state["requests"]), "id": str(state["requests"]),
+                                       "method": self.command, "path": self.path}}).encode()
+        self.send_response(state.get("status", 200))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if state.get("set_cookie"):
+            self.send_header("Set-Cookie", state["set_cookie"])
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _page(self, items, query):
+        limit = int(query.get("limit", ["20"])[0])
+        offset = query.get("offset", ["0"])[0]
+        status = 400 if not 1 <= limit <= 100 else 200
+        if offset == self.server.state.get("fail_offset"):
+            status = 500
+        start = int(offset)
+        fields = query["opt_fields"][0].split(",") if "opt_fields" in query else None
+        page = [item if fields is None else {"gid": item["gid"], **{f: item.get(f) for f in fields}}
+                for item in items[start:start + limit]]
+        more = start + limit < len(items)
+        body = {"data": page,
+                "next_page": {"offset": str(start + limit), "path": f"?offset={start + limit}"} if more else None}
+        if status != 200:
+            body = {"errors": [{"message": f"stub status {status}"}]}
+        self._send_json(status, body)
+
+    def _batch(self, actions):
+        state = self.server.state
+        if len(actions) > 10:
+            return self._send_json(400, {"errors": [{"message": "too many actions"}]})
+        entries = []
+        for action in actions:
+            name = action["data"].get("name")
+            if name in state.get("reject_names", ()):
+                entries.append({"status_code": 400, "headers": {},
+                                "body": {"errors": [{"message": f"rejected {name}"}]}})
+            else:
+                state["tasks"] = state.get("tasks", 0) + 1
+                entries.append({"status_code": 201, "headers": {},
+                                "body": {"data": {"gid": str(state["tasks"]), "name": name}}})
+        self._send_json(200, {"data": entries})
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _reply
+    do_POST = _reply
@@ -0,0 +1,91 @@
+"""
+test_action_executor.py - Per-provider worker pools for approved actions
+"""
+
+import threading
+import time
+
+import pytest
+
+from action_executor import ActionExecutor, QueueFull
+
+
+def action(action_id, provider="asana"):
+    return {"id": action_id, "provider": provider, "draft_payload": {}}
+
+
+def test_each_provider_has_its_own_concurrency_limit():
+    running = {"asana": 0, "google": 0}
+    peak = {"asana": 0, "google": 0}
+    lock = threading.Lock()
+
+    def execute(act, token):
+        with lock:
+            running[act["provider"]] += 1
+            peak[act["provider"]] = max(peak[act["provider"]], running[act["provider"]])
+        time.sleep(0.02)
+        with lock:
+            running[act["provider"]] -= 1
+        return {"data": act["id"]}
+
+    executor = ActionExecutor(execute, workers={"asana": 2, "google": 3})
+    futures = [executor.submit(action(i, ("asana", "google")[i % 2]), {}) for i in range(24)]
+    assert all(f.result(5)["status"] == "executed" for f in futures)
+    assert peak == {"asana": 2, "google": 3}
+
+    stats = executor.stats()["providers"]
+    assert stats["asana"]["workers"] == 2 and stats["asana"]["executed"] == 12
+    assert stats["google"]["queued"] == 0 and stats["google"]["latency"]["count"] == 12
+    executor.close()
+
+
+def test_submit_returns_before_execution_and_records_status():
+    release = threading.Event()
+    recorded = []
+
+    def execute(act, token):
+        release.wait(5)
+        if act["id"] == 2:
+            raise RuntimeError("provider down")
+        return {"data": "ok"} if act["id"] == 1 else {"error": "bad request"}
+
+    executor = ActionExecutor(execute, lambda i, status: recorded.append((i, status)), workers={"asana": 3})
+    futures = {i: executor.submit(action(i), {}) for i in (1, 2, 3)}
+    assert not any(f.done() for f in futures.values())
+    assert executor.status(1)["state"] in ("queued", "running")
+
+    release.set()
+    assert futures[1].result(5) == {"success": True, "status": "executed", "result": {"data": "ok"}}
+    assert futures[2].result(5)["result"] == {"error": "provider down"}
+    assert futures[3].result(5)["status"] == "rejected"
+    assert sorted(recorded) == [(1, "executed"), (2, "rejected"), (3, "rejected")]
+    assert executor.status(1) == {"action_id": 1, "state": "done", "success": True, "status": "executed",
+                                  "result": {"data": "ok"}}
+    assert executor.status(99) is None
+    executor.close()
+
+
+def test_full_queue_rejects_until_a_slot_frees():
+    release = threading.Event()
+    executor = ActionExecutor(lambda act, token: release.wait(5) and {"data": 1},
+                              workers={"asana": 1}, max_queue=2)
+    first, second = executor.submit(action(1), {}), executor.submit(action(2), {})
+    with pytest.raises(QueueFull):
+        executor.submit(action(3), {})
+
+    release.set()
+    first.result(5), second.result(5)
+    assert executor.submit(action(3), {}).result(5)["success"]
+
+    executor.close()
+    with pytest.raises(QueueFull):
+        executor.submit(action(4), {})
+
+
+def test_only_recent_results_are_kept():
+    executor = ActionExecutor(lambda act, token: {"data": 1}, workers={"asana": 1}, results_kept=3)
+    for i in range(1, 7):
+        executor.submit(action(i), {}).result(5)
+    assert executor.future(1) is None and executor.status(2) is None
+    assert executor.status(6)["state"] == "done"
+    executor.close()
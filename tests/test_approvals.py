@@ -0,0 +1,174 @@
+"""
+test_approvals.py - Single and bulk approval against an in-memory action table
+"""
+
+import pytest
+
+import agent_brain as agent_brain_module
+from database import db_manager
+
+
+@pytest.fixture
+def store(monkeypatch, make_brain):
+    rows = {
+        1: {"id": 1, "user_id": 5, "provider": "google", "action_type": "send_email", "status": "pending",
+            "draft_payload": {"tool": "send_gmail", "parameters": {"to": "a@x.io"}}},
+        2: {"id": 2, "user_id": 5, "provider": "google", "action_type": "send_email", "status": "pending",
+            "draft_payload": {"tool": "send_gmail", "parameters": {"to": "b@x.io"}}},
+        3: {"id": 3, "user_id": 5, "provider": "google", "action_type": "send_email", "status": "executed",
+            "draft_payload": {"tool": "send_gmail", "parameters": {"to": "c@x.io"}}},
+        4: {"id": 4, "user_id": 6, "provider": "google", "action_type": "send_email", "status": "pending",
+            "draft_payload": {"tool": "send_gmail", "parameters": {"to": "d@x.io"}}},
+    }
+    calls = {"claims": 0, "status_updates": 0, "token_lookups": 0}
+
+    def claim(ids, user_id):
+        calls["claims"] += 1
+        claimed = [dict(rows[i]) for i in ids
+                   if i in rows and rows[i]["user_id"] == user_id and rows[i]["status"] == "pending"]
+        for action in claimed:
+            rows[action["id"]]["status"] = "approved"
+        return claimed
+
+    def update_many(statuses):
+        calls["status_updates"] += 1
+        for action_id, status in statuses.items():
+            rows[action_id]["status"] = status
+        return True
+
+    def update_one(action_id, status, executed_data=None):
+        rows[action_id]["status"] = status
+        return True
+
+    def token(user_id, provider):
+        calls["token_lookups"] += 1
+        return {"access_token": "tok"}
+
+    def send(access_token, parameters):
+        calls.setdefault("sent", []).append(parameters["to"])
+        return {"id": "msg"}
+
+    monkeypatch.setattr(db_manager, "get_action_by_id", lambda i: dict(rows[i]) if i in rows else None)
+    monkeypatch.setattr(db_manager, "get_pending_actions",
+                        lambda *a, **k: pytest.fail("approval must not scan pending actions"))
+    monkeypatch.setattr(db_manager, "claim_pending_actions", claim)
+    monkeypatch.setattr(db_manager, "update_actions_status", update_many)
+    monkeypatch.setattr(db_manager, "update_action_status", update_one)
+    monkeypatch.setattr(agent_brain_module, "send_gmail", send)
+    brain, _ = make_brain(llm=None)
+    monkeypatch.setattr(db_manager, "get_user_token", token)
+    return brain, rows, calls
+
+
+def test_single_approval_uses_point_lookup(store):
+    brain, rows, calls = store
+    assert brain.approve_action(1, 5)["status"] == "executed"
+    assert rows[1]["status"] == "executed"
+    assert brain.approve_action(1, 5) == {"success": False, "error": "Action already executed"}
+    assert brain.approve_action(99, 5)["error"] == "Action not found"
+    assert calls["sent"] == ["a@x.io"]
+
+
+def test_bulk_approval_claims_once_and_updates_once(store):
+    brain, rows, calls = store
+    results = brain.approve_actions([1, 2, 3, 2], 5)
+
+    assert results[1]["status"] == "executed" and results[2]["status"] == "executed"
+    assert not results[3]["success"]
+    # Both run on the Gmail worker pool, so they may be sent in either order
+    assert sorted(calls.pop("sent")) == ["a@x.io", "b@x.io"]
+    assert calls == {"claims": 1, "status_updates": 1, "token_lookups": 1}
+
+    # A second approval of the same ids finds nothing pending and runs nothing
+    again = brain.approve_actions([1, 2], 5)
+    assert not any(r["success"] for r in again.values())
+    assert calls["claims"] == 2 and "sent" not in calls
+
+
+def test_bulk_approval_endpoint(store, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    brain, rows, calls = store
+    monkeypatch.setattr(main, "agent_brain", brain)
+    response = TestClient(main.app).post("/approve-actions", json={"user_id": 5, "action_ids": [1, 3]})
+    body = response.json()
+    assert body["status"] == "partial" and body["executed"] == 1
+    assert body["results"]["1"]["status"] == "executed"
+
+
+def test_accepted_approval_is_polled_for_its_result(store, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    brain, rows, calls = store
+    monkeypatch.setattr(main, "agent_brain", brain)
+    client = TestClient(main.app)
+    body = client.post("/approve-action", json={"user_id": 5, "action_id": 1, "wait": False}).json()
+    assert body == {"status": "accepted", "message": "Action queued for execution", "action_id": 1}
+
+    result = client.get("/actions/1/result", params={"user_id": 5, "timeout": 5}).json()
+    assert result["status"] == "executed" and result["success"]
+    assert rows[1]["status"] == "executed"
+    # Settled actions the executor doesn't track are answered from the table
+    assert client.get("/actions/3/result", params={"user_id": 5}).json() == \
+        {"action_id": 3, "success": True, "status": "executed"}
+    assert client.get("/actions/99/result", params={"user_id": 5}).status_code == 404
+    # Another user can't see it, queued or settled
+    assert client.get("/actions/1/result", params={"user_id": 6}).status_code == 404
+    assert client.get("/actions/3/result", params={"user_id": 6}).status_code == 404
+
+
+def test_no_token_returns_action_to_pending(store, monkeypatch):
+    brain, rows, calls = store
+    monkeypatch.setattr(db_manager, "get_user_token", lambda *a: None)
+    assert brain.submit_action(1, 5) == {"success": False, "error": "No google token found"}
+    assert rows[1]["status"] == "pending"
+
+
+def test_users_cannot_approve_each_others_actions(store, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    brain, rows, calls = store
+    assert brain.approve_action(4, 5) == {"success": False, "error": "Action not found"}
+    assert brain.approve_actions([1], 6) == {1: {"success": False, "error": "Action not found or not pending"}}
+    assert rows[1]["status"] == "pending" and rows[4]["status"] == "pending"
+
+    monkeypatch.setattr(main, "agent_brain", brain)
+    client = TestClient(main.app)
+    body = client.post("/approve-action", json={"user_id": 5, "action_id": 4}).json()
+    assert body == {"status": "error", "message": "Action not found"}
+    body = client.post("/approve-actions", json={"user_id": 5, "action_ids": [1, 4]}).json()
+    assert body["executed"] == 1 and not body["results"]["4"]["success"]
+    assert rows[4]["status"] == "pending" and calls["sent"] == ["a@x.io"]
+
+
+def test_bulk_approval_stops_waiting_at_the_deadline(store, monkeypatch):
+    import threading
+    import time
+
+    brain, rows, calls = store
+    release = threading.Event()
+
+    def slow_send(access_token, parameters):
+        if parameters["to"] == "b@x.io":
+            release.wait(5)
+        return {"id": "msg"}
+
+    monkeypatch.setattr(agent_brain_module, "send_gmail", slow_send)
+    results = brain.approve_actions([1, 2], 5, timeout=0.2)
+
+    assert results[1]["status"] == "executed" and rows[1]["status"] == "executed"
+    # The slow one is reported as still in progress and left claimed for now
+    assert not results[2]["success"] and results[2]["state"] in ("queued", "running")
+    assert rows[2]["status"] == "approved"
+
+    # It records its own status once it finishes
+    release.set()
+    assert brain.wait_for_action(2, 5, timeout=5)["status"] == "executed"
+    for _ in range(50):
+        if rows[2]["status"] == "executed":
+            break
+        time.sleep(0.01)
+    assert rows[2]["status"] == "executed"
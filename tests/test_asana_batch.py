@@ -0,0 +1,114 @@
+"""
+test_asana_batch.py - Multi-task approvals through Asana's /batch endpoint
+"""
+
+import pytest
+
+import agent_brain as agent_brain_module
+import tools.asana_tool as asana_tool
+from action_executor import ActionExecutor, QueueFull
+from database import db_manager
+from tests.stubs import ProviderHandler, StubServer
+from tools.asana_tool import AsanaAPI
+
+
+@pytest.fixture
+def asana(monkeypatch):
+    with StubServer(ProviderHandler) as server:
+        monkeypatch.setattr(asana_tool, "ASANA_API_URL", server.url)
+        yield server
+
+
+def batch_calls(server):
+    return [c for c in server.state.get("calls", []) if c["path"] == "/batch"]
+
+
+def test_tasks_are_sent_ten_per_batch_in_order(asana):
+    asana.state["reject_names"] = {"task 12"}
+    results = AsanaAPI("tok").create_tasks([{"name": f"task {i}", "notes": "", "project_id": "77"}
+                                            for i in range(23)])
+
+    assert [len(c["body"]["data"]["actions"]) for c in batch_calls(asana)] == [10, 10, 3]
+    first = batch_calls(asana)[0]["body"]["data"]["actions"][0]
+    assert first == {"method": "post", "relative_path": "/tasks",
+                     "data": {"name": "task 0", "notes": "", "projects": ["77"]}}
+    assert [r["data"]["name"] for i, r in enumerate(results) if i != 12] == \
+        [f"task {i}" for i in range(23) if i != 12]
+    assert results[12]["error"] == "API Error: 400" and "rejected task 12" in results[12]["details"]
+
+
+def test_failed_batch_request_fails_only_its_tasks(asana, monkeypatch):
+    monkeypatch.setattr(asana_tool, "ASANA_BATCH_SIZE", 2)
+    asana.state["status"] = 503
+    results = AsanaAPI("tok").create_tasks([{"name": "a"}, {"name": "b"}, {"name": "c"}])
+    assert [r["error"] for r in results] == ["API Error: 503"] * 3
+
+    # A single task still goes straight to POST /tasks
+    asana.state["status"] = 200
+    assert "data" in AsanaAPI("tok").create_tasks([{"name": "solo"}])[0]
+    assert asana.state["calls"][-1]["path"] == "/tasks"
+
+
+def test_grouped_actions_run_as_one_call_with_one_result_each():
+    calls = []
+
+    def execute_many(actions, token):
+        calls.append([a["id"] for a in actions])
+        return [{"data": a["id"]} if a["id"] != 2 else {"error": "bad"} for a in actions]
+
+    recorded = []
+    executor = ActionExecutor(lambda a, t: {"data": a["id"]}, lambda i, s: recorded.append((i, s)),
+                              workers={"asana": 1}, max_queue=4, execute_many=execute_many)
+    actions = [{"id": i, "provider": "asana"} for i in (1, 2, 3)]
+    futures = executor.submit_many(actions, {})
+    assert [f.result(5)["status"] for f in futures] == ["executed", "rejected", "executed"]
+    assert calls == [[1, 2, 3]] and sorted(recorded) == [(1, "executed"), (2, "rejected"), (3, "executed")]
+
+    # A group that doesn't fit is refused whole
+    with pytest.raises(QueueFull):
+        executor.submit_many([{"id": i, "provider": "asana"} for i in range(10, 15)], {})
+    assert executor.submit_many(actions[:1], {})[0].result(5)["success"]
+    executor.close()
+
+
+def test_ten_task_approval_is_one_round_trip(asana, monkeypatch, make_brain):
+    rows = {i: {"id": i, "user_id": 5, "provider": "asana", "action_type": "create_task", "status": "pending",
+                "draft_payload": {"tool": "create_asana_task", "provider": "asana",
+                                  "parameters": {"name": f"task {i}", "notes": "", "project_id": ""}}}
+            for i in range(1, 11)}
+    rows[11] = {"id": 11, "user_id": 5, "provider": "google", "action_type": "send_email", "status": "pending",
+                "draft_payload": {"tool": "send_gmail", "parameters": {"to": "a@x.io"}}}
+    asana.state["reject_names"] = {"task 4"}
+    updates = []
+
+    def claim(ids, user_id):
+        claimed = [dict(rows[i]) for i in ids if rows[i]["status"] == "pending"]
+        for action in claimed:
+            rows[action["id"]]["status"] = "approved"
+        return claimed
+
+    monkeypatch.setattr(db_manager, "claim_pending_actions", claim)
+    monkeypatch.setattr(db_manager, "update_actions_status", lambda statuses: updates.append(statuses) or True)
+    monkeypatch.setattr(agent_brain_module, "send_gmail", lambda token, params: {"id": "msg"})
+    brain, _ = make_brain(llm=None)
+
+    results = brain.approve_actions(list(rows), 5)
+
+    assert len(asana.state["calls"]) == 1 and asana.state["calls"][0]["path"] == "/batch"
+    assert results[4]["status"] == "rejected" and results[11]["status"] == "executed"
+    assert all(results[i]["status"] == "executed" for i in rows if i != 4)
+    assert results[1]["result"]["data"]["name"] == "task 1"
+    assert updates == [{i: ("rejected" if i == 4 else "executed") for i in rows}]
+
+
+def test_large_approvals_are_split_into_batch_sized_groups(asana, monkeypatch, make_brain):
+    claimed = [{"id": i, "user_id": 5, "provider": "asana", "status": "approved",
+                "draft_payload": {"tool": "create_asana_task", "parameters": {"name": f"t{i}"}}}
+               for i in range(25)]
+    monkeypatch.setattr(db_manager, "claim_pending_actions", lambda ids, user_id: claimed)
+    monkeypatch.setattr(db_manager, "update_actions_status", lambda statuses: True)
+    brain, _ = make_brain(llm=None)
+
+    results = brain.approve_actions([a["id"] for a in claimed], 5)
+    assert all(r["status"] == "executed" for r in results.values())
+    assert sorted(len(c["body"]["data"]["actions"]) for c in batch_calls(asana)) == [5, 10, 10]
@@ -0,0 +1,177 @@
+"""
+test_asana_metadata.py - Asana project cache: stale-while-revalidate, persistence, planner use
+"""
+
+import threading
+import time
+
+from asana_metadata import AsanaMetadata, AsanaMetadataCache
+
+METADATA = {
+    "workspaces": [{"id": "100", "name": "Acme"}],
+    "projects": [{"id": "201", "name": "Marketing", "workspace": "100"},
+                 {"id": "202", "name": "Q3 Launch", "workspace": "100"}]
+}
+
+
+class Fetcher:
+    def __init__(self, result=METADATA):
+        self.result = result
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, user_id):
+        self.calls.append(user_id)
+        self.release.wait(5)
+        return self.result
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_cold_miss_loads_in_background():
+    fetch = Fetcher()
+    fetch.release.clear()
+    cache = AsanaMetadataCache(fetch, ttl_seconds=60)
+
+    # The caller is never held up by Asana, and one refresh serves every caller
+    assert cache.get(1) is None and cache.get(1) is None
+    fetch.release.set()
+    wait_for(lambda: cache.stats()["refreshes"] == 1)
+    assert fetch.calls == [1]
+
+    metadata = cache.get(1)
+    assert metadata.project_id("marketing ") == "201"
+    assert metadata.project_id("Unknown") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    cache.close()
+
+
+def test_stale_entry_is_served_while_it_refreshes():
+    fetch = Fetcher()
+    cache = AsanaMetadataCache(fetch, ttl_seconds=60, stale_ttl_seconds=3600)
+    old = cache.refresh(1)
+    old.fetched_at -= 120
+
+    fetch.result = {**METADATA, "projects": METADATA["projects"] + [{"id": "203", "name": "Hiring"}]}
+    assert cache.get(1) is old
+    wait_for(lambda: cache.stats()["refreshes"] == 2)
+    assert cache.get(1).project_id("hiring") == "203"
+
+    # Past the stale limit the old copy is not served at all
+    cache.get(1).fetched_at -= 7200
+    assert cache.get(1) is None
+    cache.close()
+
+
+def test_failed_refresh_keeps_the_previous_entry():
+    fetch = Fetcher()
+    cache = AsanaMetadataCache(fetch, ttl_seconds=60)
+    cache.refresh(1)
+    fetch.result = {"workspaces": [], "projects": []}
+    assert cache.refresh(1) is None
+    assert cache.get(1).project_id("Q3 Launch") == "202"
+    assert cache.stats()["refresh_errors"] == 1
+    cache.close()
+
+
+def test_persisted_copy_seeds_the_cache_without_calling_asana():
+    written = {}
+    fetch = Fetcher()
+    cache = AsanaMetadataCache(fetch, persist=lambda user_id, doc: written.setdefault(user_id, doc) and True)
+    cache.refresh(7)
+    assert written[7]["projects"] == [["201", "Marketing", "100"], ["202", "Q3 Launch", "100"]]
+
+    restarted = AsanaMetadataCache(fetch)
+    assert restarted.get(7, written[7]).project_id("Marketing") == "201"
+    assert fetch.calls == [7]
+    assert AsanaMetadata.from_document({"unrelated": True}) is None
+    cache.close(), restarted.close()
+
+
+def test_planner_lists_projects_and_maps_names_to_ids(make_brain):
+    brain, _ = make_brain(llm=None)
+    asana = AsanaMetadata(METADATA["workspaces"], METADATA["projects"])
+
+    prompt = brain._build_planning_prompt("Add a task to q3 launch", {"asana": {}}, asana)
+    suffix = prompt.split("USER REQUEST")[0]
+    assert suffix.index("- Q3 Launch") < suffix.index("- Marketing")
+    assert "201" not in prompt
+
+    plan = [{"tool": "create_asana_task", "provider": "asana",
+             "parameters": {"name": "Brief", "notes": "", "project_id": "q3 launch"}},
+            {"tool": "create_asana_task", "provider": "asana",
+             "parameters": {"name": "Other", "notes": "", "project_id": "Nope"}}]
+    resolved = brain._resolve_asana_projects(plan, asana)
+    # Asana rejects a project that isn't a gid, so an unknown name is dropped
+    assert [a["parameters"]["project_id"] for a in resolved] == ["202", ""]
+    # The plan itself (what the plan cache keeps) still has the name
+    assert plan[0]["parameters"]["project_id"] == "q3 launch"
+
+
+def test_planning_uses_cached_projects_without_calling_asana(make_brain, monkeypatch):
+    from database import db_manager
+
+    class FakeLLM:
+        def invoke(self, prompt, **kwargs):
+            assert "- Marketing" in prompt
+            return ('[{"tool": "create_asana_task", "provider": "asana", '
+                    '"parameters": {"name": "Launch post", "notes": "", "project_id": "Marketing"}}]')
+
+    brain, _ = make_brain(llm=FakeLLM())
+    brain.intent_router = None
+    stored = AsanaMetadata(METADATA["workspaces"], METADATA["projects"]).to_document()
+    monkeypatch.setattr(db_manager, "get_user_capabilities",
+                        lambda user_id: {"asana": {"expires_at": None, "metadata": stored}})
+    fetched = []
+    brain.asana_metadata.fetch = fetched.append
+
+    actions = brain.get_agent_plan(3, "Write the launch post in Marketing", use_cache=False)
+    assert actions[0]["parameters"]["project_id"] == "201"
+    assert fetched == [] and brain.asana_metadata.stats()["hits"] == 1
+
+
+def test_project_names_are_blanked_while_metadata_is_loading(make_brain, monkeypatch):
+    import agent_brain as agent_brain_module
+    from database import db_manager
+
+    class FakeLLM:
+        def invoke(self, prompt, **kwargs):
+            assert "- Marketing" not in prompt
+            return ('[{"tool": "create_asana_task", "provider": "asana", '
+                    '"parameters": {"name": "Launch post", "notes": "", "project_id": "Marketing"}}]')
+
+    brain, _ = make_brain(llm=FakeLLM())
+    brain.intent_router = None
+    monkeypatch.setattr(db_manager, "get_user_capabilities", lambda user_id: {"asana": {"expires_at": None}})
+    saved = []
+    monkeypatch.setattr(brain, "_save_pending_actions", lambda user_id, actions: saved.extend(actions))
+
+    # First request: the cache is cold, so "Marketing" can't be resolved yet
+    actions = brain.get_agent_plan(3, "Write the launch post in Marketing", use_cache=False)
+    assert actions[0]["parameters"]["project_id"] == ""
+    assert saved[0]["parameters"]["project_id"] == ""
+    assert brain.asana_metadata.stats()["misses"] == 1
+
+    # A row saved with a name before this was fixed is blanked at execution too
+    sent = []
+
+    class FakeAsana:
+        def __init__(self, token):
+            pass
+
+        def create_task(self, parameters):
+            sent.append(parameters)
+            return {"data": {"gid": "1"}}
+
+    monkeypatch.setattr(agent_brain_module, "AsanaAPI", FakeAsana)
+    action = {"id": 1, "user_id": 3, "provider": "asana",
+              "draft_payload": {"tool": "create_asana_task",
+                                "parameters": {"name": "Launch post", "project_id": "Marketing"}}}
+    brain._execute_action(action, {"access_token": "tok"})
+    assert sent == [{"name": "Launch post", "project_id": ""}]
@@ -0,0 +1,62 @@
+"""
+test_asana_pagination.py - Iterating paged Asana collections against a local stub
+"""
+
+import pytest
+
+import tools.asana_tool as asana_tool
+from tests.stubs import ProviderHandler, StubServer
+from tools.asana_tool import AsanaAPI, AsanaAPIError
+
+PROJECTS = [{"gid": str(1000 + i), "name": f"Project {i}", "notes": "x" * 50, "color": "blue"}
+            for i in range(1050)]
+
+
+@pytest.fixture
+def asana():
+    with StubServer(ProviderHandler, collections={"/projects": PROJECTS, "/users": PROJECTS[:30]}) as server:
+        yield server
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iterator_follows_every_page(asana, prefetch):
+    api = AsanaAPI("tok", base_url=asana.url)
+    projects = list(api.iter_projects("ws", prefetch=prefetch))
+
+    assert [p["gid"] for p in projects] == [p["gid"] for p in PROJECTS]
+    # opt_fields trims the payload to gid + name
+    assert projects[0] == {"gid": "1000", "name": "Project 0"}
+    paths = [c["path"] for c in asana.state["calls"]]
+    assert len(paths) == 11
+    assert all("limit=100" in p and "opt_fields=name" in p and "workspace=ws" in p for p in paths)
+
+
+def test_fetch_projects_is_no_longer_truncated(asana):
+    projects = AsanaAPI("tok", base_url=asana.url).fetch_projects("ws")
+    assert len(projects) == 1050 and projects[-1] == {"id": "2049", "name": "Project 1049"}
+
+
+def test_stopping_early_fetches_at_most_one_page_ahead(asana):
+    api = AsanaAPI("tok", base_url=asana.url)
+    for i, _ in enumerate(api.iter_projects(page_size=50)):
+        if i == 60:
+            break
+    assert asana.state["requests"] <= 3
+
+
+def test_failed_page_raises_instead_of_truncating(asana):
+    asana.state["fail_offset"] = "500"
+    api = AsanaAPI("tok", base_url=asana.url)
+    seen = []
+    with pytest.raises(AsanaAPIError):
+        for project in api.iter_projects("ws"):
+            seen.append(project)
+    assert len(seen) == 500
+    assert api.fetch_projects("ws") == []
+
+
+def test_users_and_small_pages(asana, monkeypatch):
+    monkeypatch.setattr(asana_tool, "ASANA_PAGE_SIZE", 7)
+    users = list(AsanaAPI("tok", base_url=asana.url).iter_users("ws", opt_fields=("name", "color")))
+    assert len(users) == 30 and users[0] == {"gid": "1000", "name": "Project 0", "color": "blue"}
+    assert asana.state["requests"] == 5
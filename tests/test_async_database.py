@@ -0,0 +1,248 @@
+"""
+test_async_database.py - Async data layer: thread fallback and queries on a fake aiomysql pool
+"""
+
+import asyncio
+import json
+import threading
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+import async_database
+from async_database import AsyncDatabaseManager
+from database import USER_TOKENS_QUERY, DatabaseManager, decode_cursor
+
+
+def test_without_async_pool_calls_run_on_db_threads(monkeypatch):
+    manager = DatabaseManager()
+    threads = []
+
+    def fake_pending(user_id=None, status='pending'):
+        threads.append(threading.current_thread().name)
+        return [{"id": 1, "user_id": user_id, "status": status}]
+
+    monkeypatch.setattr(manager, "get_pending_actions", fake_pending)
+    adb = AsyncDatabaseManager(manager)
+
+    actions = asyncio.run(adb.get_pending_actions(7))
+    assert actions == [{"id": 1, "user_id": 7, "status": "pending"}]
+    assert threads[0].startswith("db")
+    assert adb.stats()["driver"] is None
+
+
+def test_pending_actions_endpoint_awaits_async_layer(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    async def fake_page(user_id, limit, cursor, fields):
+        return {"actions": [{"id": 3, "user_id": user_id}], "next_cursor": None}
+
+    monkeypatch.setattr(main.agent_brain, "aget_pending_actions_page", fake_page)
+    response = TestClient(main.app).get("/pending-actions/5")
+    assert response.json() == {"status": "success", "count": 1, "actions": [{"id": 3, "user_id": 5}],
+                               "next_cursor": None}
+
+
+class FakeAsyncCursor:
+    def __init__(self, pool, dictionary):
+        self.pool = pool
+        self.dictionary = dictionary
+        self.lastrowid = None
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=()):
+        query = " ".join(query.split())
+        self.pool.queries.append((query, params))
+        self.rows = self.pool.respond(query, params, self.dictionary)
+        self.lastrowid = self.pool.next_id
+        await asyncio.sleep(0)
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return list(self.rows)
+
+
+class FakeAsyncConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, cursor_class=None):
+        return FakeAsyncCursor(self.pool, cursor_class is not None)
+
+    async def begin(self):
+        pass
+
+    async def commit(self):
+        self.pool.commits += 1
+
+    async def rollback(self):
+        self.pool.rollbacks += 1
+
+
+class FakeAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        self.pool.freesize -= 1
+        return FakeAsyncConnection(self.pool)
+
+    async def __aexit__(self, *exc):
+        self.pool.freesize += 1
+        return False
+
+
+class FakeAsyncPool:
+    """Stands in for an aiomysql pool; `respond(query, params, dictionary)` returns the rows"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.queries = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.next_id = None
+        self.size = self.maxsize = self.freesize = 4
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+
+@pytest.fixture
+def async_pool(monkeypatch):
+    """An AsyncDatabaseManager on a fake pool; set pool.respond to script the rows"""
+    monkeypatch.setattr(async_database, "aiomysql", types.SimpleNamespace(DictCursor=object))
+    adb = AsyncDatabaseManager(DatabaseManager())
+    adb.pool = FakeAsyncPool(lambda query, params, dictionary: [])
+    return adb, adb.pool
+
+
+def test_user_tokens_load_once_for_concurrent_lookups(async_pool):
+    adb, pool = async_pool
+    expired = datetime.now() - timedelta(hours=1)
+    pool.respond = lambda query, params, dictionary: [
+        {"provider": "asana", "access_token": "new", "refresh_token": None, "expires_at": None,
+         "metadata": '{"workspace": "100"}'},
+        {"provider": "asana", "access_token": "old", "refresh_token": None, "expires_at": None, "metadata": None},
+        {"provider": "google", "access_token": "g", "refresh_token": "r", "expires_at": expired, "metadata": None},
+    ]
+
+    async def run():
+        return await asyncio.gather(adb.get_user_token(7, "asana"), adb.get_user_token(7, "google"),
+                                    adb.get_user_capabilities(7))
+
+    asana, google, capabilities = asyncio.run(run())
+    # The newest row wins and an expired token counts as absent
+    assert asana["access_token"] == "new" and google is None
+    assert capabilities == {"asana": {"expires_at": None, "metadata": {"workspace": "100"}}}
+    assert pool.queries == [(" ".join(USER_TOKENS_QUERY.split()), (7,))]
+
+    # Later lookups are served from the token cache shared with the sync manager
+    assert asyncio.run(adb.get_user_token(7, "asana"))["access_token"] == "new"
+    assert adb.fallback.get_user_token(7, "asana")["access_token"] == "new"
+    assert len(pool.queries) == 1 and pool.freesize == pool.maxsize
+
+
+def inserted_rows(user_id, actions, step=2, foreign_at=None):
+    """Scripted replies for create_pending_actions; `foreign_at` puts another user's row in the read-back"""
+    def respond(query, params, dictionary):
+        if "@@auto_increment_increment" in query:
+            return [(step,)]
+        if query.startswith("SELECT id, user_id, provider, action_type"):
+            low, high = params
+            rows = [(low + i * step, user_id, a["provider"], a["action_type"]) for i, a in enumerate(actions)]
+            if foreign_at is not None:
+                rows[foreign_at] = (rows[foreign_at][0], 9, "google", "send_email")
+            return [row for row in rows if row[0] <= high]
+        return []
+    return respond
+
+
+def test_bulk_insert_ids_follow_the_auto_increment_step(async_pool):
+    adb, pool = async_pool
+    actions = [{"provider": "asana", "action_type": "create_task", "draft_payload": {"tool": "create_asana_task"}},
+               {"provider": "google", "action_type": "send_email", "draft_payload": {"tool": "send_gmail"}},
+               {"provider": "asana", "action_type": "create_task", "draft_payload": {}}]
+    pool.respond = inserted_rows(5, actions)
+
+    pool.next_id = 41
+    assert asyncio.run(adb.create_pending_actions(5, actions)) == [41, 43, 45]
+    inserts = [(q, p) for q, p in pool.queries if q.startswith("INSERT")]
+    assert len(inserts) == 1
+    query, params = inserts[0]
+    assert query.count("(%s, %s, %s, %s, 'pending')") == 3
+    assert params[:4] == (5, "asana", "create_task", '{"tool": "create_asana_task"}')
+    # The ids are read back over the range they're assumed to span
+    assert pool.queries[-1][1] == (41, 45)
+
+    # The step is read once per manager
+    pool.next_id = 47
+    pool.respond = inserted_rows(5, actions[:2])
+    assert asyncio.run(adb.create_pending_actions(5, actions[:2])) == [47, 49]
+    assert sum("@@auto_increment_increment" in q for q, _ in pool.queries) == 1
+    assert pool.commits == 2 and pool.rollbacks == 0
+    assert asyncio.run(adb.create_pending_actions(5, [])) == []
+
+
+def test_interleaved_bulk_insert_falls_back_to_row_inserts(async_pool):
+    adb, pool = async_pool
+    actions = [{"provider": "asana", "action_type": "create_task", "draft_payload": {"n": i}} for i in range(3)]
+    script = inserted_rows(5, actions, foreign_at=1)
+
+    def respond(query, params, dictionary):
+        if query.startswith("INSERT") and len(params) == 4:
+            pool.next_id += 2
+        return script(query, params, dictionary)
+
+    pool.respond = respond
+    pool.next_id = 41
+    # Another session's row sits inside the range, so the batch is redone row by row
+    assert asyncio.run(adb.create_pending_actions(5, actions)) == [43, 45, 47]
+    inserts = [p for q, p in pool.queries if q.startswith("INSERT")]
+    assert [len(p) for p in inserts] == [12, 4, 4, 4]
+    assert [p[3] for p in inserts[1:]] == ['{"n": 0}', '{"n": 1}', '{"n": 2}']
+    assert pool.rollbacks == 1 and pool.commits == 1
+
+
+def test_pages_decode_payloads_and_round_trip_the_cursor(async_pool):
+    adb, pool = async_pool
+    created = datetime(2026, 10, 1, 12, 0, 0)
+    rows = [{"id": 9 - i, "user_id": 5, "provider": "asana", "action_type": "create_task",
+             "draft_payload": json.dumps({"n": 9 - i}), "status": "pending",
+             "created_at": created - timedelta(minutes=i)} for i in range(5)]
+
+    def respond(query, params, dictionary):
+        assert dictionary
+        matching = rows
+        if "created_at <" in query:
+            before, _, before_id = params[2:5]
+            matching = [r for r in rows if (r["created_at"], r["id"]) < (before, before_id)]
+        return [dict(r) for r in matching[:params[-1]]]
+
+    pool.respond = respond
+    first = asyncio.run(adb.get_pending_actions_page(5, limit=2))
+    assert [a["id"] for a in first["actions"]] == [9, 8]
+    assert first["actions"][0]["draft_payload"] == {"n": 9}
+    assert decode_cursor(first["next_cursor"]) == (created - timedelta(minutes=1), 8)
+    assert pool.queries[-1][1] == (5, "pending", 3)
+
+    second = asyncio.run(adb.get_pending_actions_page(5, limit=2, cursor=first["next_cursor"],
+                                                      fields=["id", "status"]))
+    assert second["actions"] == [{"id": 7, "status": "pending"}, {"id": 6, "status": "pending"}]
+    assert pool.queries[-1][1] == (5, "pending", created - timedelta(minutes=1),
+                                   created - timedelta(minutes=1), 8, 3)
+
+    last = asyncio.run(adb.get_pending_actions_page(5, limit=2, cursor=second["next_cursor"]))
+    assert [a["id"] for a in last["actions"]] == [5] and last["next_cursor"] is None
+
+    with pytest.raises(ValueError):
+        asyncio.run(adb.get_pending_actions_page(5, cursor="not-a-cursor"))
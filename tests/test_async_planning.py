@@ -0,0 +1,60 @@
+"""
+test_async_planning.py - Async planning path tests
+"""
+
+import asyncio
+import json
+import time
+
+PLAN = [{"tool": "create_asana_task", "provider": "asana",
+         "parameters": {"name": "Standup notes", "notes": "", "project_id": ""}}]
+
+
+class SlowLLM:
+    """Fake LLM whose generation takes a fixed amount of time"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, prompt, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return json.dumps(PLAN)
+
+
+def test_async_plan_persists_actions(make_brain):
+    brain, saved = make_brain(SlowLLM(0.01), max_concurrency=2)
+    actions = asyncio.run(brain.aget_agent_plan(1, "create task for standup notes"))
+    assert actions == PLAN
+    assert saved == [(1, "create_task")]
+
+
+def test_concurrency_cap_and_loop_stays_responsive(make_brain):
+    llm = SlowLLM(0.2)
+    brain, _ = make_brain(llm, max_concurrency=2)
+
+    async def run():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        start = time.perf_counter()
+        await asyncio.gather(*(brain.aget_agent_plan(1, f"task {i}", use_cache=False) for i in range(6)))
+        elapsed = time.perf_counter() - start
+        beat.cancel()
+        return ticks, elapsed
+
+    ticks, elapsed = asyncio.run(run())
+    assert llm.peak == 2
+    # 6 generations, 2 at a time -> 3 waves of 0.2s
+    assert 0.55 < elapsed < 1.5
+    assert ticks > 20
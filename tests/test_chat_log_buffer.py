@@ -0,0 +1,195 @@
+"""
+test_chat_log_buffer.py - Write-behind chat log batching, backpressure and shutdown
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from mysql.connector.errors import IntegrityError, OperationalError
+
+from chat_log_buffer import ChatLogBuffer
+from database import DatabaseManager
+from db_pool import ConnectionPool
+from tests.test_db_pool import FakeConnection
+
+
+class RecordingWriter:
+    def __init__(self, fail=0, delay=0.0):
+        self.batches = []
+        self.fail = fail
+        self.delay = delay
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, rows):
+        self.gate.wait()
+        time.sleep(self.delay)
+        if self.fail:
+            self.fail -= 1
+            return False
+        self.batches.append(list(rows))
+        return True
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_size_trigger_flushes_full_batches():
+    writer = RecordingWriter()
+    buffer = ChatLogBuffer(writer, batch_size=3, flush_interval=60)
+    buffer.start()
+    for i in range(7):
+        assert buffer.log(1, 'user', f"m{i}")
+    assert wait_until(lambda: len(writer.batches) == 2)
+    assert [len(b) for b in writer.batches] == [3, 3]
+    buffer.close()
+    # The leftover row is written on shutdown
+    assert [row[2] for b in writer.batches for row in b] == [f"m{i}" for i in range(7)]
+    assert buffer.stats()["flushed"] == 7 and buffer.stats()["queued"] == 0
+
+
+def test_time_trigger_flushes_partial_batch():
+    writer = RecordingWriter()
+    buffer = ChatLogBuffer(writer, batch_size=100, flush_interval=0.05)
+    buffer.start()
+    buffer.log(1, 'user', "hello")
+    assert wait_until(lambda: writer.batches == [[(1, 'user', "hello")]])
+    buffer.close()
+
+
+@pytest.mark.parametrize("policy,kept", [("drop_newest", ["a", "b"]), ("drop_oldest", ["b", "c"])])
+def test_full_queue_applies_backpressure_policy(policy, kept):
+    writer = RecordingWriter()
+    buffer = ChatLogBuffer(writer, max_queue=2, batch_size=10, flush_interval=60, policy=policy)
+    results = [buffer.log(1, 'user', m) for m in "abc"]
+    assert results == ([True, True, False] if policy == "drop_newest" else [True, True, True])
+    assert buffer.stats()["dropped"] == 1
+    buffer.flush()
+    assert [row[2] for row in writer.batches[0]] == kept
+
+
+def test_block_policy_waits_for_room_then_drops():
+    writer = RecordingWriter()
+    buffer = ChatLogBuffer(writer, max_queue=1, batch_size=10, flush_interval=60,
+                           policy='block', block_timeout=0.05)
+    buffer.log(1, 'user', "a")
+    started = time.perf_counter()
+    assert not buffer.log(1, 'user', "b")
+    assert time.perf_counter() - started >= 0.04
+
+    # A flush from another thread frees the slot while the producer waits
+    threading.Timer(0.02, buffer.flush).start()
+    buffer.block_timeout = 1.0
+    assert buffer.log(1, 'user', "c")
+
+
+def test_failed_write_is_retried_in_order():
+    writer = RecordingWriter(fail=1)
+    buffer = ChatLogBuffer(writer, batch_size=2, flush_interval=0.02)
+    buffer.start()
+    buffer.log(1, 'user', "a")
+    buffer.log(1, 'assistant', "b")
+    assert wait_until(lambda: len(writer.batches) == 1)
+    buffer.close()
+    assert [row[2] for row in writer.batches[0]] == ["a", "b"]
+    assert buffer.stats()["write_errors"] == 1 and buffer.stats()["dropped"] == 0
+
+
+class ForeignKeyWriter:
+    """Refuses any batch containing user 0, as the users FK would"""
+
+    def __init__(self, outage=0):
+        self.rows = []
+        self.calls = 0
+        self.outage = outage
+
+    def __call__(self, rows):
+        self.calls += 1
+        if self.outage:
+            self.outage -= 1
+            raise OperationalError("Lost connection to MySQL server")
+        if any(row[0] == 0 for row in rows):
+            raise IntegrityError("Cannot add or update a child row: a foreign key constraint fails")
+        self.rows.extend(rows)
+        return True
+
+
+def test_rows_the_database_refuses_are_dropped_not_retried_forever():
+    writer = ForeignKeyWriter()
+    buffer = ChatLogBuffer(writer, batch_size=3, flush_interval=60)
+    for user_id, content in [(1, "a"), (0, "orphan"), (1, "b"), (1, "c")]:
+        buffer.log(user_id, 'user', content)
+
+    assert buffer.flush() == 3
+    assert [row[2] for row in writer.rows] == ["a", "b", "c"]
+    stats = buffer.stats()
+    assert stats["rejected"] == 1 and stats["queued"] == 0 and stats["dropped"] == 0
+    # Later messages aren't stuck behind the bad row
+    buffer.log(1, 'user', "d")
+    assert buffer.flush() == 1 and writer.rows[-1][2] == "d"
+
+
+def test_transient_errors_keep_the_batch_queued():
+    writer = ForeignKeyWriter(outage=1)
+    buffer = ChatLogBuffer(writer, batch_size=2, flush_interval=60)
+    buffer.log(1, 'user', "a")
+    buffer.log(1, 'user', "b")
+    assert buffer.flush() == 0
+    assert buffer.stats()["queued"] == 2 and buffer.stats()["write_errors"] == 1
+    assert buffer.flush() == 2 and buffer.stats()["rejected"] == 0
+
+
+def test_alog_waits_for_room_off_the_event_loop():
+    writer = RecordingWriter()
+    buffer = ChatLogBuffer(writer, max_queue=1, batch_size=10, flush_interval=60,
+                           policy='block', block_timeout=0.2)
+
+    async def main():
+        assert await buffer.alog(1, 'user', "a")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        queued = await buffer.alog(1, 'user', "b")
+        task.cancel()
+        return queued, ticks
+
+    queued, ticks = asyncio.run(main())
+    # The loop kept running during the 0.2 s wait for room
+    assert queued is False and ticks >= 5
+
+
+def test_log_does_not_wait_for_the_database():
+    writer = RecordingWriter()
+    writer.gate.clear()
+    buffer = ChatLogBuffer(writer, batch_size=1, flush_interval=60)
+    buffer.start()
+    started = time.perf_counter()
+    for i in range(50):
+        buffer.log(1, 'user', f"m{i}")
+    assert time.perf_counter() - started < 0.05
+    writer.gate.set()
+    buffer.close()
+    assert buffer.stats()["flushed"] == 50
+
+
+def test_save_chat_messages_is_one_multi_row_insert():
+    conn = FakeConnection()
+    manager = DatabaseManager()
+    manager.pool = ConnectionPool({}, size=1, connect=lambda **cfg: conn)
+    assert manager.save_chat_messages([(1, 'user', "a"), (1, 'assistant', "b")])
+    query, params = conn.queries[-1]
+    assert query.count("(%s, %s, %s)") == 2
+    assert params == (1, 'user', "a", 1, 'assistant', "b")
+    assert conn.commits == 1
@@ -0,0 +1,290 @@
+"""
+test_db_pool.py - Connection pool tests with in-memory fake connections
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from mysql.connector.errors import OperationalError
+
+from database import DatabaseManager
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        if self.conn.dropped:
+            raise OperationalError("Lost connection to MySQL server during query")
+        self.conn.queries.append((query.strip(), params))
+        self.last = query.strip()
+        if self.conn.query_delay:
+            time.sleep(self.conn.query_delay)
+        self.lastrowid = 100 + len(self.conn.queries)
+
+    def fetchone(self):
+        if self.last.startswith("SELECT @@auto_increment_increment"):
+            return (2,)
+        return {"access_token": "tok", "refresh_token": None, "expires_at": None}
+
+    def fetchall(self):
+        if "user_connections" in self.last:
+            return [{"provider": "asana", "access_token": "tok", "refresh_token": None, "expires_at": None}]
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, query_delay=0.0, **config):
+        self.query_delay = query_delay
+        self.dropped = False
+        self.closed = False
+        self.queries = []
+        self.commits = 0
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def ping(self, reconnect=False):
+        if self.dropped:
+            raise OperationalError("MySQL server has gone away")
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    kwargs.setdefault("size", 2)
+    kwargs.setdefault("timeout", 1)
+    return ConnectionPool({}, connect=FakeConnection, **kwargs)
+
+
+def test_connections_are_reused_and_bounded():
+    pool = make_pool()
+    with pool.connection() as a:
+        pass
+    with pool.connection() as b:
+        assert b is a
+    stats = pool.stats()
+    assert stats["open"] == 1 and stats["idle"] == 1 and stats["checkouts"] == 2
+
+
+def test_checkout_times_out_when_exhausted():
+    pool = make_pool(size=1, timeout=0.1)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_gets_connection_when_released():
+    pool = make_pool(size=1, timeout=2)
+    conn = pool.acquire()
+    threading.Timer(0.1, pool.release, args=(conn,)).start()
+    assert pool.acquire() is conn
+    assert pool.stats()["wait_time"]["p95_ms"] >= 50
+
+
+def test_dead_connection_is_replaced_on_borrow():
+    pool = make_pool()
+    with pool.connection() as conn:
+        pass
+    conn.dropped = True
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert conn.closed
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_connection_lost_mid_query_is_discarded():
+    pool = make_pool()
+    with pytest.raises(OperationalError):
+        with pool.connection() as conn:
+            conn.dropped = True
+            conn.cursor().execute("SELECT 1")
+    assert conn.closed
+    assert pool.stats()["open"] == 0
+
+
+def test_old_connections_are_recycled():
+    pool = make_pool(max_lifetime=0.05)
+    with pool.connection() as conn:
+        pass
+    time.sleep(0.1)
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert pool.stats()["recycled"] == 1
+
+
+def test_manager_runs_queries_in_parallel():
+    manager = DatabaseManager()
+    manager.pool = ConnectionPool({}, size=4, timeout=2,
+                                  connect=lambda **cfg: FakeConnection(query_delay=0.2))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tokens = list(executor.map(lambda i: manager.get_user_token(i, 'asana'), range(4)))
+    elapsed = time.perf_counter() - start
+
+    assert all(t["access_token"] == "tok" for t in tokens)
+    assert elapsed < 0.6
+    assert manager.stats()["open"] == 4
+
+
+def test_manager_without_pool_degrades_gracefully():
+    manager = DatabaseManager()
+    assert manager.get_user_token(1, 'asana') is None
+    assert manager.get_pending_actions(1) == []
+    assert manager.ping() is False
+
+
+class ActionTable:
+    """
+    Connection over an in-memory ai_pending_actions table with auto_increment_increment 2
+    `interleave` ids are taken by another session in the middle of the next multi-row insert
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 102
+        self.interleave = 0
+        self.pending = None
+        self.queries = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, **kwargs):
+        return ActionTableCursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def start_transaction(self):
+        self.pending = {}
+
+    def commit(self):
+        self.rows.update(self.pending or {})
+        self.pending = None
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = None
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+    def take_id(self):
+        action_id, self.next_id = self.next_id, self.next_id + 2
+        return action_id
+
+
+class ActionTableCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+        self.result = []
+
+    def execute(self, query, params=()):
+        sql = " ".join(query.split())
+        conn = self.conn
+        conn.queries.append((sql, params))
+        if sql.startswith("SELECT @@auto_increment_increment"):
+            self.result = [(2,)]
+        elif sql.startswith("INSERT INTO ai_pending_actions"):
+            values = [params[i:i + 4] for i in range(0, len(params), 4)]
+            ids = []
+            for i, row in enumerate(values):
+                ids.append(conn.take_id())
+                conn.pending[ids[-1]] = row
+                if i == 0 and len(values) > 1:
+                    # Another session's committed insert lands between our rows
+                    for _ in range(conn.interleave):
+                        conn.rows[conn.take_id()] = (9, "google", "send_email", "{}")
+            conn.interleave = 0
+            self.lastrowid = ids[0]
+        elif sql.startswith("SELECT id, user_id, provider, action_type FROM ai_pending_actions"):
+            low, high = params
+            visible = {**conn.rows, **(conn.pending or {})}
+            self.result = [(i, *visible[i][:3]) for i in sorted(visible) if low <= i <= high]
+        else:
+            raise AssertionError(sql)
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return list(self.result)
+
+    def close(self):
+        pass
+
+
+def action_table_manager():
+    conn = ActionTable()
+    manager = DatabaseManager()
+    manager.pool = ConnectionPool({}, size=1, connect=lambda **cfg: conn)
+    return manager, conn
+
+
+def test_bulk_insert_is_one_statement_with_ids_in_order():
+    manager, conn = action_table_manager()
+    rows = [{"provider": "asana", "action_type": "create_task", "draft_payload": {"n": i}}
+            for i in range(5)]
+
+    ids = manager.create_pending_actions(7, rows)
+
+    inserts = [(q, p) for q, p in conn.queries if q.startswith("INSERT")]
+    assert len(inserts) == 1 and conn.commits == 1 and conn.rollbacks == 0
+    assert inserts[0][0].count("'pending')") == 5 and len(inserts[0][1]) == 20
+    # lastrowid is the first id; later rows follow auto_increment_increment
+    assert ids == [102, 104, 106, 108, 110]
+    assert [conn.rows[i][3] for i in ids] == ['{"n": %d}' % i for i in range(5)]
+    assert manager.create_pending_actions(7, []) == []
+
+
+def test_interleaved_bulk_insert_falls_back_to_row_inserts():
+    manager, conn = action_table_manager()
+    rows = [{"provider": "asana", "action_type": "create_task", "draft_payload": {"n": i}}
+            for i in range(3)]
+    # innodb_autoinc_lock_mode=2: another insert takes an id inside our batch
+    conn.interleave = 1
+
+    ids = manager.create_pending_actions(7, rows)
+
+    inserts = [q for q, _ in conn.queries if q.startswith("INSERT")]
+    assert len(inserts) == 4 and conn.rollbacks == 1 and conn.commits == 1
+    # The rolled back batch left nothing behind; each id is one of our rows, in order
+    assert ids == [110, 112, 114]
+    assert [conn.rows[i][3] for i in ids] == ['{"n": %d}' % i for i in range(3)]
+    assert sorted(i for i, row in conn.rows.items() if row[0] == 7) == ids
+
+
+def test_health_check_pings_off_the_event_loop(monkeypatch):
+    import asyncio
+    from fastapi.testclient import TestClient
+    import main
+
+    def ping():
+        # A worker thread has no running loop; a blocked pool wait here stalls nothing else
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return False
+
+    monkeypatch.setattr(main.db_manager, "ping", ping)
+    body = TestClient(main.app).get("/health").json()
+    assert body["status"] == "healthy" and body["database"] == "disconnected"
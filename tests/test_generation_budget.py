@@ -0,0 +1,123 @@
+"""
+test_generation_budget.py - Token, stop-sequence and deadline budgets for planning
+"""
+
+import asyncio
+import json
+
+from generation_budget import GenerationBudgets, expected_actions
+from llm_pool import LLMPool
+from tests.stubs import OllamaHandler, StubServer
+
+PLAN = [
+    {"tool": "create_asana_task", "provider": "asana", "parameters": {"name": "a"}},
+    {"tool": "send_gmail", "provider": "google", "parameters": {"to": "b@x.io"}},
+]
+MESSAGE = "Sort out the launch work for next week"
+
+
+def test_num_predict_scales_with_expected_actions_and_content():
+    budgets = GenerationBudgets()
+    config = budgets.config['large']
+    one = budgets.for_request('large', "Email Bob")["num_predict"]
+    two = budgets.for_request('large', "Email Bob and add a task")["num_predict"]
+    ten = budgets.for_request('large', "Create ten Asana tasks for the launch")["num_predict"]
+    assert two - one >= config["tokens_per_action"]
+    assert ten >= 10 * config["tokens_per_action"]
+    # The plan repeats the user's text, e.g. a long email body
+    body = "Email Bob this: " + "the launch moves to Friday " * 40
+    assert budgets.for_request('large', body)["num_predict"] > one + len(body) // 4
+    assert budgets.for_request('small', "Email Bob")["num_predict"] < one
+    # Never past the tier's cap
+    assert budgets.for_request('large', "Create 20 tasks " + "x" * 20000)["num_predict"] == config["max_tokens"]
+
+
+def test_expected_actions():
+    assert expected_actions("Sort out the launch work for next week") == 1
+    assert expected_actions("Email Bob, then add a task and ping Alice") == 3
+    assert expected_actions("Create 12 follow-up tasks") == 12
+    assert expected_actions("") == 1
+
+
+def test_env_overrides_per_tier(monkeypatch):
+    monkeypatch.setenv('LLM_TOKENS_PER_ACTION', '100')
+    monkeypatch.setenv('LLM_SMALL_MAX_TOKENS', '150')
+    monkeypatch.setenv('LLM_SMALL_DEADLINE_SECONDS', '2.5')
+    monkeypatch.setenv('LLM_STOP_SEQUENCES', '\\n\\n|<end>')
+    budgets = GenerationBudgets()
+    assert budgets.config['small']["tokens_per_action"] == 100
+    assert budgets.config['large']["tokens_per_action"] == 100
+    assert budgets.for_request('small', "Email Bob and add a task")["num_predict"] == 150
+    assert budgets.for_request('small', MESSAGE)["deadline"] == 2.5
+    assert budgets.for_request('large', MESSAGE)["deadline"] == 30.0
+    assert budgets.stop == ["\n\n", "<end>"]
+
+
+def test_budget_is_sent_to_ollama_and_closure_stops_generation(make_brain):
+    # The model keeps padding after the array closes; the planner must not wait for it
+    response = json.dumps(PLAN) + " " * 400
+    with StubServer(OllamaHandler, response=response, token_delay=0.01) as server:
+        brain, saved = make_brain(LLMPool("stub", base_urls=[server.url], hedge=False))
+        actions, elapsed = asyncio.run(_timed(brain.aget_agent_plan(1, MESSAGE, use_cache=False)))
+
+        assert actions == PLAN
+        assert len(saved) == 2
+        assert elapsed < 0.5
+        body = server.state["bodies"][0]
+        assert body["options"]["num_predict"] == brain.budgets.for_request('large', MESSAGE)["num_predict"]
+        assert body["options"]["stop"] == brain.budgets.stop
+        assert brain.budgets.stats()["tiers"]["large"]["closure_stop"] == 1
+
+
+def test_deadline_returns_complete_actions_parsed_so_far(make_brain):
+    # Roughly 0.55s for the first action, 1.05s for the whole plan
+    with StubServer(OllamaHandler, response=json.dumps(PLAN), token_delay=0.05) as server:
+        brain, saved = make_brain(LLMPool("stub", base_urls=[server.url], hedge=False))
+        brain.budgets.config['large']["deadline_seconds"] = 0.8
+
+        actions = brain.get_agent_plan(1, MESSAGE, use_cache=False)
+        assert actions == PLAN[:1]
+        async_actions = asyncio.run(brain.aget_agent_plan(1, MESSAGE, use_cache=False))
+        assert async_actions == PLAN[:1]
+
+        stats = brain.budgets.stats()["tiers"]["large"]
+        assert stats["deadline"] == 2
+        assert brain.llm.stats()["backends"][0]["failures"] == 0
+
+
+def test_stream_deadline_keeps_emitted_actions(make_brain):
+    with StubServer(OllamaHandler, response=json.dumps(PLAN), token_delay=0.05) as server:
+        brain, saved = make_brain(LLMPool("stub", base_urls=[server.url], hedge=False))
+        brain.budgets.config['large']["deadline_seconds"] = 0.8
+
+        async def collect():
+            return [item["action"] async for item in brain.astream_agent_plan(1, MESSAGE, use_cache=False)]
+
+        assert asyncio.run(collect()) == PLAN[:1]
+        assert brain.budgets.stats()["tiers"]["large"]["deadline"] == 1
+
+
+def test_plan_cut_off_at_num_predict_keeps_its_complete_actions(make_brain):
+    # The model ran out of tokens partway through the second action
+    text = json.dumps(PLAN)
+    truncated = text[:text.index('"send_gmail"') + 20]
+    with StubServer(OllamaHandler, response=truncated) as server:
+        brain, saved = make_brain(LLMPool("stub", base_urls=[server.url], hedge=False))
+
+        assert brain.get_agent_plan(1, MESSAGE, use_cache=False) == PLAN[:1]
+
+        async def run():
+            planned = await brain.aget_agent_plan(1, MESSAGE, use_cache=False)
+            streamed = [item["action"] async for item in brain.astream_agent_plan(1, MESSAGE, use_cache=False)]
+            return planned, streamed
+
+        assert asyncio.run(run()) == (PLAN[:1], PLAN[:1])
+        assert len(saved) == 3
+        assert brain.budgets.stats()["tiers"]["large"]["truncated"] == 3
+
+
+async def _timed(coro):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await coro
+    return result, loop.time() - start
@@ -0,0 +1,74 @@
+"""
+test_http_client.py - Shared provider HTTP client against local stub APIs
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tools.asana_tool as asana_tool
+import tools.google_tool as google_tool
+from tests.stubs import ProviderHandler, StubServer
+from tools.http_client import ProviderHTTPClient
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = ProviderHTTPClient(pool_size=4, timeout=5)
+    monkeypatch.setattr(asana_tool, "http_client", client)
+    monkeypatch.setattr(google_tool, "http_client", client)
+    yield client
+    client.close()
+
+
+def test_sequential_calls_share_one_connection(client):
+    with StubServer(ProviderHandler) as asana:
+        for i in range(20):
+            api = asana_tool.AsanaAPI(f"token-{i}", base_url=asana.url)
+            assert "data" in api.create_task({"name": f"task {i}", "notes": ""})
+
+        assert len(asana.state["connections"]) == 1
+        assert asana.state["calls"][-1]["authorization"] == "Bearer token-19"
+        stats = client.stats()["hosts"][asana.url]
+        assert (stats["requests"], stats["connections_opened"]) == (20, 1)
+        assert stats["reuse_rate"] == 0.95
+
+
+def test_hosts_get_separate_pools(client, monkeypatch):
+    with StubServer(ProviderHandler) as asana, StubServer(ProviderHandler) as gmail:
+        monkeypatch.setattr(google_tool, "GMAIL_API_URL", gmail.url + "/gmail/v1")
+        api = asana_tool.AsanaAPI("tok", base_url=asana.url)
+        for _ in range(3):
+            api.fetch_projects("ws")
+            assert "error" not in google_tool.send_gmail("tok", {"to": "a@x.io", "subject": "s", "body": "b"})
+
+        assert gmail.state["calls"][0]["path"] == "/gmail/v1/users/me/messages/send"
+        assert asana.state["calls"][0]["path"].startswith("/projects?workspace=ws&limit=")
+        hosts = client.stats()["hosts"]
+        assert set(hosts) == {asana.url, gmail.url}
+        assert all(h["connections_opened"] == 1 and h["requests"] == 3 for h in hosts.values())
+
+
+def test_concurrent_calls_stay_within_the_pool_once_warm(client):
+    with StubServer(ProviderHandler, delay=0.02) as asana:
+        api = asana_tool.AsanaAPI("tok", base_url=asana.url)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for _ in range(3):
+                list(executor.map(lambda i: api.get_task(str(i)), range(4)))
+
+        assert len(asana.state["connections"]) <= 4
+        assert client.stats()["hosts"][asana.url]["requests"] == 12
+
+
+def test_cookies_are_not_shared_between_users(client):
+    with StubServer(ProviderHandler, set_cookie="session=user-a; Path=/") as asana:
+        asana_tool.AsanaAPI("user-a", base_url=asana.url).fetch_workspaces()
+        asana_tool.AsanaAPI("user-b", base_url=asana.url).fetch_workspaces()
+        assert asana.state["calls"][1]["cookie"] is None
+        assert len(client.session.cookies) == 0
+
+
+def test_errors_are_counted_and_reported_as_before(client):
+    api = asana_tool.AsanaAPI("tok", base_url="http://127.0.0.1:9")
+    assert "error" in api.create_task({"name": "x"})
+    assert client.stats()["hosts"]["http://127.0.0.1:9"]["errors"] == 1
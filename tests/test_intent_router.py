@@ -0,0 +1,49 @@
+"""
+test_intent_router.py - Fast-path intent router tests
+"""
+
+from intent_router import IntentRouter, KeywordTrie
+
+
+def test_trie_prefers_longest_match():
+    trie = KeywordTrie({("send",): "a", ("send", "email"): "b"})
+    assert trie.match(["send", "email", "now"]) == "b"
+    assert trie.match(["send", "fax"]) == "a"
+    assert trie.match(["fax"]) is None
+
+
+def test_formulaic_email():
+    router = IntentRouter()
+    actions = router.route("email bob@x.com subject: Q4 numbers body: See attached", True, True)
+    assert actions == [{"tool": "send_gmail", "provider": "google",
+                        "parameters": {"to": "bob@x.com", "subject": "Q4 numbers", "body": "See attached"}}]
+
+
+def test_formulaic_task():
+    router = IntentRouter()
+    actions = router.route("task: review website", True, False)
+    assert actions[0]["tool"] == "create_asana_task"
+    assert actions[0]["parameters"] == {"name": "review website", "notes": "", "project_id": ""}
+
+
+def test_falls_through_when_unsure_or_unavailable():
+    router = IntentRouter()
+    assert router.route("Create a task for API documentation and send email to team", True, True) is None
+    assert router.route("task: draft plan and email bob@x.com", True, True) is None
+    assert router.route("email bob@x.com about lunch", True, True) is None
+    assert router.route("task: review website", False, True) is None
+    stats = router.stats()
+    assert stats["attempts"] == 4 and stats["hits"] == 0
+
+
+class FailingLLM:
+    def invoke(self, prompt, **kwargs):
+        raise AssertionError("LLM must not be called on the fast path")
+
+
+def test_brain_fast_path_skips_llm(make_brain):
+    brain, saved = make_brain(FailingLLM())
+    actions = brain.get_agent_plan(1, "task: review website")
+    assert actions[0]["parameters"]["name"] == "review website"
+    assert saved == [(1, "create_task")]
+    assert brain.stats()["path_latency"]["fast_path"]["count"] == 1
@@ -0,0 +1,109 @@
+"""
+test_llm_pool.py - LLM backend pool tests against stub Ollama servers
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from llm_pool import DeadlineExceeded, LLMPool
+from tests.stubs import OllamaHandler, StubServer
+
+PLAN = '[{"tool": "create_asana_task", "provider": "asana", "parameters": {"name": "x"}}]'
+
+
+def test_least_outstanding_routing_spreads_load():
+    with StubServer(OllamaHandler, response=PLAN, first_token_delay=0.1) as a, \
+            StubServer(OllamaHandler, response=PLAN, first_token_delay=0.1) as b:
+        pool = LLMPool("stub", base_urls=[a.url, b.url], hedge=False)
+
+        async def run():
+            return await asyncio.gather(*(pool.ainvoke("plan") for _ in range(6)))
+
+        results = asyncio.run(run())
+        assert results == [PLAN] * 6
+        assert a.state["requests"] == 3 and b.state["requests"] == 3
+
+
+def test_failing_backend_is_ejected_and_requests_fail_over():
+    with StubServer(OllamaHandler, fail=True) as bad, StubServer(OllamaHandler, response=PLAN) as good:
+        pool = LLMPool("stub", base_urls=[bad.url, good.url], hedge=False,
+                       eject_after=2, eject_seconds=60)
+        for _ in range(6):
+            assert pool.invoke("plan") == PLAN
+
+        assert bad.state["requests"] == 2
+        bad_stats = pool.stats()["backends"][0]
+        assert not bad_stats["healthy"] and bad_stats["failures"] == 2
+
+
+def test_ejected_backend_is_probed_again_after_cooldown():
+    with StubServer(OllamaHandler, fail=True) as flaky, StubServer(OllamaHandler, response=PLAN) as good:
+        pool = LLMPool("stub", base_urls=[flaky.url, good.url], hedge=False,
+                       eject_after=1, eject_seconds=0.2)
+        for _ in range(2):
+            pool.invoke("plan")
+        assert not pool.stats()["backends"][0]["healthy"]
+
+        flaky.state["fail"] = False
+        flaky.state["response"] = PLAN
+        time.sleep(0.25)
+        for _ in range(4):
+            pool.invoke("plan")
+        assert pool.stats()["backends"][0]["healthy"]
+        assert flaky.state["requests"] >= 2
+
+
+def test_hedged_request_wins_on_fast_backend():
+    with StubServer(OllamaHandler, response=PLAN, first_token_delay=1.5) as slow, \
+            StubServer(OllamaHandler, response=PLAN) as fast:
+        pool = LLMPool("stub", base_urls=[slow.url, fast.url], hedge=True)
+        pool.hedge_default_ms = 100
+        # Make the slow backend the primary pick
+        pool._rr = len(pool.backends) - 1
+
+        async def run():
+            start = time.perf_counter()
+            result = await pool.ainvoke("plan")
+            return result, time.perf_counter() - start
+
+        result, elapsed = asyncio.run(run())
+        assert result == PLAN
+        assert elapsed < 1.0
+        stats = pool.stats()
+        assert stats["hedges_fired"] == 1 and stats["hedges_won"] == 1
+
+
+def test_sync_deadline_cuts_off_a_backend_that_stalls_before_its_first_token():
+    with StubServer(OllamaHandler, response=PLAN, first_token_delay=2) as stalled:
+        pool = LLMPool("stub", base_urls=[stalled.url], hedge=False)
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded) as raised:
+            pool.invoke("plan", deadline=0.2)
+        assert time.perf_counter() - start < 0.6
+        assert raised.value.partial == ""
+        # Running out of budget is not held against the backend
+        assert pool.stats()["backends"][0]["failures"] == 0
+
+
+def test_sync_deadline_cuts_off_a_stall_between_tokens():
+    with StubServer(OllamaHandler, response=PLAN, token_delay=1) as slow:
+        pool = LLMPool("stub", base_urls=[slow.url], hedge=False)
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded) as raised:
+            pool.invoke("plan", deadline=0.3)
+        assert time.perf_counter() - start < 0.8
+        assert raised.value.partial == PLAN[:8]
+
+
+def test_hedged_failover_retries_on_a_different_backend():
+    with StubServer(OllamaHandler, fail=True) as bad, StubServer(OllamaHandler, response=PLAN) as good:
+        pool = LLMPool("stub", base_urls=[bad.url, good.url], hedge=True)
+        pool.hedge_default_ms = 5000
+        # Keep the failing backend the least-loaded pick, so only exclusion moves the retry
+        pool.backends[1].outstanding = 5
+
+        assert asyncio.run(pool.ainvoke("plan")) == PLAN
+        assert bad.state["requests"] == 1 and good.state["requests"] == 1
+        assert pool.stats()["hedges_fired"] == 0
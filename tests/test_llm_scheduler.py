@@ -0,0 +1,139 @@
+"""
+test_llm_scheduler.py - Planning scheduler tests
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from llm_scheduler import PlanningScheduler
+
+PLAN = [{"tool": "create_asana_task", "provider": "asana",
+         "parameters": {"name": "Standup notes", "notes": "", "project_id": ""}}]
+
+
+def test_generations_start_immediately_up_to_the_slot_count():
+    running = []
+    peak = []
+
+    async def generate(scheduler, prompt):
+        async with scheduler.slot():
+            running.append(prompt)
+            peak.append(len(running))
+            await asyncio.sleep(0.05)
+            running.remove(prompt)
+            return prompt.upper()
+
+    async def run():
+        scheduler = PlanningScheduler(4)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(generate(scheduler, f"p{i}") for i in range(8)))
+        return scheduler, results, time.perf_counter() - start
+
+    scheduler, results, elapsed = asyncio.run(run())
+    assert results == [f"P{i}" for i in range(8)]
+    # Two rounds of four, with no window in between
+    assert max(peak) == 4 and elapsed < 0.15
+    stats = scheduler.stats()
+    assert stats["admitted"] == {"generate": 8, "stream": 0} and stats["largest_queue"] == 4
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+    assert stats["wait_time"]["count"] == 8
+
+
+def test_idle_request_is_not_delayed():
+    async def run():
+        scheduler = PlanningScheduler(2)
+        start = time.perf_counter()
+        async with scheduler.slot():
+            pass
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 0.05
+
+
+def test_errors_release_the_slot():
+    async def run():
+        scheduler = PlanningScheduler(1)
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot():
+                raise RuntimeError("boom")
+        async with scheduler.slot():
+            pass
+        return scheduler
+
+    stats = asyncio.run(run()).stats()
+    assert stats["admitted"]["generate"] == 2 and stats["in_flight"] == 0
+
+
+def test_cancelled_callers_free_their_slot():
+    started = []
+
+    async def generate(scheduler, prompt):
+        async with scheduler.slot():
+            started.append(prompt)
+            await asyncio.sleep(10)
+
+    async def run():
+        scheduler = PlanningScheduler(1)
+        running = asyncio.create_task(generate(scheduler, "running"))
+        queued = asyncio.create_task(generate(scheduler, "queued"))
+        await asyncio.sleep(0.01)
+        running.cancel()
+        queued.cancel()
+        for task in (running, queued):
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    # The queued prompt never reached the server and both callers saw the cancellation
+    assert started == ["running"] and not scheduler._semaphore.locked()
+    stats = scheduler.stats()
+    assert stats["cancelled"] == 2 and stats["queue_depth"] == 0 and stats["in_flight"] == 0
+
+
+class SharedLLM:
+    """Fake LLM serving whole and streamed generations, tracking how many run at once"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, prompt, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return json.dumps(PLAN)
+
+    async def astream(self, prompt, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            text = json.dumps(PLAN)
+            for i in range(0, len(text), 20):
+                await asyncio.sleep(0.01)
+                yield text[i:i + 20]
+        finally:
+            self.active -= 1
+
+
+def test_streamed_and_whole_plans_share_the_same_slots(make_brain):
+    llm = SharedLLM()
+    brain, _ = make_brain(llm, max_concurrency=1)
+
+    async def stream(message):
+        return [item["action"] async for item in brain.astream_agent_plan(1, message, use_cache=False)]
+
+    async def run():
+        return await asyncio.gather(stream("standup notes one"), stream("standup notes two"),
+                                    brain.aget_agent_plan(1, "standup notes three", use_cache=False))
+
+    results = asyncio.run(run())
+    assert all(result == PLAN for result in results)
+    assert llm.peak == 1
+    stats = brain.stats()["scheduler"]
+    assert stats["admitted"] == {"generate": 1, "stream": 2}
+    assert stats["largest_queue"] >= 1
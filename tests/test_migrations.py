@@ -0,0 +1,200 @@
+"""
+test_migrations.py - Migration runner and hot-query index coverage
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+
+import mysql.connector
+import pytest
+
+from database import USER_TOKENS_QUERY, encode_cursor, pending_page_query
+from migrations import MIGRATIONS, migrate, model_indexes
+from models import Base
+
+# Request-path queries: (name, SQL, params, columns an index must lead with)
+_page, _page_params, _, _ = pending_page_query(1, 'pending', 20, None, None)
+_next, _next_params, _, _ = pending_page_query(
+    1, 'pending', 20, encode_cursor({"created_at": datetime(2024, 1, 1), "id": 500}), None)
+HOT_QUERIES = [
+    ("user tokens", USER_TOKENS_QUERY, (1,), ('user_connections', ['user_id', 'updated_at'])),
+    ("pending page", _page, _page_params,
+     ('ai_pending_actions', ['user_id', 'status', 'created_at', 'id'])),
+    ("pending next page", _next, _next_params,
+     ('ai_pending_actions', ['user_id', 'status', 'created_at', 'id'])),
+    ("pending by status", "SELECT * FROM ai_pending_actions WHERE status = %s ORDER BY created_at DESC",
+     ('pending',), ('ai_pending_actions', ['status', 'created_at'])),
+    ("chat history", "SELECT * FROM agent_chat_logs WHERE user_id = %s ORDER BY created_at DESC",
+     (1,), ('agent_chat_logs', ['user_id', 'created_at'])),
+]
+
+
+class SchemaCursor:
+    """Tracks versions and index names the way MySQL would report them"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def execute(self, query, params=()):
+        sql = " ".join(query.split())
+        self.conn.statements.append(sql)
+        self.result = []
+        if "information_schema.statistics" in sql:
+            self.result = [(name,) for name in self.conn.indexes.get(params[0], set())]
+        elif sql.startswith("SELECT version FROM"):
+            self.result = [(v,) for v in sorted(self.conn.versions)]
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            self.conn.versions.add(params[0])
+        elif sql.startswith("CREATE INDEX"):
+            name, table = sql.split()[2], sql.split()[4]
+            self.conn.indexes.setdefault(table, set()).add(name)
+        elif " ADD CONSTRAINT " in sql:
+            table, name = sql.split()[2], sql.split()[5]
+            self.conn.indexes.setdefault(table, set()).add(name)
+        elif sql.startswith("DROP INDEX"):
+            self.conn.indexes[sql.split()[4]].discard(sql.split()[2])
+        elif sql.startswith("DELETE older FROM user_connections"):
+            # Evaluate the join condition on the in-memory rows
+            condition = re.sub(r"(older|newer)\.(\w+)", r'\1["\2"]', sql.split(" ON ", 1)[1])
+            condition = condition.replace(" = ", " == ").replace("AND", "and").replace("OR", "or")
+            rows = self.conn.connections
+            rows[:] = [older for older in rows
+                       if not any(eval(condition, {}, {"older": older, "newer": newer}) for newer in rows)]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class SchemaConnection:
+    def __init__(self, indexes=None, connections=None):
+        self.indexes = indexes or {}
+        self.connections = connections or []
+        self.versions = set()
+        self.statements = []
+
+    def cursor(self, **kwargs):
+        return SchemaCursor(self)
+
+    def commit(self):
+        pass
+
+
+def test_hot_queries_have_a_leading_model_index():
+    declared = {table.name: [[c.name for c in index.columns] for index in table.indexes]
+                for table in Base.metadata.sorted_tables}
+    for name, _, _, (table, columns) in HOT_QUERIES:
+        assert columns in declared[table], f"{name}: no index on {table}({', '.join(columns)})"
+
+
+def test_fresh_database_gets_every_version_once():
+    conn = SchemaConnection()
+    assert migrate(conn) == [v for v, _, _ in MIGRATIONS]
+    assert sum(s.startswith("CREATE TABLE IF NOT EXISTS") for s in conn.statements) == 5
+    for table, statements in model_indexes().items():
+        assert set(statements) <= conn.indexes.get(table, set())
+
+    conn.statements.clear()
+    assert migrate(conn) == []
+    assert not any(s.startswith(("CREATE INDEX", "ALTER", "DROP")) for s in conn.statements)
+
+
+def test_target_version_stops_early():
+    conn = SchemaConnection()
+    assert migrate(conn, target=1) == [1]
+    assert not any(s.startswith("CREATE INDEX") for s in conn.statements)
+    assert migrate(conn) == [v for v, _, _ in MIGRATIONS if v > 1]
+
+
+def test_legacy_schema_is_brought_in_line():
+    conn = SchemaConnection({
+        "user_connections": {"PRIMARY"},
+        "ai_pending_actions": {"PRIMARY", "idx_user_status"},
+    })
+    migrate(conn)
+    statements = conn.statements
+    dedupe = next(i for i, s in enumerate(statements) if s.startswith("DELETE older FROM user_connections"))
+    unique = next(i for i, s in enumerate(statements) if "ADD CONSTRAINT unique_user_provider" in s)
+    assert dedupe < unique
+    assert "idx_user_status" not in conn.indexes["ai_pending_actions"]
+    assert "idx_user_status_created" in conn.indexes["ai_pending_actions"]
+
+
+def test_token_dedupe_keeps_the_most_recently_updated_row():
+    day = datetime(2024, 5, 1)
+    rows = [
+        # A re-connect rewrote the older row in place; the app reads it, not the higher id
+        {"id": 1, "user_id": 1, "provider": "asana", "updated_at": day + timedelta(days=2)},
+        {"id": 2, "user_id": 1, "provider": "asana", "updated_at": day},
+        # Same timestamp: the higher id wins
+        {"id": 3, "user_id": 1, "provider": "google", "updated_at": day},
+        {"id": 4, "user_id": 1, "provider": "google", "updated_at": day},
+        {"id": 5, "user_id": 2, "provider": "asana", "updated_at": day},
+    ]
+    conn = SchemaConnection({"user_connections": {"PRIMARY"}}, connections=rows)
+    migrate(conn)
+    assert sorted(r["id"] for r in conn.connections) == [1, 4, 5]
+
+
+@pytest.fixture
+def mysql_conn():
+    """A scratch database migrated to the latest version; skipped without a MySQL server"""
+    database = os.getenv('TEST_DB_NAME', 'gaprio_agent_test')
+    try:
+        conn = mysql.connector.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=int(os.getenv('DB_PORT', 3306)),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', ''),
+            connection_timeout=2
+        )
+    except mysql.connector.Error as e:
+        pytest.skip(f"MySQL not available: {e}")
+
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}`")
+    cursor.execute(f"USE `{database}`")
+    migrate(conn)
+
+    # Enough rows across users and statuses that the optimizer weighs its options
+    cursor.executemany("INSERT INTO users (id, email) VALUES (%s, %s)",
+                       [(u, f"user{u}@example.com") for u in range(1, 201)])
+    cursor.executemany("INSERT INTO user_connections (user_id, provider, access_token) VALUES (%s, %s, 'tok')",
+                       [(u, p) for u in range(1, 201) for p in ('asana', 'google')])
+    # Most actions are long settled; a few are still pending, as in production
+    base = datetime(2024, 1, 1)
+    cursor.executemany(
+        "INSERT INTO ai_pending_actions (user_id, provider, action_type, draft_payload, status, created_at) "
+        "VALUES (%s, 'asana', 'create_task', '{}', %s, %s)",
+        [(i % 200 + 1, 'pending' if i % 20 == 0 else 'executed', base + timedelta(minutes=i))
+         for i in range(4000)])
+    cursor.executemany("INSERT INTO agent_chat_logs (user_id, role, content) VALUES (%s, 'user', 'hi')",
+                       [(i % 200 + 1,) for i in range(2000)])
+    for table in ('user_connections', 'ai_pending_actions', 'agent_chat_logs'):
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    conn.commit()
+    cursor.close()
+
+    yield conn
+
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.close()
+    conn.close()
+
+
+@pytest.mark.parametrize("name,query,params", [(n, q, p) for n, q, p, _ in HOT_QUERIES])
+def test_hot_queries_avoid_full_scans(mysql_conn, name, query, params):
+    cursor = mysql_conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + query, params)
+    plan = cursor.fetchall()
+    cursor.close()
+    for row in plan:
+        assert row["type"] != "ALL", f"{name}: full scan of {row['table']}"
+        assert "filesort" not in (row["Extra"] or ""), f"{name}: sorts {row['table']} instead of reading an index"
@@ -0,0 +1,65 @@
+"""
+test_model_router.py - Tiered model routing tests
+"""
+
+import asyncio
+import json
+
+from model_router import ModelRouter
+
+PLAN = [{"tool": "create_asana_task", "provider": "asana",
+         "parameters": {"name": "Review website", "notes": "", "project_id": ""}}]
+
+
+def test_simple_and_complex_requests_pick_different_tiers():
+    router = ModelRouter(threshold=2.0, max_simple_words=20)
+    assert router.select_tier("Create a task to review the website", 2) == "small"
+    assert router.select_tier(
+        "Create a task for the launch, then email the team and schedule a follow up", 2) == "large"
+    assert router.select_tier("maybe do something about the thing?", 2) == "large"
+
+
+class FakeLLM:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        return self.response
+
+    async def ainvoke(self, prompt, **kwargs):
+        return self.invoke(prompt)
+
+
+def _tiered_brain(make_brain, small_response):
+    large = FakeLLM(json.dumps(PLAN))
+    small = FakeLLM(small_response)
+    brain, saved = make_brain(large)
+    brain.small_llm = small
+    brain.model_router = ModelRouter(threshold=2.0)
+    return brain, small, large
+
+
+def test_small_tier_serves_simple_request(make_brain):
+    brain, small, large = _tiered_brain(make_brain, json.dumps(PLAN))
+    assert brain.get_agent_plan(1, "Create a task to review the website", use_cache=False) == PLAN
+    assert (small.calls, large.calls) == (1, 0)
+    assert brain.model_router.stats()["tiers"]["small"]["parse_ok"] == 1
+
+
+def test_unparseable_small_output_escalates(make_brain):
+    brain, small, large = _tiered_brain(make_brain, "Sure! Here is your task: review website")
+    actions = asyncio.run(brain.aget_agent_plan(1, "Create a task to review the website", use_cache=False))
+    assert actions == PLAN
+    assert (small.calls, large.calls) == (1, 1)
+    stats = brain.model_router.stats()
+    assert stats["escalations"] == 1
+    assert stats["tiers"]["small"]["parse_failed"] == 1
+    assert stats["tiers"]["large"]["parse_ok"] == 1
+
+
+def test_legitimately_empty_plan_is_not_escalated(make_brain):
+    brain, small, large = _tiered_brain(make_brain, "[]")
+    assert brain.get_agent_plan(1, "Create nothing please", use_cache=False) == []
+    assert large.calls == 0
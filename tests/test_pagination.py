@@ -0,0 +1,103 @@
+"""
+test_pagination.py - Keyset pagination and projection of pending actions
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import DatabaseManager, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from db_pool import ConnectionPool
+
+BASE = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class TableCursor:
+    """Evaluates the keyset page query against an in-memory table"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=()):
+        self.conn.queries.append(query)
+        columns = [c.strip() for c in query.split("SELECT", 1)[1].split("FROM", 1)[0].split(",")]
+        user_id, status, *rest = params
+        limit = rest.pop()
+        rows = [r for r in self.conn.rows if r["user_id"] == user_id and r["status"] == status]
+        if rest:
+            created_at, _, action_id = rest
+            rows = [r for r in rows
+                    if r["created_at"] < created_at or (r["created_at"] == created_at and r["id"] < action_id)]
+        rows.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        self.result = [{c: r[c] for c in columns} for r in rows[:limit]]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class TableConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def cursor(self, **kwargs):
+        return TableCursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def manager():
+    # Pairs of rows share a timestamp so the id tie-breaker matters
+    rows = [{"id": i, "user_id": 1, "provider": "asana", "action_type": "create_task",
+             "draft_payload": '{"tool": "create_asana_task"}', "status": "pending",
+             "created_at": BASE + timedelta(seconds=i // 2)} for i in range(1, 24)]
+    rows.append(dict(rows[0], id=99, user_id=2))
+    conn = TableConnection(rows)
+    manager = DatabaseManager()
+    manager.pool = ConnectionPool({}, size=1, connect=lambda **cfg: conn)
+    return manager, conn
+
+
+def test_pages_cover_every_row_once_in_order(manager):
+    manager, conn = manager
+    seen, cursor = [], None
+    while True:
+        page = manager.get_pending_actions_page(1, limit=5, cursor=cursor)
+        seen.extend(a["id"] for a in page["actions"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == list(range(23, 0, -1))
+    assert all("LIMIT %s" in q for q in conn.queries)
+
+
+def test_projection_skips_payload(manager):
+    manager, conn = manager
+    page = manager.get_pending_actions_page(1, limit=3, fields=["id", "action_type"])
+    assert page["actions"] == [{"id": i, "action_type": "create_task"} for i in (23, 22, 21)]
+    assert "draft_payload" not in conn.queries[-1]
+
+    full = manager.get_pending_actions_page(1, limit=1)
+    assert full["actions"][0]["draft_payload"] == {"tool": "create_asana_task"}
+
+
+def test_page_size_is_capped_and_input_validated(manager):
+    manager, conn = manager
+    conn.rows.extend(dict(conn.rows[0], id=1000 + i) for i in range(MAX_PAGE_SIZE + 10))
+    assert len(manager.get_pending_actions_page(1, limit=10_000)["actions"]) == MAX_PAGE_SIZE
+    with pytest.raises(ValueError):
+        manager.get_pending_actions_page(1, fields=["id", "password"])
+    with pytest.raises(ValueError):
+        manager.get_pending_actions_page(1, cursor="not-a-cursor")
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor({"created_at": BASE, "id": 7})) == (BASE, 7)
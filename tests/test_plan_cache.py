@@ -0,0 +1,65 @@
+"""
+test_plan_cache.py - Exact-match plan cache tests
+"""
+
+import json
+import time
+
+from plan_cache import PlanCache
+
+PLAN = [{"tool": "send_gmail", "provider": "google",
+         "parameters": {"to": "team@example.com", "subject": "Weekly update", "body": ""}}]
+
+
+class CountingLLM:
+    """Fake LLM that counts invocations"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        return json.dumps(PLAN)
+
+
+def test_lru_eviction_and_counters():
+    cache = PlanCache(max_entries=2, ttl_seconds=60)
+    a, b, c = (cache.make_key(m, True, True) for m in ("a", "b", "c"))
+    cache.put(a, PLAN)
+    cache.put(b, PLAN)
+    assert cache.get(a) == PLAN  # a is now most recent
+    cache.put(c, PLAN)           # evicts b
+    assert cache.get(b) is None
+    assert cache.get(c) == PLAN
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = PlanCache(max_entries=4, ttl_seconds=0.05)
+    key = cache.make_key("x", False, True)
+    cache.put(key, PLAN)
+    time.sleep(0.1)
+    assert cache.get(key) is None
+
+
+def test_key_normalization_and_tool_flags():
+    key = PlanCache.make_key("  Email the team   the weekly update! ", False, True)
+    assert key == PlanCache.make_key("email the team the weekly update", False, True)
+    assert key != PlanCache.make_key("email the team the weekly update", True, True)
+
+
+def test_hit_skips_llm_but_saves_fresh_rows(make_brain):
+    llm = CountingLLM()
+    brain, saved = make_brain(llm)
+
+    first = brain.get_agent_plan(1, "Email the team the weekly update")
+    first[0]["parameters"]["body"] = "mutated by caller"
+    second = brain.get_agent_plan(2, "email the team the weekly update.")
+
+    assert llm.calls == 1
+    assert second == PLAN
+    assert saved == [(1, "send_email"), (2, "send_email")]
+
+    brain.get_agent_plan(3, "email the team the weekly update", use_cache=False)
+    assert llm.calls == 2
@@ -0,0 +1,75 @@
+"""
+test_plan_stream.py - Incremental plan parsing and streaming endpoint tests
+"""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from plan_stream import IncrementalActionParser
+
+ACTION = {"tool": "send_gmail", "provider": "google",
+          "parameters": {"to": "a@b.co", "subject": "braces }] in \" strings", "body": "[{"}}
+
+
+def _feed_in_chunks(text, size=4):
+    parser = IncrementalActionParser()
+    emitted = []
+    for i in range(0, len(text), size):
+        for action in parser.feed(text[i:i + size]):
+            emitted.append((i, action))
+    return parser, emitted
+
+
+def test_bare_list_in_code_fence_emits_each_action_early():
+    text = "```json\n" + json.dumps([ACTION] * 3) + "\n```"
+    parser, emitted = _feed_in_chunks(text)
+    assert [a for _, a in emitted] == [ACTION] * 3
+    # The first action is out well before the stream ends
+    assert emitted[0][0] < len(text) // 2
+    assert parser.complete
+
+
+def test_wrapper_keys():
+    for key in ("actions", "plan", "tools"):
+        _, emitted = _feed_in_chunks(json.dumps({key: [ACTION]}))
+        assert [a for _, a in emitted] == [ACTION]
+
+
+def test_other_list_key_is_a_fallback():
+    parser, emitted = _feed_in_chunks(json.dumps({"note": "x", "steps": [ACTION], "more": [{"y": 1}]}))
+    assert emitted == []
+    assert parser.finish() == [ACTION]
+
+
+def test_trailing_output_is_ignored():
+    parser, emitted = _feed_in_chunks(json.dumps([ACTION]) + ' and also {"tool": "x"}')
+    assert len(emitted) == 1
+    assert parser.finish() == []
+
+
+class StreamingLLM:
+    def __init__(self, text):
+        self.text = text
+
+    async def astream(self, prompt, **kwargs):
+        for i in range(0, len(self.text), 5):
+            await asyncio.sleep(0)
+            yield self.text[i:i + 5]
+
+
+def test_stream_endpoint_ndjson(make_brain, monkeypatch):
+    import main
+
+    brain, saved = make_brain(StreamingLLM(json.dumps({"actions": [ACTION, ACTION]})))
+    monkeypatch.setattr(main, "agent_brain", brain)
+
+    client = TestClient(main.app)
+    response = client.post("/ask-agent/stream", json={"user_id": 7, "message": "email a@b.co"})
+    events = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [e["event"] for e in events] == ["action", "action", "done"]
+    assert events[0]["action"] == ACTION and events[0]["action_id"] == 1
+    assert events[-1]["count"] == 2
+    assert saved == [(7, "send_email"), (7, "send_email")]
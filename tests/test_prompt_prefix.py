@@ -0,0 +1,36 @@
+"""
+test_prompt_prefix.py - Prompt prefix layout and warm-up tests
+"""
+
+from agent_brain import PLANNING_PREFIX
+from llm_pool import LLMPool
+from tests.stubs import OllamaHandler, StubServer
+
+
+def test_prompts_share_the_static_prefix(make_brain):
+    brain, _ = make_brain(llm=None)
+    prompts = [
+        brain._build_planning_prompt("Create a task", {"asana": {}, "google": {}}),
+        brain._build_planning_prompt("Email bob@x.com", {"google": {}}),
+        brain._build_planning_prompt("Hello", {}),
+    ]
+    for prompt in prompts:
+        assert prompt.startswith(PLANNING_PREFIX)
+        assert "USER REQUEST" not in prompt[:len(PLANNING_PREFIX)]
+    assert prompts[0].endswith('USER REQUEST: "Create a task"\n\nGenerate actions now:\n')
+    suffixes = [prompt[len(PLANNING_PREFIX):] for prompt in prompts]
+    assert "send_gmail" in suffixes[1] and "create_asana_task" not in suffixes[1]
+    assert "No tools available" in suffixes[2]
+
+
+def test_warm_up_primes_every_backend_with_keep_alive():
+    with StubServer(OllamaHandler, response="[]") as a, StubServer(OllamaHandler, response="[]") as b:
+        pool = LLMPool("stub", base_urls=[a.url, b.url], keep_alive="45m")
+        timings = pool.warm_up(PLANNING_PREFIX)
+
+        assert set(timings) == {a.url, b.url}
+        for server in (a, b):
+            body = server.state["bodies"][0]
+            assert body["prompt"] == PLANNING_PREFIX
+            assert body["keep_alive"] == "45m"
+            assert body["options"]["num_predict"] == 1
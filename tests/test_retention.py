@@ -0,0 +1,259 @@
+"""
+test_retention.py - Batched archival and stale draft expiry against in-memory tables
+"""
+
+import re
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from action_executor import ActionExecutor
+from database import DatabaseManager
+from db_pool import ConnectionPool
+from retention import RetentionManager
+
+NOW = datetime(2024, 6, 15, 12, 0, 0)
+
+
+class TablesCursor:
+    """Runs the retention statements against dict-of-lists tables"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.result = []
+
+    def execute(self, query, params=()):
+        sql = " ".join(query.split())
+        params = list(params)
+        tables = self.conn.tables
+        columns = self.conn.columns
+        self.conn.log.append(sql.split()[0])
+        self.result, self.rowcount = [], 0
+
+        if sql.startswith("UPDATE ai_pending_actions SET status = 'expired'"):
+            cutoff, limit = params
+            rows = sorted((r for r in tables["ai_pending_actions"]
+                           if r["status"] == "pending" and r["created_at"] < cutoff),
+                          key=lambda r: r["created_at"])[:limit]
+            for row in rows:
+                row["status"] = "expired"
+            self.rowcount = len(rows)
+        elif sql.startswith("UPDATE ai_pending_actions SET status = 'pending'"):
+            cutoff, limit = params
+            rows = sorted((r for r in tables["ai_pending_actions"] if r["status"] == "approved"
+                           and (r.get("claimed_at") or r["created_at"]) < cutoff),
+                          key=lambda r: r["created_at"])[:limit]
+            for row in rows:
+                row.update(status="pending", claimed_at=None)
+            self.rowcount = len(rows)
+        elif sql.startswith("SELECT id, created_at FROM"):
+            table = sql.split()[4]
+            limit, cutoff, statuses = params[-1], params[-2], params[:-2]
+            rows = [r for r in sorted(tables[table], key=lambda r: r["id"])
+                    if r["created_at"] < cutoff and (not statuses or r["status"] in statuses)]
+            self.result = [(r["id"], r["created_at"]) for r in rows[:limit]]
+        elif sql.startswith("SHOW TABLES LIKE"):
+            self.result = [(params[0],)] if params[0] in tables else []
+        elif sql.startswith("CREATE TABLE"):
+            assert not self.conn.in_transaction, "DDL would commit the open transaction"
+            _, _, archive, _, source = sql.split()
+            tables[archive] = []
+            columns[archive] = list(columns[source])
+        elif sql.startswith("SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS"):
+            self.result = [(name, column, column_type) for name in params
+                           for column, column_type in columns.get(name, [])]
+        elif sql.startswith("ALTER TABLE"):
+            assert not self.conn.in_transaction, "DDL would commit the open transaction"
+            _, _, archive, _, _, column, column_type, _ = sql.split()
+            columns[archive].append((column, column_type))
+        elif sql.startswith(("INSERT INTO", "DELETE FROM")):
+            table = re.search(r"(?:FROM|INTO) (\w+)", sql).group(1)
+            source = re.search(r"FROM (\w+) WHERE", sql).group(1)
+            id_count = sql.split("WHERE id IN (")[1].split(")")[0].count("%s")
+            ids, statuses = params[:id_count], params[id_count:]
+            matched = [r for r in tables[source] if r["id"] in ids and (not statuses or r["status"] in statuses)]
+            if sql.startswith("INSERT"):
+                # Like MySQL: every listed column must exist in the target
+                listed = re.search(r"INTO \w+ \(([^)]*)\)", sql).group(1).split(", ")
+                assert set(listed) <= {c for c, _ in columns[table]}, f"Unknown column in {table}"
+                tables[table].extend({c: r.get(c) for c in listed} for r in matched)
+            else:
+                tables[source][:] = [r for r in tables[source] if r not in matched]
+            self.rowcount = len(matched)
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class TablesConnection:
+    def __init__(self, tables, columns):
+        self.tables = tables
+        self.columns = columns
+        self.log = []
+        self.in_transaction = False
+
+    def cursor(self, **kwargs):
+        return TablesCursor(self)
+
+    def start_transaction(self):
+        self.in_transaction = True
+        self.log.append("BEGIN")
+
+    def commit(self):
+        self.in_transaction = False
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def store():
+    actions = []
+    for i in range(1, 41):
+        status = ('executed', 'rejected', 'pending', 'approved')[i % 4]
+        # Ids 1-30 are spread over April and May, the rest are recent
+        created = NOW - timedelta(days=75 - i * 2) if i <= 30 else NOW - timedelta(hours=i - 30)
+        # Approved ones are in flight on a live executor
+        actions.append({"id": i, "user_id": 1, "status": status, "created_at": created,
+                        "claimed_at": NOW if status == 'approved' else None})
+    chats = [{"id": i, "user_id": 1, "status": None, "created_at": NOW - timedelta(days=200 - i)}
+             for i in range(1, 201)]
+    columns = {
+        "ai_pending_actions": [("id", "int"), ("user_id", "int"), ("status", "varchar(20)"),
+                               ("created_at", "timestamp"), ("claimed_at", "timestamp")],
+        "agent_chat_logs": [("id", "int"), ("user_id", "int"), ("status", "varchar(20)"),
+                            ("created_at", "timestamp")],
+    }
+    conn = TablesConnection({"ai_pending_actions": actions, "agent_chat_logs": chats}, columns)
+    manager = DatabaseManager()
+    manager.pool = ConnectionPool({}, size=1, connect=lambda **cfg: conn)
+    return RetentionManager(manager, batch_size=4, batch_pause=0, action_days=30, chat_days=90,
+                            pending_hours=72), conn
+
+
+def test_settled_actions_move_to_monthly_archives(store):
+    retention, conn = store
+    report = retention.archive_actions(NOW)
+
+    archived = {name: sorted(r["id"] for r in rows) for name, rows in conn.tables.items() if "_archive_" in name}
+    assert set(archived) == {"ai_pending_actions_archive_202404", "ai_pending_actions_archive_202405"}
+    moved = sorted(i for ids in archived.values() for i in ids)
+    # Executed/rejected rows older than 30 days (ids up to 22), nothing pending, approved or recent
+    assert moved == [i for i in range(1, 23) if i % 4 in (0, 1)]
+    assert all(r["id"] not in moved for r in conn.tables["ai_pending_actions"])
+
+    assert report["moved"] == len(moved)
+    assert report["batches"] == len(moved) // 4 + 1
+    assert report["rows_per_second"] > 0 and report["error"] is None
+
+
+def test_archives_made_before_a_migration_gain_its_columns(store):
+    retention, conn = store
+    # April's archive was created before claimed_at was added to the hot table
+    old = [c for c in conn.columns["ai_pending_actions"] if c[0] != "claimed_at"]
+    conn.columns["ai_pending_actions_archive_202404"] = old
+    conn.tables["ai_pending_actions_archive_202404"] = [{"id": 0, "user_id": 1, "status": "executed",
+                                                         "created_at": datetime(2024, 4, 1)}]
+
+    report = retention.archive_actions(NOW)
+    assert report["error"] is None and report["moved"] == 11
+    assert ("claimed_at", "timestamp") in conn.columns["ai_pending_actions_archive_202404"]
+    april = conn.tables["ai_pending_actions_archive_202404"]
+    assert len(april) > 1 and all("claimed_at" in r for r in april[1:])
+    assert conn.log.count("ALTER") == 1
+
+
+def test_each_batch_is_its_own_transaction(store):
+    retention, conn = store
+    retention.archive_actions(NOW)
+    # copy + delete per month sit between one BEGIN and its COMMIT
+    transactions = [t.split("COMMIT")[0] for t in " ".join(conn.log).split("BEGIN")[1:]]
+    assert len(transactions) == retention.last_run["archive_actions"]["batches"]
+    assert all(set(t.split()) <= {"INSERT", "DELETE"} for t in transactions)
+
+
+def test_stale_drafts_expire_then_archive_next_run(store):
+    retention, conn = store
+    report = retention.run_once(NOW)
+    expired = [r for r in conn.tables["ai_pending_actions"] if r["status"] == "expired"]
+    # Old drafts expired; the ones from the last 72 hours are still pending
+    assert report["expire_pending"]["moved"] == 8
+    assert all(r["status"] == "pending" for r in conn.tables["ai_pending_actions"]
+               if r["created_at"] >= NOW - timedelta(hours=72) and r["id"] % 4 == 2)
+
+    # Expired drafts past the action retention are archived like any settled action
+    retention.archive_actions(NOW)
+    assert not [r for r in expired if r["created_at"] < NOW - timedelta(days=30)
+                and r in conn.tables["ai_pending_actions"]]
+
+
+def test_chat_logs_archive_oldest_first_within_time_budget(store):
+    retention, conn = store
+    retention.max_seconds = 0.0
+    assert retention.archive_chat_logs(NOW)["moved"] == 0
+
+    retention.max_seconds = 60
+    report = retention.archive_chat_logs(NOW)
+    assert report["moved"] == 109
+    assert min(r["id"] for r in conn.tables["agent_chat_logs"]) == 110
+    assert retention.stats()["total_moved"]["archive_chat_logs"] == 109
+
+
+def test_claims_lost_with_a_dead_executor_are_released(store):
+    retention, conn = store
+    actions = {r["id"]: r for r in conn.tables["ai_pending_actions"]}
+    claimed_at = NOW - timedelta(hours=1)
+    for action_id in (2, 6, 10):
+        actions[action_id].update(status="approved", claimed_at=claimed_at)
+    # Claimed before claimed_at existed; only created_at to go by
+    actions[14].update(status="approved", claimed_at=None)
+
+    # The process dies with the claimed actions still queued or running
+    stuck = threading.Event()
+    executor = ActionExecutor(lambda action, token: stuck.wait(), workers={"google": 1})
+    for action_id in (2, 6, 10):
+        executor.submit({**actions[action_id], "provider": "google"}, {})
+    executor.close(wait=False)
+
+    report = retention.release_stale_claims(NOW)
+    assert report["moved"] == 4
+    assert all(actions[i]["status"] == "pending" and actions[i]["claimed_at"] is None for i in (2, 6, 10, 14))
+    # Approvals still inside their lease are left alone
+    assert all(r["status"] == "approved" for r in actions.values() if r["claimed_at"] == NOW)
+    stuck.set()
+
+
+def test_worker_startup_leaves_other_workers_claims_alone(monkeypatch, make_brain):
+    from fastapi.testclient import TestClient
+    import main
+
+    monkeypatch.setenv("DB_ASYNC_ENABLED", "false")
+    monkeypatch.setenv("LLM_WARM_UP", "false")
+    monkeypatch.setenv("RETENTION_ENABLED", "false")
+    monkeypatch.setattr(main, "CHAT_LOGGING_ENABLED", False)
+    brain, _ = make_brain(llm=None)
+    monkeypatch.setattr(main, "agent_brain", brain)
+    monkeypatch.setattr(main.retention, "release_stale_claims",
+                        lambda *a: pytest.fail("claims must only be released by the retention loop"))
+    for name in ("http_client", "chat_log", "db_manager"):
+        monkeypatch.setattr(getattr(main, name), "close", lambda *a, **k: None)
+
+    async def closed():
+        pass
+    monkeypatch.setattr(main.async_db, "close", closed)
+
+    # A worker booting next to busy ones starts and stops without touching their approvals
+    with TestClient(main.app):
+        pass
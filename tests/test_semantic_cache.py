@@ -0,0 +1,86 @@
+"""
+test_semantic_cache.py - Semantic plan cache tests
+"""
+
+import json
+
+import numpy as np
+
+from semantic_cache import SemanticPlanCache, reextract_parameters
+
+TASK_PLAN = [{"tool": "create_asana_task", "provider": "asana",
+              "parameters": {"name": "Q4 planning", "notes": "", "project_id": ""}}]
+
+
+def _vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_nearest_neighbour_above_threshold():
+    cache = SemanticPlanCache(max_entries=8, threshold=0.9)
+    cache.add(_vec(1, 0, 0), (True, True), TASK_PLAN)
+    skeleton, score = cache.lookup(_vec(0.95, 0.1, 0), (True, True))
+    assert score > 0.9
+    assert skeleton[0]["tool"] == "create_asana_task"
+    assert skeleton[0]["parameters"]["name"] == ""
+    assert cache.lookup(_vec(0, 1, 0), (True, True)) is None
+
+
+def test_tool_flags_must_match():
+    cache = SemanticPlanCache(max_entries=8, threshold=0.9)
+    cache.add(_vec(1, 0), (True, False), TASK_PLAN)
+    assert cache.lookup(_vec(1, 0), (False, True)) is None
+
+
+def test_lru_row_is_overwritten_when_full():
+    cache = SemanticPlanCache(max_entries=2, threshold=0.99)
+    cache.add(_vec(1, 0, 0), (True, True), TASK_PLAN)
+    cache.add(_vec(0, 1, 0), (True, True), TASK_PLAN)
+    assert cache.lookup(_vec(1, 0, 0), (True, True)) is not None
+    cache.add(_vec(0, 0, 1), (True, True), TASK_PLAN)
+    assert cache.lookup(_vec(0, 1, 0), (True, True)) is None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+
+
+def test_multi_action_plans_are_not_stored():
+    cache = SemanticPlanCache(max_entries=2, threshold=0.9)
+    cache.add(_vec(1, 0), (True, True), TASK_PLAN * 2)
+    assert cache.stats()["size"] == 0
+
+
+def test_reextract_parameters():
+    skeleton = [{"tool": "send_gmail", "provider": "google",
+                 "parameters": {"to": "", "subject": "", "body": ""}}]
+    actions = reextract_parameters(skeleton, "email bob@x.com subject: Launch body: We ship Friday")
+    assert actions[0]["parameters"] == {"to": "bob@x.com", "subject": "Launch", "body": "We ship Friday"}
+    assert reextract_parameters(skeleton, "email the team") is None
+
+
+class FakeEmbeddings:
+    """Maps any message mentioning planning to the same direction"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0] if "planning" in text else [0.0, 1.0]
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        return json.dumps(TASK_PLAN)
+
+
+def test_paraphrase_reuses_skeleton(make_brain):
+    llm = CountingLLM()
+    brain, saved = make_brain(llm)
+    brain.embeddings = FakeEmbeddings()
+    brain.semantic_cache = SemanticPlanCache(max_entries=4, threshold=0.9)
+
+    brain.get_agent_plan(1, "make an asana task for Q4 planning")
+    actions = brain.get_agent_plan(1, "create Q3 planning task")
+
+    assert llm.calls == 1
+    assert actions[0]["parameters"]["name"] == "Q3 planning"
+    assert len(saved) == 2
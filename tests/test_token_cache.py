@@ -0,0 +1,183 @@
+"""
+test_token_cache.py - OAuth token cache tests
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from async_database import AsyncDatabaseManager
+from database import DatabaseManager
+from token_cache import MISS, TokenCache
+
+TOKEN = {"access_token": "tok", "refresh_token": None, "expires_at": None}
+
+
+def counting_manager(monkeypatch, tokens):
+    manager = DatabaseManager()
+    loads = []
+
+    def fake_tokens(user_id):
+        loads.append(user_id)
+        return {p: dict(t) if t else t for p, t in tokens.items()}
+
+    monkeypatch.setattr(manager, "get_user_tokens", fake_tokens)
+    return manager, loads
+
+
+def test_one_batched_load_serves_every_provider(monkeypatch):
+    manager, loads = counting_manager(monkeypatch, {"asana": TOKEN})
+    assert manager.get_user_token(1, 'asana')["access_token"] == "tok"
+    # google isn't connected: answered from the negative entry, no second query
+    assert manager.get_user_token(1, 'google') is None
+    assert manager.get_user_token(1, 'asana')["access_token"] == "tok"
+    assert loads == [1]
+
+    stats = manager.token_cache.stats()
+    assert (stats["misses"], stats["hits"], stats["negative_hits"]) == (1, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+
+
+def test_ttl_is_bounded_by_token_expiry():
+    cache = TokenCache(ttl_seconds=300, negative_ttl_seconds=300)
+    cache.put_user(1, {"asana": dict(TOKEN, expires_at=datetime.now() + timedelta(seconds=0.1))})
+    assert cache.get(1, 'asana') is not MISS
+    assert cache.get(1, 'google') is None
+    time.sleep(0.15)
+    # One expired row sends the whole user back to a single reload
+    assert cache.get(1, 'asana') is MISS
+    assert cache.get(1, 'google') is MISS
+
+
+def test_cached_rows_are_copies():
+    cache = TokenCache()
+    cache.put_user(1, {"asana": dict(TOKEN)})
+    cache.get(1, 'asana')["access_token"] = "mutated"
+    assert cache.get(1, 'asana')["access_token"] == "tok"
+
+
+def test_size_bound_evicts_least_recently_used():
+    cache = TokenCache(max_entries=2)
+    cache.put_user(1, {"asana": TOKEN})
+    cache.put_user(2, {"asana": TOKEN})
+    cache.get(1, 'asana')
+    cache.put_user(3, {"asana": TOKEN})
+    assert cache.get(2, 'asana') is MISS
+    assert cache.get(1, 'asana') is not MISS and cache.get(3, 'asana') is not MISS
+    assert cache.stats()["evictions"] == 1
+
+
+def test_connection_update_invalidates(monkeypatch):
+    manager, loads = counting_manager(monkeypatch, {"asana": TOKEN})
+    manager.get_user_token(1, 'google')
+    # Not connected to MySQL here, but the cached entry must go regardless
+    manager.save_user_connection(1, 'google', 'new-token')
+    manager.get_user_token(1, 'google')
+    assert loads == [1, 1]
+    assert manager.token_cache.stats()["invalidations"] == 1
+
+
+def test_async_concurrent_misses_share_one_query(monkeypatch):
+    manager = DatabaseManager()
+    adb = AsyncDatabaseManager(manager)
+    adb.pool = object()
+    loads = []
+
+    async def fake_tokens(user_id):
+        loads.append(user_id)
+        await asyncio.sleep(0.01)
+        return {"asana": dict(TOKEN)}
+
+    monkeypatch.setattr(adb, "get_user_tokens", fake_tokens)
+
+    async def run():
+        return await asyncio.gather(adb.get_user_token(1, 'asana'), adb.get_user_token(1, 'google'))
+
+    asana, google = asyncio.run(run())
+    assert asana["access_token"] == "tok" and google is None
+    assert loads == [1]
+
+
+def test_capabilities_snapshot_is_one_load(monkeypatch):
+    expires = datetime.now() + timedelta(hours=1)
+    manager, loads = counting_manager(monkeypatch, {
+        "asana": dict(TOKEN, expires_at=expires, metadata='{"workspace": "Acme"}')})
+
+    capabilities = manager.get_user_capabilities(1)
+    assert capabilities == {"asana": {"expires_at": expires, "metadata": {"workspace": "Acme"}}}
+    # Later lookups, per-provider or whole-user, are served from the cache
+    assert manager.get_user_token(1, 'google') is None
+    assert manager.get_user_capabilities(1) == capabilities
+    assert loads == [1]
+
+
+def test_any_provider_the_query_returns_is_cached(monkeypatch):
+    # A provider added after the cache was written needs no change here
+    manager, loads = counting_manager(monkeypatch, {"asana": TOKEN, "slack": dict(TOKEN, access_token="s")})
+    assert set(manager.get_user_capabilities(1)) == {"asana", "slack"}
+    assert set(manager.get_user_capabilities(1)) == {"asana", "slack"}
+    assert manager.get_user_token(1, 'slack')["access_token"] == "s"
+    assert loads == [1]
+
+
+def test_absent_providers_are_trusted_for_the_negative_ttl(monkeypatch):
+    manager, loads = counting_manager(monkeypatch, {"asana": TOKEN})
+    manager.token_cache.negative_ttl_seconds = 0.05
+    assert manager.get_user_token(1, 'google') is None
+    assert manager.get_user_token(1, 'asana') is not None
+    time.sleep(0.08)
+    # Connected rows are still fresh, but whether google is connected is checked again
+    assert manager.get_user_token(1, 'asana') is not None
+    assert manager.get_user_token(1, 'google') is None
+    assert loads == [1, 1]
+
+
+def test_load_racing_an_invalidation_is_not_cached(monkeypatch):
+    manager = DatabaseManager()
+    loads = []
+
+    def racing_load(user_id):
+        loads.append(user_id)
+        old = {"google": {**TOKEN, "access_token": "old"}}
+        if len(loads) == 1:
+            # The connection is updated while the first load is still reading
+            manager.token_cache.invalidate(user_id, 'google')
+        return old if len(loads) == 1 else {"google": {**TOKEN, "access_token": "new"}}
+
+    monkeypatch.setattr(manager, "get_user_tokens", racing_load)
+    # The caller still gets what it read, but the old row isn't kept
+    assert manager.get_user_token(1, 'google')["access_token"] == "old"
+    assert manager.get_user_token(1, 'google')["access_token"] == "new"
+    assert manager.get_user_token(1, 'google')["access_token"] == "new"
+    assert loads == [1, 1]
+    assert manager.token_cache.stats()["stale_loads"] == 1
+
+
+def test_async_misses_after_an_invalidation_start_a_new_load(monkeypatch):
+    manager = DatabaseManager()
+    adb = AsyncDatabaseManager(manager)
+    adb.pool = object()
+    rows = {"access_token": "old"}
+    loads = []
+
+    async def fake_tokens(user_id):
+        loads.append(rows["access_token"])
+        token = {**TOKEN, "access_token": rows["access_token"]}
+        await asyncio.sleep(0.02)
+        return {"google": token}
+
+    monkeypatch.setattr(adb, "get_user_tokens", fake_tokens)
+
+    async def update_during_load():
+        await asyncio.sleep(0.005)
+        rows["access_token"] = "new"
+        manager.token_cache.invalidate(1, 'google')
+        return await adb.get_user_token(1, 'google')
+
+    async def run():
+        return await asyncio.gather(adb.get_user_token(1, 'google'), update_during_load())
+
+    before, after = asyncio.run(run())
+    assert before["access_token"] == "old" and after["access_token"] == "new"
+    assert loads == ["old", "new"]
+    assert manager.token_cache.get(1, 'google')["access_token"] == "new"
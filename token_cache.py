@@ -0,0 +1,155 @@
+"""
+token_cache.py - In-process cache of users' OAuth tokens
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# Returned by get() when the cache has nothing for the key
+MISS = object()
+
+# One user's cached rows: provider -> (monotonic expiry, token row or None)
+Rows = Dict[str, Tuple[float, Optional[Dict]]]
+
+
+class TokenCache:
+    """
+    LRU cache of each user's token rows, keyed by user_id
+
+    put_user() stores whatever providers the user's token query returned, so
+    the cache never needs its own list of providers. A row lives for at most
+    TOKEN_CACHE_TTL seconds and never past the token's own expires_at. A
+    provider the user hasn't connected is answered as absent (None) for
+    TOKEN_CACHE_NEGATIVE_TTL seconds after the load, so unconnected tools
+    don't cost a query on every request. Writers call invalidate() after
+    changing a row; it bumps the user's generation, and loaders pass the
+    generation they read before querying to put_user(), so a load that
+    started before the change can't store the old rows after it.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None,
+                 negative_ttl_seconds: float = None):
+        self.max_entries = max_entries or int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('TOKEN_CACHE_TTL', 300))
+        self.negative_ttl_seconds = (negative_ttl_seconds if negative_ttl_seconds is not None
+                                     else float(os.getenv('TOKEN_CACHE_NEGATIVE_TTL', 60)))
+        # user_id -> (monotonic time absent providers stop being trusted, rows)
+        self._entries: "OrderedDict[int, Tuple[float, Rows]]" = OrderedDict()
+        # user_id -> invalidations so far; users never invalidated are at 0
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_loads = 0
+
+    def _live_entry(self, user_id: int, now: float) -> Optional[Tuple[float, Rows]]:
+        """The user's entry, dropped if any of its rows has expired (call with the lock held)"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if any(expires_at < now for expires_at, _ in entry[1].values()):
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def get(self, user_id: int, provider: str):
+        """Cached token row (a copy), None when known to be absent, or MISS"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live_entry(user_id, now)
+            if entry is not None and provider in entry[1]:
+                token = entry[1][provider][1]
+            elif entry is not None and entry[0] >= now:
+                token = None
+            else:
+                self.misses += 1
+                return MISS
+
+            if token is None:
+                self.negative_hits += 1
+                return None
+            self.hits += 1
+            return dict(token)
+
+    def get_user(self, user_id: int) -> Optional[Dict[str, Optional[Dict]]]:
+        """
+        All of a user's cached rows by provider, or None to reload
+        Whole-user answers claim no other provider is connected, so they last
+        only as long as absent providers are trusted
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live_entry(user_id, now)
+            if entry is None or entry[0] < now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {provider: token and dict(token) for provider, (_, token) in entry[1].items()}
+
+    def generation(self, user_id: int) -> int:
+        """The user's generation, to read before loading their tokens for put_user()"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put_user(self, user_id: int, tokens: Dict[str, Optional[Dict]], generation: int = None):
+        """
+        Store one user's tokens as loaded; providers not in `tokens` are cached as absent
+        With `generation`, the rows are dropped if the user was invalidated since
+        """
+        now = time.monotonic()
+        rows = {provider: (now + self._ttl_for(token), token and dict(token))
+                for provider, token in tokens.items()}
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user_id, 0):
+                self.stale_loads += 1
+                return
+            self._entries[user_id] = (now + self.negative_ttl_seconds, rows)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _ttl_for(self, token: Optional[Dict]) -> float:
+        if token is None:
+            return self.negative_ttl_seconds
+        ttl = self.ttl_seconds
+        if token.get('expires_at'):
+            ttl = min(ttl, (token['expires_at'] - datetime.now()).total_seconds())
+        return max(0.0, ttl)
+
+    def invalidate(self, user_id: int, provider: str = None):
+        """Drop a user's cached tokens after one of their rows changed (`provider` is informational)"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_loads": self.stale_loads,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0
+            }
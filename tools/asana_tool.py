@@ -2,14 +2,34 @@
 tools/asana_tool.py - Asana API operations
 """
 
-import requests
+import os
 import json
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Sequence
+
+from tools.http_client import http_client
+
+ASANA_API_URL = os.getenv('ASANA_API_URL', 'https://app.asana.com/api/1.0')
+# Actions per POST /batch; Asana accepts at most 10
+ASANA_BATCH_SIZE = min(int(os.getenv('ASANA_BATCH_SIZE', 10)), 10)
+# Items per page of a collection; Asana allows 1-100
+ASANA_PAGE_SIZE = int(os.getenv('ASANA_PAGE_SIZE', 100))
+
+# Fetches the next page of a collection while the caller works through the current one
+_prefetcher = ThreadPoolExecutor(max_workers=int(os.getenv('ASANA_PREFETCH_WORKERS', 4)),
+                                 thread_name_prefix="asana-prefetch")
+
+
+class AsanaAPIError(Exception):
+    """A collection page came back with a non-200 status"""
+
 
 class AsanaAPI:
-    def __init__(self, access_token: str):
+    """Asana calls for one user's token; connections come from the shared http_client"""
+    
+    def __init__(self, access_token: str, base_url: Optional[str] = None):
         self.access_token = access_token
-        self.base_url = "https://app.asana.com/api/1.0"
+        self.base_url = base_url or ASANA_API_URL
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
@@ -20,7 +40,7 @@ class AsanaAPI:
         url = f"{self.base_url}/workspaces"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = http_client.get(url, headers=self.headers)
             if response.status_code == 200:
                 workspaces = response.json().get('data', [])
                 return [{"id": w['gid'], "name": w['name']} for w in workspaces]
@@ -30,34 +50,83 @@ class AsanaAPI:
             return []
     
     def fetch_projects(self, workspace_id: Optional[str] = None) -> List[Dict]:
-        """Fetch projects"""
-        url = f"{self.base_url}/projects"
-        params = {}
-        
-        if workspace_id:
-            params['workspace'] = workspace_id
-        
+        """Fetch projects (every page)"""
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            if response.status_code == 200:
-                projects = response.json().get('data', [])
-                return [{"id": p['gid'], "name": p['name']} for p in projects]
-            return []
+            return [{"id": p['gid'], "name": p['name']} for p in self.iter_projects(workspace_id)]
         except Exception as e:
             print(f"Asana projects error: {e}")
             return []
     
+    def _get_page(self, path: str, params: Dict) -> Dict:
+        response = http_client.get(f"{self.base_url}{path}", headers=self.headers, params=params)
+        if response.status_code != 200:
+            raise AsanaAPIError(f"GET {path}: {response.status_code} {response.text[:200]}")
+        return response.json()
+    
+    def iter_collection(self, path: str, params: Dict = None, opt_fields: Sequence[str] = None,
+                        page_size: int = None, prefetch: bool = True) -> Iterator[Dict]:
+        """
+        Yield every item of a paginated Asana collection, following next_page offsets
+        Only the current page (and, with prefetch, the next one being fetched) is held
+        in memory. opt_fields limits each item to gid plus those fields.
+        Raises AsanaAPIError or requests.RequestException if a page fails.
+        """
+        params = dict(params or {})
+        params['limit'] = page_size or ASANA_PAGE_SIZE
+        if opt_fields:
+            params['opt_fields'] = ",".join(opt_fields)
+        
+        page = self._get_page(path, params)
+        pending = None
+        try:
+            while True:
+                offset = (page.get('next_page') or {}).get('offset')
+                if offset and prefetch:
+                    pending = _prefetcher.submit(self._get_page, path, {**params, 'offset': offset})
+                yield from page.get('data', [])
+                if not offset:
+                    return
+                page = pending.result() if pending else self._get_page(path, {**params, 'offset': offset})
+                pending = None
+        finally:
+            # Stopped early: don't leave a prefetch running for nobody
+            if pending is not None:
+                pending.cancel()
+    
+    def iter_projects(self, workspace_id: Optional[str] = None, opt_fields: Sequence[str] = ('name',),
+                      **kwargs) -> Iterator[Dict]:
+        """Every project, optionally of one workspace"""
+        params = {'workspace': workspace_id} if workspace_id else {}
+        return self.iter_collection("/projects", params, opt_fields, **kwargs)
+    
+    def iter_tasks(self, project_id: str, opt_fields: Sequence[str] = ('name', 'completed'),
+                   **kwargs) -> Iterator[Dict]:
+        """Every task of a project"""
+        return self.iter_collection("/tasks", {'project': project_id}, opt_fields, **kwargs)
+    
+    def iter_users(self, workspace_id: str, opt_fields: Sequence[str] = ('name', 'email'),
+                   **kwargs) -> Iterator[Dict]:
+        """Every user of a workspace"""
+        return self.iter_collection("/users", {'workspace': workspace_id}, opt_fields, **kwargs)
+    
     def fetch_metadata(self) -> Dict:
-        """Fetch comprehensive metadata"""
+        """
+        Fetch workspaces and each workspace's projects (tagged with its "workspace" id)
+        A project page that fails raises rather than returning a truncated list
+        """
+        workspaces = self.fetch_workspaces()
+        projects = []
+        for workspace in workspaces:
+            for project in self.iter_projects(workspace['id']):
+                projects.append({"id": project['gid'], "name": project['name'], "workspace": workspace['id']})
         return {
-            "workspaces": self.fetch_workspaces(),
-            "projects": self.fetch_projects()
+            "workspaces": workspaces,
+            "projects": projects
         }
     
-    def create_task(self, task_data: Dict) -> Dict:
-        """Create a new task"""
-        url = f"{self.base_url}/tasks"
-        
+    @staticmethod
+    def _task_body(task_data: Dict) -> Dict:
+        """POST /tasks body for the planner's task parameters"""
         payload = {
             "data": {
                 "name": task_data.get('name', ''),
@@ -78,9 +147,14 @@ class AsanaAPI:
         for field in optional_fields:
             if field in task_data:
                 payload["data"][field] = task_data[field]
+        return payload
+    
+    def create_task(self, task_data: Dict) -> Dict:
+        """Create a new task"""
+        url = f"{self.base_url}/tasks"
         
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=10)
+            response = http_client.post(url, headers=self.headers, json=self._task_body(task_data))
             
             if response.status_code in [200, 201]:
                 return response.json()
@@ -92,12 +166,49 @@ class AsanaAPI:
         except Exception as e:
             return {"error": str(e)}
     
+    def create_tasks(self, tasks: List[Dict]) -> List[Dict]:
+        """
+        Create several tasks through /batch, ASANA_BATCH_SIZE per request
+        Returns one result per task, in order, shaped like create_task's
+        """
+        if len(tasks) == 1:
+            return [self.create_task(tasks[0])]
+        
+        results = []
+        for start in range(0, len(tasks), ASANA_BATCH_SIZE):
+            chunk = tasks[start:start + ASANA_BATCH_SIZE]
+            actions = [{"method": "post", "relative_path": "/tasks", "data": self._task_body(task)["data"]}
+                       for task in chunk]
+            try:
+                response = http_client.post(f"{self.base_url}/batch", headers=self.headers,
+                                            json={"data": {"actions": actions}})
+                if response.status_code != 200:
+                    error = {"error": f"API Error: {response.status_code}", "details": response.text}
+                    results.extend(dict(error) for _ in chunk)
+                    continue
+                # One entry per action, each with its own status_code and body
+                for entry in response.json().get('data', []):
+                    if entry.get('status_code') in [200, 201]:
+                        results.append(entry.get('body') or {})
+                    else:
+                        results.append({
+                            "error": f"API Error: {entry.get('status_code')}",
+                            "details": json.dumps(entry.get('body'))
+                        })
+            except Exception as e:
+                results.extend({"error": str(e)} for _ in chunk)
+            # A short response must not shift later results onto the wrong tasks
+            while len(results) < start + len(chunk):
+                results.append({"error": "No result in batch response"})
+            del results[start + len(chunk):]
+        return results
+    
     def get_task(self, task_id: str) -> Dict:
         """Fetch a specific task"""
         url = f"{self.base_url}/tasks/{task_id}"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = http_client.get(url, headers=self.headers)
             return response.json() if response.status_code == 200 else {"error": "Task not found"}
         except Exception as e:
             return {"error": str(e)}
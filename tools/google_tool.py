@@ -2,14 +2,18 @@
 tools/google_tool.py - Gmail API operations
 """
 
-import requests
+import os
 import base64
 from email.mime.text import MIMEText
 from typing import Dict
 
+from tools.http_client import http_client
+
+GMAIL_API_URL = os.getenv('GMAIL_API_URL', 'https://gmail.googleapis.com/gmail/v1')
+
 def send_gmail(access_token: str, email_data: Dict) -> Dict:
     """Send email using Gmail API"""
-    url = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send"
+    url = f"{GMAIL_API_URL}/users/me/messages/send"
     
     headers = {
         "Authorization": f"Bearer {access_token}",
@@ -29,7 +33,7 @@ def send_gmail(access_token: str, email_data: Dict) -> Dict:
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
+        response = http_client.post(url, headers=headers, json=payload)
         
         if response.status_code == 200:
             return response.json()
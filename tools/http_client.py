@@ -0,0 +1,120 @@
+"""
+tools/http_client.py - Shared keep-alive HTTP client for provider APIs
+"""
+
+import os
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from metrics import LatencyRecorder
+
+load_dotenv()
+
+
+class ProviderHTTPClient:
+    """
+    One requests.Session for every provider call in the process
+
+    Each host gets its own adapter holding up to PROVIDER_HTTP_POOL_SIZE idle
+    keep-alive connections, so repeated calls to app.asana.com or
+    gmail.googleapis.com skip the TCP and TLS handshakes. With
+    PROVIDER_HTTP_POOL_BLOCK=true a host never has more connections open than
+    its pool size and callers wait for one instead. Cookies are never stored:
+    the session is shared by all users.
+    """
+
+    def __init__(self, pool_size: int = None, timeout: float = None, connect_timeout: float = None,
+                 pool_block: bool = None):
+        self.pool_size = pool_size or int(os.getenv('PROVIDER_HTTP_POOL_SIZE', 10))
+        self.timeout: Tuple[float, float] = (
+            connect_timeout or float(os.getenv('PROVIDER_HTTP_CONNECT_TIMEOUT', 3.05)),
+            timeout or float(os.getenv('PROVIDER_HTTP_TIMEOUT', 10))
+        )
+        if pool_block is None:
+            pool_block = os.getenv('PROVIDER_HTTP_POOL_BLOCK', 'false').lower() == 'true'
+        self.pool_block = pool_block
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self._adapters: Dict[str, HTTPAdapter] = {}
+        self._pool_sizes: Dict[str, int] = {}
+        self._latency: Dict[str, LatencyRecorder] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def mount(self, url: str, pool_size: int = None) -> HTTPAdapter:
+        """Give the host of `url` its own connection pool (done lazily on first request)"""
+        host = self._host(url)
+        with self._lock:
+            adapter = self._adapters.get(host)
+            if adapter is None or pool_size:
+                # One pool per adapter: the adapter only ever talks to this host
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or self.pool_size,
+                                      pool_block=self.pool_block)
+                self.session.mount(host + "/", adapter)
+                self._adapters[host] = adapter
+                self._pool_sizes[host] = pool_size or self.pool_size
+                self._latency.setdefault(host, LatencyRecorder())
+                self._errors.setdefault(host, 0)
+            return adapter
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Like requests.request, on a pooled connection and with the default timeouts"""
+        host = self._host(url)
+        if host not in self._adapters:
+            self.mount(url)
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors[host] += 1
+            raise
+        finally:
+            self._latency[host].record((time.perf_counter() - started) * 1000)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection"""
+        self.session.close()
+
+    def stats(self) -> Dict:
+        """Per-host request counts, connections opened and reuse rate"""
+        hosts = {}
+        with self._lock:
+            adapters = dict(self._adapters)
+        for host, adapter in adapters.items():
+            pools = adapter.poolmanager.pools
+            opened = sum(pools[key].num_connections for key in list(pools.keys()))
+            latency = self._latency[host].stats()
+            requests_made = latency["count"]
+            hosts[host] = {
+                "pool_size": self._pool_sizes[host],
+                "requests": requests_made,
+                "connections_opened": opened,
+                "reuse_rate": round(1 - opened / requests_made, 4) if requests_made else 0.0,
+                "errors": self._errors[host],
+                "latency": latency
+            }
+        return {"timeout": list(self.timeout), "pool_block": self.pool_block, "hosts": hosts}
+
+
+# Global instance
+http_client = ProviderHTTPClient()